@@ -0,0 +1,95 @@
+"""
+ASGI entry point for production serving.
+
+The Flask routes in web_app.py are blocking (SQLite calls), so each request
+is handed to a thread pool while the event loop keeps accepting and
+streaming other requests. SQLite releases the GIL while it runs a query,
+so concurrent searches genuinely overlap instead of queueing behind one
+another.
+
+The live dashboard stream is the exception: it is served here, on the
+event loop, so open dashboards wait on the shared feed without holding
+one of the request threads.
+
+Run with an ASGI server, e.g.:
+    uvicorn asgi_app:application --workers 4
+
+WEB_THREADS sets the size of each worker's request thread pool.
+"""
+
+import asyncio
+import os
+import time
+import urllib.parse
+
+# Each request thread needs its own pooled connection, plus one for the
+# dashboard feed's checks
+os.environ.setdefault('JOBS_DB_POOL_SIZE', str(int(os.environ.get('WEB_THREADS', 16)) + 1))
+
+from a2wsgi import WSGIMiddleware
+from web_app import (
+    app, dashboard_feed, dashboard_messages, stream_start_generation,
+    DASHBOARD_STREAM_SECONDS, KEEPALIVE_SECONDS
+)
+
+wsgi_application = WSGIMiddleware(app, workers=int(os.environ.get('WEB_THREADS', 16)))
+
+# Feed checks are short but touch the database, so they run off the event
+# loop; one thread is enough since the feed checks at most once per tick
+_feed_lock = asyncio.Lock()
+
+async def _feed_messages(generation):
+    async with _feed_lock:
+        return await asyncio.to_thread(dashboard_messages, generation)
+
+async def dashboard_stream(scope, receive, send):
+    """The /api/dashboard/stream route of web_app.py, without a request thread"""
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    query = urllib.parse.parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    generation = stream_start_generation(headers.get('last-event-id'), query.get('since', [None])[0])
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no')
+        ]
+    })
+
+    async def write(text):
+        await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': True})
+
+    # The stream ends early when the client goes away
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await write('retry: 5000\n\n')
+        deadline = time.monotonic() + DASHBOARD_STREAM_SECONDS
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline and not disconnected.done():
+            messages, generation, done = await _feed_messages(generation)
+            for message in messages:
+                await write(message)
+            if done:
+                break
+            if messages:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                await write(': keepalive\n\n')
+                last_sent = time.monotonic()
+            await asyncio.wait([disconnected], timeout=dashboard_feed.interval)
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        disconnected.cancel()
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == '/api/dashboard/stream' and scope['method'] == 'GET':
+        await dashboard_stream(scope, receive, send)
+    else:
+        await wsgi_application(scope, receive, send)
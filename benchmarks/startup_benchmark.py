@@ -0,0 +1,157 @@
+"""
+Startup-time benchmark for the project's entry points.
+
+Imports each entry point in a fresh interpreter several times and reports
+the median wall time, the part of it spent on top of a bare interpreter,
+the module's own import time (from python -X importtime), which heavy
+dependencies ended up loaded and the packages that cost the most to import.
+Results can be saved as JSON and compared between runs, like
+web_benchmark.py.
+
+Examples:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 10 --output before.json
+    python benchmarks/startup_benchmark.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point name -> module imported to start it
+ENTRY_POINTS = {
+    'main': 'main',
+    'query_database': 'query_database',
+    'web_app': 'web_app',
+    'create_database': 'utils.create_database',
+    'clean_json': 'utils.clean_json',
+    'consumer': 'sm.consumer',
+    'producer': 'sm.producer'
+}
+
+# Dependencies worth knowing about when they load at startup
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'flask')
+
+# Packages listed per entry point, by import time
+TOP_PACKAGES = 3
+
+def run_import(module):
+    """(wall seconds, stderr, loaded heavy modules) of importing module in a new interpreter"""
+    code = 'pass' if module is None else (
+        f"import {module}, sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{completed.stderr.strip().splitlines()[-1]}")
+    return elapsed, completed.stderr, [name for name in completed.stdout.strip().split(',') if name]
+
+def parse_importtime(stderr, module):
+    """(module's cumulative import seconds, self seconds per top-level package)"""
+    cumulative = 0.0
+    packages = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        packages[name.split('.')[0]] += int(self_us) / 1e6
+        if name == module:
+            cumulative = int(cumulative_us) / 1e6
+    return cumulative, packages
+
+def measure(module, runs):
+    wall = []
+    imports = []
+    packages = Counter()
+    heavy = []
+    for _ in range(runs):
+        elapsed, stderr, heavy = run_import(module)
+        wall.append(elapsed)
+        if module is not None:
+            cumulative, run_packages = parse_importtime(stderr, module)
+            imports.append(cumulative)
+            packages.update(run_packages)
+    return {
+        'median_ms': round(statistics.median(wall) * 1000, 1),
+        'import_ms': round(statistics.median(imports) * 1000, 1) if imports else 0.0,
+        'heavy_modules': heavy,
+        'top_packages': [
+            {'package': name, 'ms': round(seconds / runs * 1000, 1)}
+            for name, seconds in packages.most_common(TOP_PACKAGES)
+        ]
+    }
+
+def print_results(results):
+    print(f"\nBare interpreter: {results['baseline_ms']} ms")
+    print(f"  {'entry point':<17}{'median ms':>10}{'extra ms':>10}{'import ms':>11}  heavy modules / top packages")
+    for name, stats in results['entry_points'].items():
+        top = ', '.join(f"{item['package']} {item['ms']}" for item in stats['top_packages'])
+        heavy = ','.join(stats['heavy_modules']) or '-'
+        print(f"  {name:<17}{stats['median_ms']:>10}{stats['extra_ms']:>10}{stats['import_ms']:>11}  {heavy} / {top}")
+
+def compare_results(baseline, current):
+    """Print the change in startup time against a baseline run"""
+    print(f"\nComparison against baseline ({baseline['config'].get('timestamp', 'unknown')}):")
+    for name, stats in current['entry_points'].items():
+        base = baseline['entry_points'].get(name)
+        if not base or not base['import_ms']:
+            continue
+        change = (stats['import_ms'] - base['import_ms']) / base['import_ms'] * 100
+        print(f"  {name:<17}import_ms {base['import_ms']} -> {stats['import_ms']} ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the import time of each entry point')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters started per entry point')
+    parser.add_argument('--only', help='comma separated entry points to measure (default: all)')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON results to compare against')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(',')] if args.only else list(ENTRY_POINTS)
+    runs = max(1, args.runs)
+
+    # Compile bytecode first so no run pays for it
+    for name in names:
+        run_import(ENTRY_POINTS[name])
+
+    baseline_ms = measure(None, runs)['median_ms']
+    results = {
+        'config': {
+            'runs': runs,
+            'python': sys.version.split()[0],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'baseline_ms': baseline_ms,
+        'entry_points': {}
+    }
+    for name in names:
+        print(f"Measuring {name}...")
+        stats = measure(ENTRY_POINTS[name], runs)
+        stats['extra_ms'] = round(stats['median_ms'] - baseline_ms, 1)
+        results['entry_points'][name] = stats
+
+    print_results(results)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare_results(json.load(file), results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
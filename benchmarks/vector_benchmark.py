@@ -0,0 +1,171 @@
+"""
+Recall / latency benchmark for the job vector index (utils/vectors.py).
+
+Builds the vector index of a database (a synthetic one from
+web_benchmark.py unless --db is given), takes the stored vectors of random
+jobs as queries and compares the approximate search over the nprobe
+closest k-means lists with the exhaustive scan: recall@k against the
+exact results and p50/p95 latency per query, plus the throughput of the
+exhaustive scan when queries are batched. Results can be saved as JSON and
+compared between runs, like web_benchmark.py.
+
+Examples:
+    python benchmarks/vector_benchmark.py --rows 100000
+    python benchmarks/vector_benchmark.py --db jobs_database.db --nprobe 1,4,16,64
+    python benchmarks/vector_benchmark.py --reuse --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+
+from utils.descriptions import register_functions
+from utils.vectors import VectorIndex, build_vectors, vector_path
+from web_benchmark import generate_database, percentile
+
+def build_index(db_path, reuse):
+    """Open the index of db_path, building it unless reuse finds one"""
+    path = vector_path(db_path)
+    index = VectorIndex.open(path) if reuse else None
+    if index is None:
+        print(f"Building vector index at {path}...")
+        conn = sqlite3.connect(db_path)
+        register_functions(conn)
+        start = time.perf_counter()
+        rows = build_vectors(conn, path)
+        conn.close()
+        print(f"Embedded {rows:,} jobs in {time.perf_counter() - start:.1f}s")
+        index = VectorIndex.open(path)
+    return index
+
+def timed_search(index, queries, k, nprobe):
+    """(result ids per query, latency of each query in seconds)"""
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        ids, _ = index.search(query, k, nprobe=nprobe)
+        latencies.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return results, latencies
+
+def recall(results, exact, k):
+    """Share of the exact top k found, averaged over queries"""
+    found = [len(set(result[:k].tolist()) & set(truth[:k].tolist())) / min(k, len(truth))
+             for result, truth in zip(results, exact) if len(truth)]
+    return sum(found) / len(found) if found else 0.0
+
+def summarize(latencies, found):
+    values = sorted(latencies)
+    return {
+        'recall': round(found, 4),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3)
+    }
+
+def print_results(results):
+    print(f"\n{results['config']['jobs']:,} jobs, {results['config']['lists']} lists, "
+          f"{results['config']['queries']} queries, recall@{results['config']['k']}:")
+    print(f"  {'nprobe':<10}{'recall':>9}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for nprobe, stats in results['nprobe'].items():
+        print(f"  {nprobe:<10}{stats['recall']:>9}{stats['mean_ms']:>10}{stats['p50_ms']:>10}{stats['p95_ms']:>10}")
+    print("\nExhaustive scan, batched:")
+    for batch, stats in results['batched'].items():
+        print(f"  batch {batch:<5}{stats['queries_per_second']:>10} queries/s")
+
+def compare_results(baseline, current):
+    """Print the change in recall and latency against a baseline run"""
+    print(f"\nComparison against baseline ({baseline['config'].get('timestamp', 'unknown')}):")
+    for nprobe, stats in current['nprobe'].items():
+        base = baseline['nprobe'].get(nprobe)
+        if not base:
+            continue
+        changes = [f"recall {stats['recall'] - base['recall']:+.4f}"]
+        for key in ('p50_ms', 'p95_ms'):
+            if base[key]:
+                changes.append(f"{key} {(stats[key] - base[key]) / base[key] * 100:+.1f}%")
+        print(f"  {nprobe:<10}" + '  '.join(changes))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark recall and latency of the job vector index')
+    parser.add_argument('--db', help='database to index (default: a synthetic one)')
+    parser.add_argument('--rows', type=int, default=100000, help='rows in the synthetic database')
+    parser.add_argument('--workdir', default=os.path.join(REPO_ROOT, 'benchmarks', 'data'),
+                        help='where the synthetic database is written')
+    parser.add_argument('--reuse', action='store_true', help='reuse an existing database and vector index')
+    parser.add_argument('--queries', type=int, default=200, help='query jobs sampled')
+    parser.add_argument('--k', type=int, default=10, help='results per query')
+    parser.add_argument('--nprobe', default='1,2,4,8,16,32', help='comma separated lists scanned per query')
+    parser.add_argument('--batches', default='1,16,64', help='comma separated batch sizes for the exhaustive scan')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON results to compare against')
+    args = parser.parse_args()
+
+    if args.db:
+        db_path = os.path.abspath(args.db)
+    else:
+        os.makedirs(args.workdir, exist_ok=True)
+        db_path = os.path.join(args.workdir, 'jobs_database.db')
+        if not (args.reuse and os.path.exists(db_path)):
+            generate_database(db_path, args.rows, args.seed)
+    index = build_index(db_path, args.reuse)
+    if index is None or not len(index):
+        print("Error: the vector index is empty")
+        return
+
+    rng = random.Random(args.seed)
+    job_ids = rng.sample(index.job_ids.tolist(), min(args.queries, len(index)))
+    queries = np.array([index.vector(job_id) for job_id in job_ids])
+
+    # Warm up the page cache of the memory-mapped vectors
+    index.search(queries[:1], args.k, nprobe=0)
+
+    exact, exact_latencies = timed_search(index, queries, args.k, 0)
+    results = {
+        'config': {
+            'db': db_path,
+            'jobs': len(index),
+            'lists': len(index.centroids),
+            'queries': len(queries),
+            'k': args.k,
+            'seed': args.seed,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'nprobe': {'exact': summarize(exact_latencies, 1.0)},
+        'batched': {}
+    }
+    for nprobe in [int(value) for value in args.nprobe.split(',') if value.strip()]:
+        found, latencies = timed_search(index, queries, args.k, nprobe)
+        results['nprobe'][str(nprobe)] = summarize(latencies, recall(found, exact, args.k))
+
+    for batch in [int(value) for value in args.batches.split(',') if value.strip()]:
+        start = time.perf_counter()
+        for offset in range(0, len(queries), batch):
+            index.search(queries[offset:offset + batch], args.k, nprobe=0)
+        elapsed = time.perf_counter() - start
+        results['batched'][str(batch)] = {'queries_per_second': round(len(queries) / elapsed, 1)}
+
+    print_results(results)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare_results(json.load(file), results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
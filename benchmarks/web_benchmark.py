@@ -0,0 +1,337 @@
+"""
+Load-testing and latency benchmark for the web application.
+
+Builds a synthetic jobs_database.db with the same schema as
+utils/create_database.py, then drives the main routes with a weighted mix
+of realistic requests at several concurrency levels and reports throughput
+and p50/p95/p99 latency per route. Results can be saved as JSON and
+compared between runs to catch regressions.
+
+Examples:
+    python benchmarks/web_benchmark.py --rows 100000 --concurrency 1,8,32
+    python benchmarks/web_benchmark.py --output before.json
+    python benchmarks/web_benchmark.py --output after.json --compare before.json
+    python benchmarks/web_benchmark.py --server http://localhost:5000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils.create_database import bulk_load_jobs
+
+ROLES = [
+    'Software Engineer', 'Data Engineer', 'Data Scientist', 'Python Developer',
+    'Backend Developer', 'Frontend Developer', 'DevOps Engineer', 'Product Manager',
+    'Cybersecurity Analyst', 'Cloud Architect', 'QA Engineer', 'Machine Learning Engineer',
+    'Business Analyst', 'Project Manager', 'Sales Manager', 'Marketing Specialist'
+]
+SENIORITY = ['Junior', 'Senior', 'Lead', 'Principal', 'Staff', '', '', '']
+CITIES = [
+    'Berlin', 'Munich', 'Paris', 'Lyon', 'Madrid', 'Barcelona', 'Lisbon', 'Amsterdam',
+    'Brussels', 'Vienna', 'Zurich', 'Milan', 'Rome', 'Warsaw', 'Prague', 'Dublin',
+    'London', 'Stockholm', 'Copenhagen', 'Oslo', 'Helsinki', 'Budapest', 'Athens'
+]
+COUNTRIES = ['Germany', 'France', 'Spain', 'Portugal', 'Netherlands', 'Belgium', 'Austria',
+             'Switzerland', 'Italy', 'Poland', 'Czechia', 'Ireland', 'United Kingdom', 'Sweden']
+SKILLS = [
+    'Python', 'SQL', 'Java', 'JavaScript', 'TypeScript', 'React', 'Kubernetes', 'Docker',
+    'AWS', 'Azure', 'GCP', 'Terraform', 'Spark', 'Kafka', 'Pandas', 'Linux', 'Go', 'Rust',
+    'Security', 'Networking', 'Agile', 'Scrum', 'Excel', 'Tableau'
+]
+WORDS = (
+    'we are looking for a motivated engineer to join our growing team you will design build '
+    'and operate scalable services work closely with product and data teams remote hybrid '
+    'office flexible hours competitive salary benefits experience with cloud infrastructure '
+    'security compliance testing automation deployment monitoring customers platform analytics '
+    'python java sql kubernetes docker aws azure react typescript cybersecurity machine learning'
+).split()
+NAME_PARTS = ['Tech', 'Data', 'Soft', 'Cloud', 'Net', 'Info', 'Digi', 'Cyber', 'Smart', 'Global',
+              'Euro', 'Next', 'Blue', 'Green', 'Nova', 'Alpha', 'Prime', 'Quantum', 'Hyper', 'Open']
+NAME_SUFFIXES = ['Solutions', 'Systems', 'Labs', 'GmbH', 'SA', 'Group', 'Consulting', 'Talent', 'AG', 'BV']
+
+# Relative weight of each route in the request mix
+ROUTE_WEIGHTS = {
+    'search': 60,
+    'dashboard': 15,
+    'company': 15,
+    'companies': 5,
+    'locations': 5
+}
+
+def make_companies(count, rng):
+    names = set()
+    while len(names) < count:
+        names.add(f"{rng.choice(NAME_PARTS)}{rng.choice(NAME_PARTS).lower()} {rng.choice(NAME_SUFFIXES)} {len(names)}")
+    return sorted(names)
+
+def make_locations(count, rng):
+    locations = []
+    for i in range(count):
+        city, country = rng.choice(CITIES), rng.choice(COUNTRIES)
+        locations.append(f"{city}, {country}" if i < len(CITIES) * 2 else f"{city} Area {i}, {country}")
+    return locations
+
+def iter_synthetic_jobs(rows, companies, locations, rng):
+    """Yield job tuples (as job_to_tuple builds them) with Zipf-like skew on companies/locations"""
+    company_weights = [1.0 / (rank + 1) for rank in range(len(companies))]
+    location_weights = [1.0 / (rank + 1) for rank in range(len(locations))]
+    company_picks = iter(())
+    location_picks = iter(())
+    
+    for job_id in range(rows):
+        if job_id % 10000 == 0:
+            company_picks = iter(rng.choices(companies, company_weights, k=10000))
+            location_picks = iter(rng.choices(locations, location_weights, k=10000))
+        
+        title = f"{rng.choice(SENIORITY)} {rng.choice(ROLES)}".strip()
+        description = ' '.join(rng.choices(WORDS, k=rng.randint(80, 250)))
+        created_at = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00"
+        yield (
+            title,
+            description,
+            title,
+            f"https://www.linkedin.com/jobs/view/{job_id}",
+            next(location_picks),
+            ', '.join(rng.sample(SKILLS, rng.randint(2, 6))),
+            None,
+            rng.choice(['LISTED', 'LISTED', 'LISTED', 'CLOSED']),
+            str(rng.randint(1, 10 ** 9)),
+            next(company_picks),
+            None,
+            created_at,
+            '2025-01-01 00:00:00'
+        )
+
+def generate_database(path, rows, seed=42):
+    """Create a synthetic database with the production schema at path"""
+    rng = random.Random(seed)
+    companies = make_companies(max(1, rows // 5), rng)
+    locations = make_locations(max(1, rows // 16), rng)
+    
+    if os.path.exists(path):
+        os.remove(path)
+    
+    print(f"Generating synthetic database with {rows:,} rows at {path}...")
+    start = time.perf_counter()
+    conn = sqlite3.connect(path, isolation_level=None)
+    # The same load and derived tables as a full import of real data
+    bulk_load_jobs(conn.cursor(), iter_synthetic_jobs(rows, companies, locations, rng), progress=lambda message: None)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.close()
+    
+    print(f"Generated in {time.perf_counter() - start:.1f}s")
+    return companies
+
+def make_request_mix(count, companies, rng):
+    """Build a list of (route, url) following ROUTE_WEIGHTS and popular-term skew"""
+    search_terms = [word for word in set(WORDS + [skill.lower() for skill in SKILLS]) if len(word) > 2]
+    search_terms.sort()
+    term_weights = [1.0 / (rank + 1) for rank in range(len(search_terms))]
+    rng.shuffle(term_weights)
+    company_weights = [1.0 / (rank + 1) for rank in range(len(companies))]
+    
+    routes = rng.choices(list(ROUTE_WEIGHTS), list(ROUTE_WEIGHTS.values()), k=count)
+    requests = []
+    for route in routes:
+        if route == 'search':
+            term = rng.choices(search_terms, term_weights)[0]
+            if rng.random() < 0.3:
+                # Keystroke-style prefix query from the search box
+                term = term[:rng.randint(2, len(term))]
+            elif rng.random() < 0.3:
+                term = f"{term} {rng.choice(search_terms)}"
+            url = f"/api/search?q={urllib.parse.quote(term)}&limit=20"
+        elif route == 'company':
+            company = rng.choices(companies, company_weights)[0]
+            url = f"/api/company/{urllib.parse.quote(company)}"
+        elif route == 'dashboard':
+            url = '/'
+        else:
+            url = f"/{route}"
+        requests.append((route, url))
+    return requests
+
+def make_client(server):
+    """Return a function fetching a URL path and returning the status code"""
+    if server:
+        def fetch(path):
+            try:
+                with urllib.request.urlopen(server.rstrip('/') + path, timeout=30) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return fetch
+    
+    from web_app import app
+    local = threading.local()
+    
+    def fetch(path):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        return client.get(path).status_code
+    return fetch
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0
+    }
+
+def run_level(fetch, requests, concurrency):
+    """Replay the request mix with the given number of concurrent clients"""
+    latencies = {route: [] for route in ROUTE_WEIGHTS}
+    errors = {route: 0 for route in ROUTE_WEIGHTS}
+    lock = threading.Lock()
+    
+    def one(item):
+        route, url = item
+        start = time.perf_counter()
+        status = fetch(url)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[route].append(elapsed)
+            if status >= 400:
+                errors[route] += 1
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, requests))
+    elapsed = time.perf_counter() - start
+    
+    result = {'routes': {}}
+    for route in ROUTE_WEIGHTS:
+        if latencies[route]:
+            result['routes'][route] = summarize(latencies[route], errors[route], elapsed)
+    all_latencies = [value for values in latencies.values() for value in values]
+    result['overall'] = summarize(all_latencies, sum(errors.values()), elapsed)
+    return result
+
+def print_results(results):
+    for level, result in results['levels'].items():
+        print(f"\nConcurrency {level}:")
+        print(f"  {'route':<12}{'requests':>9}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        rows = list(result['routes'].items()) + [('overall', result['overall'])]
+        for route, stats in rows:
+            print(f"  {route:<12}{stats['requests']:>9}{stats['errors']:>8}{stats['throughput_rps']:>10}"
+                  f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+def compare_results(baseline, current):
+    """Print relative change of latency percentiles and throughput against a baseline run"""
+    print(f"\nComparison against baseline ({baseline['config'].get('timestamp', 'unknown')}):")
+    for level, result in current['levels'].items():
+        base_level = baseline['levels'].get(level)
+        if not base_level:
+            continue
+        print(f"\nConcurrency {level}:")
+        rows = list(result['routes'].items()) + [('overall', result['overall'])]
+        for route, stats in rows:
+            base = base_level['overall'] if route == 'overall' else base_level['routes'].get(route)
+            if not base:
+                continue
+            changes = []
+            for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                if base[key]:
+                    changes.append(f"{key} {(stats[key] - base[key]) / base[key] * 100:+.1f}%")
+            print(f"  {route:<12}" + '  '.join(changes))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the jobs web application routes')
+    parser.add_argument('--rows', type=int, default=100000, help='rows in the synthetic database (10k-5M)')
+    parser.add_argument('--workdir', default=os.path.join(REPO_ROOT, 'benchmarks', 'data'),
+                        help='directory holding the synthetic jobs_database.db')
+    parser.add_argument('--reuse', action='store_true', help='reuse an existing synthetic database')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per concurrency level')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma separated concurrency levels')
+    parser.add_argument('--server', help='benchmark a running server at this URL instead of the test client')
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON results to compare against')
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    os.makedirs(args.workdir, exist_ok=True)
+    db_path = os.path.join(args.workdir, 'jobs_database.db')
+    
+    if args.reuse and os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        companies = [row[0] for row in conn.execute(
+            'SELECT name FROM company_stats JOIN companies ON companies.id = company_id ORDER BY job_count DESC'
+        )]
+        conn.close()
+    else:
+        companies = generate_database(db_path, args.rows, args.seed)
+    
+    if args.no_cache:
+        os.environ['RESPONSE_CACHE_MAX_BYTES'] = '0'
+    # The web app opens jobs_database.db relative to the working directory
+    os.chdir(args.workdir)
+    
+    fetch = make_client(args.server)
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    requests = make_request_mix(args.requests, companies, rng)
+    
+    # Warm up connections and the page cache
+    for _, url in requests[:50]:
+        fetch(url)
+    
+    results = {
+        'config': {
+            'rows': args.rows,
+            'requests': args.requests,
+            'concurrency': levels,
+            'server': args.server or 'flask-test-client',
+            'response_cache': not args.no_cache,
+            'seed': args.seed,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'levels': {}
+    }
+    for level in levels:
+        print(f"Running {args.requests} requests at concurrency {level}...")
+        results['levels'][str(level)] = run_level(fetch, requests, level)
+    
+    print_results(results)
+    
+    if baseline:
+        with open(baseline, 'r', encoding='utf-8') as file:
+            compare_results(json.load(file), results)
+    
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults saved to '{output}'")
+
+if __name__ == "__main__":
+    main()
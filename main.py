@@ -13,6 +13,7 @@ Choose from different modes of operation:
 import os
 import sys
 import subprocess
+import time
 
 def print_banner():
     """Print application banner"""
@@ -48,7 +49,7 @@ def main_menu():
         print()
         
         if has_db:
-            print("1. 🌐 Start Web Application (Flask)")
+            print("1. 🌐 Start Web Application")
             print("2. 🔍 Interactive Database Queries")
             print("3. 📊 Advanced Analytics (Pandas)")
         
@@ -57,7 +58,7 @@ def main_menu():
         elif has_data:
             print("4. 🔄 Rebuild Database (Clean & Import)")
         
-        print("5. 🌊 Stream Mining Setup (Future)")
+        print("5. 🌊 Stream Ingest (Producer/Consumer)")
         print("6. 📋 View Project Structure")
         print("7. ❓ Help & Documentation")
         print("0. 🚪 Exit")
@@ -87,14 +88,32 @@ def main_menu():
             input("Press Enter to continue...")
 
 def start_web_app():
-    """Start the Flask web application"""
-    print("\n🌐 Starting Flask Web Application...")
+    """Start the web application"""
+    print("\n🌐 Starting Web Application...")
+    print("1. Production server (ASGI via uvicorn, multiple workers)")
+    print("2. Development server (Flask debug mode)")
+    mode = input("Select server mode (1-2, default 1): ").strip() or '1'
+    
+    command = [sys.executable, 'web_app.py']
+    if mode == '1':
+        default_workers = os.cpu_count() or 1
+        workers = input(f"Number of worker processes (default {default_workers}): ").strip()
+        workers = int(workers) if workers.isdigit() and int(workers) > 0 else default_workers
+        command = [
+            sys.executable, '-m', 'uvicorn', 'asgi_app:application',
+            '--host', '0.0.0.0', '--port', '5000',
+            '--workers', str(workers)
+        ]
+        print(f"\n⚙️  {workers} worker(s), {os.environ.get('WEB_THREADS', 16)} request threads each")
+    
     print("📍 Server will be available at: http://localhost:5000")
     print("⏹️  Press Ctrl+C to stop the server")
     print()
     
     try:
-        subprocess.run([sys.executable, 'web_app.py'])
+        # Servers keep their own process: uvicorn forks workers and Flask's
+        # reloader re-executes the script it was started from
+        subprocess.run(command)
     except KeyboardInterrupt:
         print("\n🛑 Web server stopped.")
     except FileNotFoundError:
@@ -107,10 +126,12 @@ def run_queries():
     print("\n🔍 Starting Interactive Query Tool...")
     print()
     
+    # Imported on demand so the menu itself starts instantly
+    import query_database
     try:
-        subprocess.run([sys.executable, 'query_database.py'])
-    except FileNotFoundError:
-        print("❌ query_database.py not found!")
+        query_database.main()
+    except KeyboardInterrupt:
+        print("\n🛑 Query tool stopped.")
     
     input("\nPress Enter to return to main menu...")
 
@@ -121,33 +142,70 @@ def run_analytics():
     print("2. Location Trends")
     print("3. Job Market Overview")
     print("4. Export Reports")
+    choice = input("Select an option (1-4): ").strip()
+    
+    reports = {'1': 'company_analysis', '2': 'location_trends', '3': 'market_overview'}
+    if choice not in reports and choice != '4':
+        input("\n❌ Invalid option. Press Enter to continue...")
+        return
+    
+    # sqlite3.connect would create an empty database in its place
+    if not check_database():
+        input("\n❌ Database not found. Please set up the database first. Press Enter to continue...")
+        return
+    
+    # pandas is loaded here rather than when the menu starts
+    import sqlite3
+    from utils.analytics import JobAnalytics, print_report
     
-    # This could be extended with specific analytics functions
-    input("\n⚠️  Advanced analytics will be implemented in future updates.\nPress Enter to continue...")
+    conn = sqlite3.connect('jobs_database.db')
+    try:
+        analytics = JobAnalytics(conn)
+        start = time.perf_counter()
+        if choice == '4':
+            paths = analytics.export()
+            print(f"\n📁 Wrote {len(paths)} report files to 'reports/':")
+            for path in paths:
+                print(f"   • {path}")
+        else:
+            print_report(analytics.report(reports[choice]))
+        print(f"\n⏱️  Done in {time.perf_counter() - start:.2f}s (results are cached until the next import)")
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+    except Exception as e:
+        print(f"❌ Error while building the report: {e}")
+    finally:
+        conn.close()
+    
+    input("\nPress Enter to continue...")
 
 def setup_database():
     """Setup or rebuild the database"""
     print("\n🗄️ Database Setup Process:")
-    print("1. Cleaning JSON data...")
-    print("2. Creating database structure...")
-    print("3. Importing job records...")
+    print("1. Creating database structure...")
+    print("2. Streaming, cleaning and importing job records...")
     print()
     
+    # An existing database can be refreshed in place with only the changes
+    mode = '--bulk'
+    if os.path.exists('jobs_database.db'):
+        print("A database already exists:")
+        print("1. Incremental refresh (apply new, changed and removed jobs)")
+        print("2. Full rebuild")
+        if input("Choose an option (1-2): ").strip() == '1':
+            mode = '--incremental'
+    
+    from utils import create_database
     try:
-        # Step 1: Clean data
-        print("📋 Step 1: Cleaning data...")
-        subprocess.run([sys.executable, 'utils/clean_json.py'], check=True)
-        
-        # Step 2: Create database
-        print("🏗️  Step 2: Creating database...")
-        subprocess.run([sys.executable, 'utils/create_database.py'], check=True)
+        # Records are cleaned on the fly while importing, no intermediate file needed.
+        # --bulk builds a fresh database with indexes created after the load.
+        print("🏗️  Creating database and importing data...")
+        create_database.main([mode])
         
         print("\n✅ Database setup completed successfully!")
         
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error during database setup: {e}")
-    except FileNotFoundError:
-        print("❌ Required setup files not found in utils/ directory!")
+    except KeyboardInterrupt:
+        print("\n🛑 Database setup interrupted.")
     
     input("\nPress Enter to return to main menu...")
 
@@ -159,23 +217,23 @@ def stream_mining_info():
     print("📁 Location: sm/ directory")
     print("🎯 Purpose: Real-time data ingestion and processing")
     print()
-    print("📋 Current Components:")
-    print("   • producer.py - Kafka data producer")
-    print("   • consumer.py - Kafka data consumer")
-    print("   • values.yaml - Kafka configuration")
+    print("📋 Components:")
+    print("   • transports.py - Kafka, file-tailing and in-memory transports")
+    print("   • producer.py - Publishes raw job records to the stream")
+    print("   • consumer.py - Micro-batches records into the database")
     print()
-    print("🚧 Development Status: Foundation Implemented")
+    print("▶️  Running it (from the project root):")
+    print("   python -m sm.consumer                      # file transport, job_stream.jsonl")
+    print("   python -m sm.producer --source new_jobs.json")
+    print("   Add --transport kafka (KAFKA_BOOTSTRAP_SERVERS, KAFKA_TOPIC) to use Kafka")
     print()
-    print("🔮 Future Extensions:")
-    print("   • Live job feed integration")
-    print("   • Real-time dashboard updates")
-    print("   • Stream processing with Apache Kafka")
-    print("   • Event-driven data pipeline orchestration")
-    print("   • Trend analysis and alerts")
+    print("⚙️  Consumer options:")
+    print("   --batch-size N   records per database transaction (default 500)")
+    print("   --linger S       seconds to wait for a batch to fill (default 1.0)")
     print()
-    print("💡 The streaming infrastructure is designed to handle")
-    print("   high-volume job data streams and provide real-time")
-    print("   updates to the web application dashboard.")
+    print("💡 Records are upserted by Detail URL; the search index, dashboard")
+    print("   statistics and web response cache update with every batch, and")
+    print("   the consumer reports end-to-end ingest lag per batch.")
     
     input("\nPress Enter to return to main menu...")
 
@@ -206,10 +264,11 @@ ds-lab-2/
 │   ├── query_database.py      # Advanced database queries
 │   └── main.py               # Main application entry point
 │
-├── 🌊 Stream Mining (Future Extension)
-│   ├── producer.py           # Kafka data producer
-│   ├── consumer.py           # Kafka data consumer  
-│   └── values.yaml          # Kafka configuration
+├── 🌊 Stream Ingest
+│   └── sm/
+│       ├── transports.py     # Kafka / file / in-memory transports
+│       ├── producer.py       # Job stream producer
+│       └── consumer.py       # Micro-batching database consumer
 │
 └── ⚙️ Configuration
     ├── requirements.txt      # Python dependencies
@@ -1,5 +1,53 @@
+import os
 import sqlite3
-import pandas as pd
+from utils.create_database import build_fts_query, FTS_RANK, DB_NAME
+from utils.descriptions import register_functions
+from utils.export import write_export, iter_csv, iter_row_chunks
+from utils.profiling import ProfilingConnection, QueryProfiler
+from utils.shards import SHARDED_STORAGE, ShardSet, SingleUsePool, catalog_path, merge_sorted
+from utils.snapshot import count_by, open_snapshot, snapshot_path
+
+# Statements run by this tool are timed; slow ones are logged with their plan
+profiler = QueryProfiler(slow_ms=float(os.environ.get('SLOW_QUERY_MS', 200)))
+
+def connect(db_name=None):
+    """
+    Open the jobs database with statement profiling; with sharded storage
+    (JOBS_SHARDED=1) the catalog, which has the same summary tables
+    """
+    if db_name is None:
+        db_name = catalog_path() if SHARDED_STORAGE else DB_NAME
+    conn = sqlite3.connect(db_name, factory=ProfilingConnection)
+    conn.profiler = profiler
+    register_functions(conn)
+    return conn
+
+def open_shards():
+    """The monthly shards, each read through its own connection"""
+    return ShardSet(lambda path: SingleUsePool(lambda: connect(path)))
+
+def print_query_profile():
+    """Print the statements run so far, most total time first"""
+    queries = profiler.queries()
+    if not queries:
+        return
+    print("\nQuery profile:")
+    print(f"{'total ms':>10} {'calls':>6} {'rows':>8}  statement")
+    for query in queries:
+        print(f"{query['total_ms']:>10.1f} {query['count']:>6} {query['rows']:>8}  {query['sql'][:90]}")
+        if query['full_scan']:
+            print(f"{'':>27}full scan: {'; '.join(query['plan'])}")
+
+def print_table(cursor):
+    """Print a small result set as right-aligned columns under a header row"""
+    print_rows([column[0] for column in cursor.description], cursor.fetchall())
+
+def print_rows(columns, rows):
+    """Print rows as right-aligned columns under a header row"""
+    rows = [['' if value is None else str(value) for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[i]) for row in rows]) for i, column in enumerate(columns)]
+    for row in [columns] + rows:
+        print(' '.join(value.rjust(width) for value, width in zip(row, widths)))
 
 def query_database():
     """
@@ -7,60 +55,37 @@ def query_database():
     """
     
     try:
-        conn = sqlite3.connect('jobs_database.db')
+        conn = connect()
         
         print("Jobs Database Query Tool")
         print("=" * 50)
         
-        # Basic statistics
-        print("\n1. Database Overview:")
-        df_count = pd.read_sql_query("SELECT COUNT(*) as total_jobs FROM jobs", conn)
-        print(f"Total jobs: {df_count['total_jobs'].iloc[0]}")
-        
-        # Top companies
-        print("\n2. Top 10 Companies by Job Count:")
-        df_companies = pd.read_sql_query("""
-            SELECT company_name, COUNT(*) as job_count 
-            FROM jobs 
-            WHERE company_name IS NOT NULL 
-            GROUP BY company_name 
-            ORDER BY job_count DESC 
-            LIMIT 10
-        """, conn)
-        print(df_companies.to_string(index=False))
-        
-        # Top locations
-        print("\n3. Top 10 Locations:")
-        df_locations = pd.read_sql_query("""
-            SELECT location, COUNT(*) as job_count 
-            FROM jobs 
-            WHERE location IS NOT NULL 
-            GROUP BY location 
-            ORDER BY job_count DESC 
-            LIMIT 10
-        """, conn)
-        print(df_locations.to_string(index=False))
-        
-        # Job states
-        print("\n4. Job States Distribution:")
-        df_states = pd.read_sql_query("""
-            SELECT job_state, COUNT(*) as count 
-            FROM jobs 
-            GROUP BY job_state 
-            ORDER BY count DESC
-        """, conn)
-        print(df_states.to_string(index=False))
+        # The columnar snapshot answers the counts when it matches the database
+        snapshot = None if SHARDED_STORAGE else open_snapshot(conn)
+        if snapshot is not None:
+            print(f"(counts from the columnar snapshot '{snapshot_path()}')")
+            snapshot_overview(snapshot)
+        else:
+            sqlite_overview(conn)
         
         # Recent jobs
         print("\n5. Sample of Recent Jobs:")
-        df_recent = pd.read_sql_query("""
+        recent_query = """
             SELECT title, company_name, location, created_at 
-            FROM jobs 
+            FROM job_details 
             WHERE created_at IS NOT NULL 
             ORDER BY created_at DESC 
             LIMIT 5
-        """, conn)
-        print(df_recent.to_string(index=False))
+        """
+        if SHARDED_STORAGE:
+            # Every shard's newest jobs, merged newest first
+            shards = open_shards()
+            pages = shards.map(lambda shard_conn, shard: shard_conn.execute(recent_query).fetchall(),
+                               shards.shards())
+            print_rows(['title', 'company_name', 'location', 'created_at'],
+                       merge_sorted(pages, lambda row: row[3], 5, reverse=True))
+        else:
+            print_table(conn.execute(recent_query))
         
         conn.close()
         
@@ -69,36 +94,115 @@ def query_database():
     except Exception as e:
         print(f"Error: {e}")
 
-def export_to_csv():
-    """Export database to CSV files"""
+def snapshot_overview(table):
+    """Overview, top companies and locations and job states from the Arrow snapshot"""
+    print("\n1. Database Overview:")
+    print(f"Total jobs: {table.num_rows}")
+    
+    print("\n2. Top 10 Companies by Job Count:")
+    print_rows(['company_name', 'job_count'], count_by(table, 'company', 10))
+    
+    print("\n3. Top 10 Locations:")
+    print_rows(['location', 'job_count'], count_by(table, 'location', 10))
+    
+    print("\n4. Job States Distribution:")
+    print_rows(['job_state', 'count'], count_by(table, 'job_state'))
+
+def sqlite_overview(conn):
+    """The same overview from the database, when there is no current snapshot"""
+    # Basic statistics
+    print("\n1. Database Overview:")
+    total_jobs = conn.execute("SELECT value as total_jobs FROM global_stats WHERE name = 'total_jobs'").fetchone()[0]
+    print(f"Total jobs: {total_jobs}")
+    
+    # Top companies
+    print("\n2. Top 10 Companies by Job Count:")
+    print_table(conn.execute("""
+        SELECT companies.name as company_name, job_count 
+        FROM company_stats 
+        JOIN companies ON companies.id = company_stats.company_id
+        ORDER BY job_count DESC 
+        LIMIT 10
+    """))
+    
+    # Top locations
+    print("\n3. Top 10 Locations:")
+    print_table(conn.execute("""
+        SELECT locations.name as location, job_count 
+        FROM location_stats 
+        JOIN locations ON locations.id = location_stats.location_id
+        ORDER BY job_count DESC 
+        LIMIT 10
+    """))
+    
+    # Job states; the shard catalog keeps them counted (NULL stored as '')
+    print("\n4. Job States Distribution:")
+    if SHARDED_STORAGE:
+        print_table(conn.execute("""
+            SELECT NULLIF(job_state, '') as job_state, job_count as count
+            FROM job_state_stats
+            ORDER BY count DESC
+        """))
+        return
+    print_table(conn.execute("""
+        SELECT job_state, COUNT(*) as count 
+        FROM jobs 
+        WHERE canonical_id IS NULL
+        GROUP BY job_state 
+        ORDER BY count DESC
+    """))
+
+def export_to_csv(path='jobs_export.csv', export_format='csv', **filters):
+    """
+    Export the jobs table to CSV (or gzip CSV / Parquet), streaming rows in
+    chunks so memory use stays flat however large the table is.
+    Optional filters: company, location, date_from, date_to.
+    """
+    if SHARDED_STORAGE:
+        print("Export is not available with sharded storage")
+        return
+    
     try:
-        conn = sqlite3.connect('jobs_database.db')
+        conn = connect()
         
-        # Export full data
-        print("Exporting full database to CSV...")
-        df_all = pd.read_sql_query("SELECT * FROM jobs", conn)
-        df_all.to_csv('jobs_export.csv', index=False)
-        print(f"Exported {len(df_all)} records to 'jobs_export.csv'")
+        # Export job data
+        print(f"Exporting jobs to '{path}'...")
+        exported = write_export(conn, path, export_format, **filters)
+        print(f"Exported {exported} records to '{path}'")
         
         # Export summary by company
         print("Exporting company summary...")
-        df_company_summary = pd.read_sql_query("""
+        summary_query = """
             SELECT 
-                company_name,
-                COUNT(*) as total_jobs,
-                COUNT(DISTINCT location) as locations_count,
-                MIN(created_at) as first_job_date,
-                MAX(created_at) as latest_job_date
-            FROM jobs 
-            WHERE company_name IS NOT NULL 
-            GROUP BY company_name 
-            ORDER BY total_jobs DESC
-        """, conn)
-        df_company_summary.to_csv('company_summary.csv', index=False)
+                companies.name as company_name,
+                summary.total_jobs,
+                summary.locations_count,
+                summary.first_job_date,
+                summary.latest_job_date
+            FROM (
+                SELECT 
+                    company_id,
+                    COUNT(*) as total_jobs,
+                    COUNT(DISTINCT location_id) as locations_count,
+                    MIN(created_at) as first_job_date,
+                    MAX(created_at) as latest_job_date
+                FROM jobs 
+                WHERE company_id IS NOT NULL 
+                GROUP BY company_id
+            ) AS summary
+            JOIN companies ON companies.id = summary.company_id
+            ORDER BY summary.total_jobs DESC
+        """
+        columns = ['company_name', 'total_jobs', 'locations_count', 'first_job_date', 'latest_job_date']
+        with open('company_summary.csv', 'w', encoding='utf-8', newline='') as file:
+            for piece in iter_csv(iter_row_chunks(conn, summary_query), columns):
+                file.write(piece)
         print(f"Exported company summary to 'company_summary.csv'")
         
         conn.close()
         
+    except ImportError:
+        print("Parquet export requires pyarrow (pip install pyarrow)")
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     except Exception as e:
@@ -106,39 +210,51 @@ def export_to_csv():
 
 def search_jobs(keyword, limit=10):
     """Search for jobs containing a keyword"""
+    match_query = build_fts_query(keyword)
+    if not match_query:
+        print("Please enter at least one word to search for.")
+        return
+    
     try:
-        conn = sqlite3.connect('jobs_database.db')
-        
-        query = """
-            SELECT title, company_name, location, description
-            FROM jobs 
-            WHERE title LIKE ? OR description LIKE ? OR company_name LIKE ?
+        query = f"""
+            SELECT jobs.title, jobs.company_name, jobs.location, jobs.snippet, {FTS_RANK} AS score
+            FROM jobs_fts
+            JOIN job_details AS jobs ON jobs.id = jobs_fts.rowid
+            WHERE jobs_fts MATCH ?
+            ORDER BY score
             LIMIT ?
         """
         
-        search_term = f"%{keyword}%"
-        df_results = pd.read_sql_query(query, conn, params=[search_term, search_term, search_term, limit])
+        if SHARDED_STORAGE:
+            # Each shard's best matches, merged by rank. BM25 weighs terms by
+            # how rare they are in each shard, so ranks are close, not equal,
+            # to those of a single database.
+            shards = open_shards()
+            pages = shards.map(lambda conn, shard: conn.execute(query, [match_query, limit]).fetchall(),
+                               shards.shards())
+            results = merge_sorted(pages, lambda row: row[4], limit)
+        else:
+            conn = connect()
+            results = conn.execute(query, [match_query, limit]).fetchall()
+            conn.close()
         
         print(f"\nSearch results for '{keyword}':")
         print("=" * 50)
         
-        for idx, row in df_results.iterrows():
-            print(f"\n{idx+1}. {row['title']}")
-            print(f"   Company: {row['company_name']}")
-            print(f"   Location: {row['location']}")
-            print(f"   Description: {row['description'][:200]}...")
-        
-        conn.close()
+        for idx, (title, company_name, location, snippet, _) in enumerate(results):
+            print(f"\n{idx+1}. {title}")
+            print(f"   Company: {company_name}")
+            print(f"   Location: {location}")
+            print(f"   Description: {snippet}")
         
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     except Exception as e:
         print(f"Error: {e}")
 
-if __name__ == "__main__":
-    # Check if database exists
-    import os
-    if not os.path.exists('jobs_database.db'):
+def main():
+    """Interactive session, run as a script or in-process from main.py"""
+    if not os.path.exists(catalog_path() if SHARDED_STORAGE else DB_NAME):
         print("Database not found. Please run create_database.py first.")
     else:
         query_database()
@@ -146,9 +262,18 @@ if __name__ == "__main__":
         # Ask user if they want to export
         response = input("\nWould you like to export data to CSV? (y/n): ")
         if response.lower() == 'y':
-            export_to_csv()
+            export_format = input("Format - csv, csv.gz or parquet (default csv): ").strip() or 'csv'
+            if export_format not in ('csv', 'csv.gz', 'parquet'):
+                print(f"Unknown format '{export_format}', using csv")
+                export_format = 'csv'
+            export_to_csv(f'jobs_export.{export_format}', export_format)
         
         # Ask for search
         search_term = input("\nEnter a keyword to search jobs (or press Enter to skip): ")
         if search_term.strip():
-            search_jobs(search_term)
\ No newline at end of file
+            search_jobs(search_term)
+        
+        print_query_profile()
+
+if __name__ == "__main__":
+    main()
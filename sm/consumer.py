@@ -0,0 +1,190 @@
+"""
+Job stream consumer.
+
+Pulls job messages from the ingest transport in micro-batches and upserts
+them into jobs_database.db by detail_url. The database triggers keep the
+full-text index and the summary tables current, the batch's jobs are checked
+for near-duplicates of jobs already stored, and each batch bumps the data
+generation so the web app's response cache picks up the changes. Once the
+batch is committed, its jobs are added to the vector index if the importer
+has built one.
+
+A batch is written when batch_size messages have arrived or linger seconds
+have passed since its first message, whichever comes first. Offsets are
+committed only after the batch is in the database (at-least-once delivery;
+upserts make redelivery harmless). Messages that cannot be imported (not
+JSON, no job, no Detail URL) are appended to a dead-letter JSON Lines file
+and committed past, so the rest of their batch still goes in.
+
+Sharded storage (JOBS_SHARDED=1) is rebuilt in full only, so the consumer
+refuses to run against it.
+
+Usage (from the project root):
+    python -m sm.consumer
+    python -m sm.consumer --transport kafka --batch-size 1000 --linger 0.5
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+from sm.transports import add_transport_arguments, create_transport
+from utils.clean_json import normalize_record
+from utils.create_database import DB_NAME, create_schema, find_duplicates, job_to_tuple, upsert_jobs, bump_generation
+from utils.shards import SHARDED_STORAGE
+from utils.vectors import update_vectors, vector_path
+
+class JobConsumer:
+    """Micro-batching consumer writing job messages into the database"""
+    
+    def __init__(self, transport, db_name=DB_NAME, batch_size=500, linger=1.0, poll_timeout=1.0,
+                 dead_letter_path=None):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.linger = linger
+        self.poll_timeout = poll_timeout
+        self.dead_letter_path = dead_letter_path
+        self.stats = {'batches': 0, 'received': 0, 'upserted': 0, 'rejected': 0, 'max_lag': 0.0, 'total_lag': 0.0}
+        self.vector_path = vector_path(db_name)
+        
+        self.conn = sqlite3.connect(db_name)
+        cursor = self.conn.cursor()
+        cursor.execute('PRAGMA journal_mode = WAL')
+        cursor.execute('PRAGMA synchronous = NORMAL')
+        create_schema(cursor)
+        self.conn.commit()
+    
+    def collect_batch(self):
+        """Wait for the first message, then linger for more up to batch_size"""
+        messages = self.transport.poll(self.batch_size, self.poll_timeout)
+        if not messages:
+            return []
+        
+        deadline = time.monotonic() + self.linger
+        while len(messages) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            messages += self.transport.poll(self.batch_size - len(messages), remaining)
+        return messages
+    
+    def _job_tuple(self, message):
+        """Insert tuple of a message's job; raises ValueError when it cannot be imported"""
+        if 'undecodable' in message:
+            raise ValueError(f"not JSON: {message['error']}")
+        job = message.get('job')
+        if not isinstance(job, dict):
+            raise ValueError('no job record')
+        job_tuple = job_to_tuple(normalize_record(job))
+        if not isinstance(job_tuple[3], str) or not job_tuple[3]:
+            raise ValueError('no Detail URL')
+        # Anything else would fail the whole batch's insert
+        if any(value is not None and not isinstance(value, (str, int, float)) for value in job_tuple):
+            raise ValueError('field values must be strings or numbers')
+        return job_tuple
+    
+    def reject(self, message, error):
+        """Log a message that cannot be imported and append it to the dead-letter file"""
+        self.stats['rejected'] += 1
+        print(f"Rejected message: {error}")
+        if self.dead_letter_path:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps({'error': str(error), 'message': message}, ensure_ascii=False) + '\n')
+    
+    def process_batch(self, messages):
+        """Upsert one batch in a single transaction and record ingest lag"""
+        start = time.monotonic()
+        job_tuples = []
+        accepted = []
+        for message in messages:
+            if not isinstance(message, dict):
+                self.reject(message, 'not a JSON object')
+                continue
+            try:
+                job_tuples.append(self._job_tuple(message))
+                accepted.append(message)
+            except (ValueError, TypeError, AttributeError) as e:
+                self.reject(message, e)
+        
+        with self.conn:
+            cursor = self.conn.cursor()
+            upserted = upsert_jobs(cursor, job_tuples)
+            if upserted:
+                urls = [job_tuple[3] for job_tuple in job_tuples if job_tuple[3] is not None]
+                cursor.execute(f"SELECT id FROM jobs WHERE detail_url IN ({', '.join('?' * len(urls))})", urls)
+                find_duplicates(cursor, [row[0] for row in cursor.fetchall()])
+                bump_generation(cursor)
+        self.transport.commit()
+        if upserted:
+            try:
+                update_vectors(self.conn, self.vector_path, build=False)
+            except OSError as e:
+                print(f"Vector index not updated: {e}")
+        
+        # Lag from production to the batch being committed
+        committed_at = time.time()
+        lags = sorted(
+            committed_at - (produced_at if isinstance(produced_at, (int, float)) else committed_at)
+            for produced_at in (message.get('produced_at') for message in accepted)
+        ) or [0.0]
+        
+        self.stats['batches'] += 1
+        self.stats['received'] += len(messages)
+        self.stats['upserted'] += upserted
+        self.stats['total_lag'] += sum(lags)
+        self.stats['max_lag'] = max(self.stats['max_lag'], lags[-1])
+        
+        print(f"Batch {self.stats['batches']}: {len(messages)} received, {upserted} upserted "
+              f"in {time.monotonic() - start:.3f}s | lag p50 {lags[len(lags) // 2]:.3f}s, max {lags[-1]:.3f}s")
+        return upserted
+    
+    def run(self, max_idle=None):
+        """Consume until interrupted, or until max_idle seconds pass without messages"""
+        idle_since = time.monotonic()
+        while True:
+            messages = self.collect_batch()
+            if messages:
+                self.process_batch(messages)
+                idle_since = time.monotonic()
+            elif max_idle is not None and time.monotonic() - idle_since >= max_idle:
+                return
+    
+    def summary(self):
+        received = self.stats['received']
+        mean_lag = self.stats['total_lag'] / received if received else 0.0
+        return (f"{self.stats['batches']} batches, {received} records received, "
+                f"{self.stats['upserted']} upserted, {self.stats['rejected']} rejected | mean lag {mean_lag:.3f}s, max lag {self.stats['max_lag']:.3f}s")
+    
+    def close(self):
+        self.transport.close()
+        self.conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Consume the job stream into the database')
+    parser.add_argument('--batch-size', type=int, default=500, help='maximum records per database batch')
+    parser.add_argument('--linger', type=float, default=1.0, help='seconds to wait for a batch to fill')
+    parser.add_argument('--max-idle', type=float, help='exit after this many seconds without messages')
+    parser.add_argument('--dead-letter', default='rejected_jobs.jsonl',
+                        help='JSON Lines file collecting messages that cannot be imported')
+    add_transport_arguments(parser)
+    args = parser.parse_args()
+    
+    if SHARDED_STORAGE:
+        sys.exit("Sharded storage (JOBS_SHARDED=1) is rebuilt in full only; "
+                 "run create_database.py --sharded to load new jobs into it.")
+    
+    consumer = JobConsumer(create_transport(args), batch_size=args.batch_size, linger=args.linger,
+                           dead_letter_path=args.dead_letter)
+    print(f"Consuming from {args.transport} transport (batch size {args.batch_size}, linger {args.linger}s)...")
+    try:
+        consumer.run(max_idle=args.max_idle)
+    except KeyboardInterrupt:
+        print("\nConsumer stopped.")
+    finally:
+        print(consumer.summary())
+        consumer.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Job stream producer.
+
+Reads raw job records (JSON array or JSON Lines, e.g. data.json or a new
+scrape) and publishes them to the ingest transport, each wrapped with the
+time it was produced so the consumer can measure end-to-end lag.
+
+Usage (from the project root):
+    python -m sm.producer --source new_jobs.json
+    python -m sm.producer --source new_jobs.json --transport kafka --rate 200
+"""
+
+import argparse
+import time
+
+from sm.transports import add_transport_arguments, create_transport
+from utils.clean_json import iter_json_records
+
+def make_message(record):
+    """Envelope carrying a raw job record and its production timestamp"""
+    return {'produced_at': time.time(), 'job': record}
+
+def produce(transport, records, rate=None):
+    """Send records to the transport, optionally throttled to rate records/sec"""
+    sent = 0
+    start = time.monotonic()
+    
+    for record in records:
+        transport.send(make_message(record))
+        sent += 1
+        
+        if rate:
+            # Stay on schedule rather than sleeping a fixed amount per record
+            delay = start + sent / rate - time.monotonic()
+            if delay > 0:
+                transport.flush()
+                time.sleep(delay)
+        if sent % 1000 == 0:
+            transport.flush()
+            print(f"Produced {sent} records...")
+    
+    transport.flush()
+    return sent
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish job records to the ingest stream')
+    parser.add_argument('--source', default='data.json', help='JSON array or JSON Lines file of raw job records')
+    parser.add_argument('--rate', type=float, help='records per second (default: as fast as possible)')
+    add_transport_arguments(parser)
+    args = parser.parse_args()
+    
+    transport = create_transport(args)
+    try:
+        start = time.monotonic()
+        sent = produce(transport, iter_json_records(args.source), args.rate)
+        elapsed = time.monotonic() - start
+        print(f"Produced {sent} records in {elapsed:.2f}s ({sent / max(elapsed, 1e-9):,.0f} records/sec)")
+    except KeyboardInterrupt:
+        print("\nProducer stopped.")
+    finally:
+        transport.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Pluggable message transports for the streaming ingest pipeline.
+
+Every transport carries JSON-serializable messages and offers the same small
+interface, so the producer and consumer do not care where records travel:
+
+    send(message)                   queue one message
+    flush()                         make sure sent messages are delivered
+    poll(max_records, timeout)      up to max_records messages, waiting at most timeout seconds
+                                    (one that is not valid JSON comes back as decode_message
+                                    describes, rather than raising)
+    commit()                        acknowledge everything returned by poll so far
+    close()
+
+KafkaTransport is meant for production; FileTransport (JSON Lines file that
+the consumer tails) and MemoryTransport (in-process queue) are stand-ins
+for local runs and testing.
+"""
+
+import json
+import os
+import queue
+import time
+
+def decode_message(data):
+    """
+    A message from its JSON bytes, or {'undecodable': text, 'error': reason}
+    so one bad message cannot stop the consumer from reading past it
+    """
+    try:
+        return json.loads(data)
+    except ValueError as e:
+        text = data.decode('utf-8', errors='replace') if isinstance(data, bytes) else data
+        return {'undecodable': text.rstrip('\n'), 'error': str(e)}
+
+class MemoryTransport:
+    """In-process queue, for tests and single-process demos"""
+    
+    def __init__(self):
+        self._queue = queue.Queue()
+    
+    def send(self, message):
+        self._queue.put(message)
+    
+    def flush(self):
+        pass
+    
+    def poll(self, max_records, timeout):
+        messages = []
+        try:
+            messages.append(self._queue.get(timeout=timeout))
+            while len(messages) < max_records:
+                messages.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return messages
+    
+    def commit(self):
+        pass
+    
+    def close(self):
+        pass
+
+class FileTransport:
+    """
+    JSON Lines file: the producer appends one message per line and the
+    consumer tails it. The consumer's committed byte offset is kept next to
+    the file, so a restarted consumer resumes where it left off.
+    """
+    
+    def __init__(self, path, poll_interval=0.05):
+        self.path = path
+        self.offset_path = path + '.offset'
+        self.poll_interval = poll_interval
+        self._writer = None
+        self._reader = None
+        self._position = None
+    
+    def send(self, message):
+        if self._writer is None:
+            self._writer = open(self.path, 'a', encoding='utf-8')
+        self._writer.write(json.dumps(message, ensure_ascii=False) + '\n')
+    
+    def flush(self):
+        if self._writer is not None:
+            self._writer.flush()
+    
+    def _open_reader(self):
+        if not os.path.exists(self.path):
+            return False
+        self._reader = open(self.path, 'rb')
+        self._position = 0
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path, 'r', encoding='utf-8') as file:
+                self._position = int(file.read().strip() or 0)
+        self._reader.seek(self._position)
+        return True
+    
+    def poll(self, max_records, timeout):
+        deadline = time.monotonic() + timeout
+        messages = []
+        
+        while True:
+            if self._reader is not None or self._open_reader():
+                while len(messages) < max_records:
+                    line = self._reader.readline()
+                    if not line.endswith(b'\n'):
+                        # Nothing new, or the producer is halfway through a line
+                        self._reader.seek(self._position)
+                        break
+                    self._position = self._reader.tell()
+                    if line.strip():
+                        messages.append(decode_message(line))
+            
+            if messages or time.monotonic() >= deadline:
+                return messages
+            time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+    
+    def commit(self):
+        if self._position is None:
+            return
+        tmp_path = self.offset_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(str(self._position))
+        os.replace(tmp_path, self.offset_path)
+    
+    def close(self):
+        for handle in (self._writer, self._reader):
+            if handle is not None:
+                handle.close()
+        self._writer = self._reader = None
+
+class KafkaTransport:
+    """Kafka topic via kafka-python; offsets are committed explicitly after each batch"""
+    
+    def __init__(self, topic='jobs', bootstrap_servers='localhost:9092', group_id='jobs-ingest'):
+        self.topic = topic
+        self.bootstrap_servers = bootstrap_servers
+        self.group_id = group_id
+        self._producer = None
+        self._consumer = None
+    
+    def send(self, message):
+        if self._producer is None:
+            from kafka import KafkaProducer
+            self._producer = KafkaProducer(
+                bootstrap_servers=self.bootstrap_servers,
+                value_serializer=lambda value: json.dumps(value, ensure_ascii=False).encode('utf-8'),
+                linger_ms=50
+            )
+        self._producer.send(self.topic, message)
+    
+    def flush(self):
+        if self._producer is not None:
+            self._producer.flush()
+    
+    def poll(self, max_records, timeout):
+        if self._consumer is None:
+            from kafka import KafkaConsumer
+            self._consumer = KafkaConsumer(
+                self.topic,
+                bootstrap_servers=self.bootstrap_servers,
+                group_id=self.group_id,
+                enable_auto_commit=False,
+                auto_offset_reset='earliest',
+                value_deserializer=decode_message
+            )
+        batches = self._consumer.poll(timeout_ms=int(timeout * 1000), max_records=max_records)
+        return [record.value for records in batches.values() for record in records]
+    
+    def commit(self):
+        if self._consumer is not None:
+            self._consumer.commit()
+    
+    def close(self):
+        if self._producer is not None:
+            self._producer.close()
+        if self._consumer is not None:
+            self._consumer.close()
+
+def add_transport_arguments(parser):
+    """Command line options shared by the producer and the consumer"""
+    parser.add_argument('--transport', choices=['file', 'kafka'], default='file')
+    parser.add_argument('--path', default='job_stream.jsonl', help='stream file for the file transport')
+    parser.add_argument('--topic', default=os.environ.get('KAFKA_TOPIC', 'jobs'))
+    parser.add_argument('--bootstrap-servers', default=os.environ.get('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092'))
+    parser.add_argument('--group-id', default='jobs-ingest')
+
+def create_transport(args):
+    """Build the transport selected on the command line"""
+    if args.transport == 'kafka':
+        return KafkaTransport(args.topic, args.bootstrap_servers, args.group_id)
+    return FileTransport(args.path)
@@ -0,0 +1,341 @@
+import gc
+import hashlib
+import json
+import os
+import pickle
+import re
+
+from utils.create_database import DB_NAME, get_database_stamp, get_generation
+from utils.snapshot import open_snapshot, parse_timestamps, snapshot_path
+
+# pandas and numpy are imported inside the functions that use them, so
+# importing this module (and starting main.py) stays cheap.
+
+# Report results are kept here, next to the database, one file per generation
+CACHE_DIR = 'analytics_cache'
+
+# Growth compares the last GROWTH_WINDOW_DAYS with the window before it
+GROWTH_WINDOW_DAYS = 30
+
+# Entries with fewer jobs than this over both windows are left out of growth rankings
+MIN_GROWTH_JOBS = 5
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def _categorical(conn, table, ids):
+    """Dimension ids as a pandas Categorical of the dimension's names"""
+    import numpy as np
+    import pandas as pd
+
+    dimension = conn.execute(f'SELECT id, name FROM {table} ORDER BY id').fetchall()
+    dimension_ids = np.array([row[0] for row in dimension], dtype=np.int64)
+    values = pd.array(ids, dtype='Int64').to_numpy(dtype=np.int64, na_value=-1)
+
+    codes = np.searchsorted(dimension_ids, values)
+    if len(dimension_ids):
+        found = dimension_ids[np.minimum(codes, len(dimension_ids) - 1)] == values
+    else:
+        found = np.zeros(len(values), dtype=bool)
+    codes = np.where(found & (values >= 0), codes, -1)
+    categorical = pd.Categorical.from_codes(codes, categories=[row[1] for row in dimension])
+    return categorical.remove_unused_categories()
+
+def load_frame(conn):
+    """
+    The columns the reports use, one row per canonical job (near-duplicates
+    are left out, as in the summary tables): company and location as
+    categoricals of their names, job_state, and created_at parsed to datetimes
+    (NaT where missing or unparseable)
+    """
+    import pandas as pd
+
+    # Every row tuple stays alive until the columns are built, so the cyclic
+    # collector would only rescan them as they pile up
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        rows = conn.execute(
+            'SELECT company_id, location_id, job_state, created_at FROM jobs WHERE canonical_id IS NULL'
+        ).fetchall()
+        company_ids, location_ids, states, created = zip(*rows) if rows else ((), (), (), ())
+        del rows
+    finally:
+        if collecting:
+            gc.enable()
+    return pd.DataFrame({
+        'company': _categorical(conn, 'companies', company_ids),
+        'location': _categorical(conn, 'locations', location_ids),
+        'job_state': pd.Categorical(states),
+        'created_at': parse_timestamps(created)
+    })
+
+def frame_from_snapshot(table):
+    """
+    The same frame from the columnar snapshot: its dictionary-encoded columns
+    convert straight to categoricals and its timestamps to datetimes, without
+    a pass over Python row objects
+    """
+    return table.select(['company', 'location', 'job_state', 'created_at']).to_pandas()
+
+def daily_postings(frame):
+    """Jobs created per calendar day, days without postings included as 0"""
+    days = frame['created_at'].dropna().dt.normalize()
+    counts = days.value_counts().sort_index()
+    if counts.empty:
+        return counts.rename('postings')
+    return counts.asfreq('D', fill_value=0).rename('postings')
+
+def rolling_trend(daily, short_window=7, long_window=28):
+    """
+    Daily postings with their short and long rolling means, and the slope
+    (postings per day, per day) of a straight line fitted to the last
+    long_window days
+    """
+    import numpy as np
+    import pandas as pd
+
+    trend = pd.DataFrame({
+        'postings': daily,
+        f'avg_{short_window}d': daily.rolling(short_window, min_periods=1).mean().round(1),
+        f'avg_{long_window}d': daily.rolling(long_window, min_periods=1).mean().round(1)
+    })
+    recent = daily.to_numpy()[-long_window:]
+    slope = float(np.polyfit(np.arange(len(recent)), recent, 1)[0]) if len(recent) >= 2 else 0.0
+    return trend, slope
+
+def _window_masks(created, window_days):
+    """Rows in the last window_days up to the latest posting, and in the window before"""
+    import pandas as pd
+
+    end = created.max().normalize() + pd.Timedelta(days=1)
+    window = pd.Timedelta(days=window_days)
+    recent = (created >= end - window).to_numpy()
+    previous = ((created >= end - 2 * window) & (created < end - window)).to_numpy()
+    return recent, previous
+
+def growth_ranking(frame, column, window_days=GROWTH_WINDOW_DAYS, top=10, min_jobs=MIN_GROWTH_JOBS):
+    """
+    Companies or locations (column) ranked by how many more jobs they posted
+    in the last window_days than in the window before
+    """
+    import numpy as np
+    import pandas as pd
+
+    categories = frame[column].cat.categories
+    codes = frame[column].cat.codes.to_numpy()
+    if frame['created_at'].isna().all():
+        return pd.DataFrame(columns=['recent', 'previous', 'change', 'growth_pct'])
+
+    recent, previous = _window_masks(frame['created_at'], window_days)
+    known = codes >= 0
+    recent_counts = np.bincount(codes[recent & known], minlength=len(categories))
+    previous_counts = np.bincount(codes[previous & known], minlength=len(categories))
+
+    change = recent_counts - previous_counts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(previous_counts > 0, change / previous_counts * 100, np.nan)
+    ranking = pd.DataFrame({
+        'recent': recent_counts,
+        'previous': previous_counts,
+        'change': change,
+        'growth_pct': np.round(growth, 1)
+    }, index=pd.Index(categories, name=column))
+    ranking = ranking[recent_counts + previous_counts >= min_jobs]
+    return ranking.sort_values(['change', 'recent'], ascending=False).head(top)
+
+def concentration(frame, column):
+    """
+    How concentrated postings are across companies or locations: the number
+    of distinct values, the share of the top 10, the Herfindahl-Hirschman
+    index (0-10000) and the Gini coefficient of job counts
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes = frame[column].cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength=len(frame[column].cat.categories))
+    counts = np.sort(counts[counts > 0])
+    total = counts.sum()
+    if not total:
+        return pd.Series({'distinct': 0, 'top_10_share_pct': 0.0, 'hhi': 0.0, 'gini': 0.0}, dtype=object)
+
+    shares = counts / total
+    cumulative = np.cumsum(counts)
+    gini = (len(counts) + 1 - 2 * cumulative.sum() / total) / len(counts)
+    return pd.Series({
+        'distinct': len(counts),
+        'top_10_share_pct': round(float(shares[-10:].sum() * 100), 2),
+        'hhi': round(float((shares ** 2).sum() * 10000), 1),
+        'gini': round(float(gini), 3)
+    }, dtype=object)
+
+def _top_entries(frame, column, other, other_label, top):
+    """Job count, distinct values of other, first and latest posting per value of column"""
+    summary = frame.groupby(column, observed=True).agg(
+        jobs=('created_at', 'size'),
+        **{other_label: (other, 'nunique')},
+        first_posting=('created_at', 'min'),
+        latest_posting=('created_at', 'max')
+    )
+    return summary.nlargest(top, 'jobs')
+
+def company_analysis(frame, top=10):
+    """Largest and fastest growing companies, and how concentrated hiring is"""
+    return {
+        'Top companies by job count': _top_entries(frame, 'company', 'location', 'locations', top),
+        f'Fastest growing companies (last {GROWTH_WINDOW_DAYS} days vs the {GROWTH_WINDOW_DAYS} before)':
+            growth_ranking(frame, 'company', top=top),
+        'Company concentration': concentration(frame, 'company')
+    }
+
+def location_trends(frame, top=10, weeks=12):
+    """Largest and fastest growing locations, with weekly postings for the top five"""
+    import pandas as pd
+
+    sections = {
+        'Top locations by job count': _top_entries(frame, 'location', 'company', 'companies', top),
+        f'Fastest growing locations (last {GROWTH_WINDOW_DAYS} days vs the {GROWTH_WINDOW_DAYS} before)':
+            growth_ranking(frame, 'location', top=top),
+        'Location concentration': concentration(frame, 'location')
+    }
+
+    created = frame['created_at']
+    if created.notna().any():
+        leaders = frame['location'].value_counts().index[:5]
+        # Whole weeks only, the latest one included
+        start = (created.max() - pd.Timedelta(weeks=weeks - 1)).to_period('W').start_time
+        recent = frame[(created >= start) & frame['location'].isin(leaders)]
+        weekly = pd.crosstab(
+            recent['created_at'].dt.to_period('W').dt.start_time.rename('week'),
+            recent['location'].cat.remove_unused_categories()
+        )
+        weekly = weekly.reindex(columns=[location for location in leaders if location in weekly.columns])
+        sections[f'Weekly postings, top 5 locations (last {weeks} weeks)'] = weekly
+    return sections
+
+def market_overview(frame, days=14):
+    """Overall volume, states, daily trend and weekly and monthly patterns"""
+    import pandas as pd
+
+    daily = daily_postings(frame)
+    trend, slope = rolling_trend(daily)
+    created = frame['created_at']
+
+    summary = {'total_jobs': len(frame), 'jobs_with_date': int(created.notna().sum())}
+    if not daily.empty:
+        recent, previous = _window_masks(created, GROWTH_WINDOW_DAYS)
+        recent_total, previous_total = int(recent.sum()), int(previous.sum())
+        summary.update({
+            'first_posting': daily.index[0].date().isoformat(),
+            'latest_posting': daily.index[-1].date().isoformat(),
+            'mean_per_day': round(float(daily.mean()), 1),
+            f'last_{GROWTH_WINDOW_DAYS}_days': recent_total,
+            f'previous_{GROWTH_WINDOW_DAYS}_days': previous_total,
+            'change_pct': round((recent_total - previous_total) / previous_total * 100, 1) if previous_total else None,
+            'trend_per_day': round(slope, 2)
+        })
+
+    sections = {
+        'Summary': pd.Series(summary, dtype=object),
+        'Job states': frame['job_state'].value_counts(),
+        f'Daily postings, last {days} days': trend.tail(days)
+    }
+    if not daily.empty:
+        weekdays = created.dropna().dt.dayofweek.value_counts().reindex(range(7), fill_value=0)
+        weekdays.index = WEEKDAYS
+        sections['Postings by weekday'] = weekdays.rename('postings')
+        sections['Monthly postings'] = daily.resample('MS').sum().rename(lambda month: month.strftime('%Y-%m'))
+    return sections
+
+# Report name -> function of the frame returning {section title: table}
+REPORTS = {
+    'company_analysis': company_analysis,
+    'location_trends': location_trends,
+    'market_overview': market_overview
+}
+
+class JobAnalytics:
+    """
+    Reports over the jobs table. The columns they need are loaded into a
+    DataFrame once (and again only after the data changes), and every
+    report is cached on disk under the database creation stamp and
+    generation, so asking for the same report again is a file read until
+    the next import.
+    """
+
+    def __init__(self, conn, db_path=DB_NAME, cache_dir=None):
+        self.conn = conn
+        self.db_path = os.path.abspath(db_path)
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(self.db_path), CACHE_DIR)
+        self._frame = None
+        self._frame_generation = None
+
+    def frame(self, generation=None):
+        generation = get_generation(self.conn.cursor()) if generation is None else generation
+        if self._frame is None or generation != self._frame_generation:
+            snapshot = open_snapshot(self.conn, snapshot_path(self.db_path))
+            self._frame = load_frame(self.conn) if snapshot is None else frame_from_snapshot(snapshot)
+            self._frame_generation = generation
+        return self._frame
+
+    def _cache_path(self, name, params, generation, stamp):
+        key = json.dumps([self.db_path, params], sort_keys=True)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+        # A rebuilt database can reach the same generation as the one it
+        # replaced, so the database's creation stamp is part of the name too
+        return os.path.join(self.cache_dir, f'{name}-{digest}-{stamp}-{generation}.pkl')
+
+    def report(self, name, **params):
+        """Sections of a REPORTS entry, from the cache when the data has not changed since"""
+        cursor = self.conn.cursor()
+        generation = get_generation(cursor)
+        stamp = get_database_stamp(cursor)
+        path = self._cache_path(name, params, generation, stamp)
+        # Databases without a generation counter or creation stamp cannot
+        # tell when they change or are replaced
+        cacheable = generation and stamp
+        if cacheable and os.path.exists(path):
+            try:
+                with open(path, 'rb') as file:
+                    return pickle.load(file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+        sections = REPORTS[name](self.frame(generation), **params)
+        if cacheable:
+            self._store(path, sections)
+        return sections
+
+    def _store(self, path, sections):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        prefix = os.path.basename(path).rsplit('-', 2)[0] + '-'
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(prefix) and entry.endswith('.pkl'):
+                os.remove(os.path.join(self.cache_dir, entry))
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(sections, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def export(self, directory='reports'):
+        """Write every section of every report as CSV, returning the paths written"""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name in REPORTS:
+            for title, table in self.report(name).items():
+                # "Fastest growing companies (last 30 days ...)" -> fastest_growing_companies
+                slug = re.sub(r'[^a-z0-9]+', '_', title.split('(')[0].lower()).strip('_')
+                path = os.path.join(directory, f'{name}_{slug}.csv')
+                table.to_csv(path)
+                paths.append(path)
+        return paths
+
+def print_report(sections):
+    """Print a report's sections as plain tables"""
+    for title, table in sections.items():
+        print(f"\n{title}:")
+        if len(table):
+            print(table.to_string())
+        else:
+            print("  (no data)")
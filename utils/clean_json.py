@@ -1,60 +1,266 @@
+import argparse
+import html
 import json
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
 
-def clean_json_data():
-    # Keys to keep (from the latest JSON object)
-    keys_to_keep = {
-        "Title",
-        "Description", 
-        "Primary Description",
-        "Detail URL",
-        "Location",
-        "Skill",
-        "Insight",
-        "Job State",
-        "Poster Id",
-        "Company Name",
-        "Company Logo",
-        "Created At",
-        "Scraped At"
-    }
+# Keys to keep (from the latest JSON object)
+KEYS_TO_KEEP = {
+    "Title",
+    "Description",
+    "Primary Description",
+    "Detail URL",
+    "Location",
+    "Skill",
+    "Insight",
+    "Job State",
+    "Poster Id",
+    "Company Name",
+    "Company Logo",
+    "Created At",
+    "Scraped At"
+}
+
+JSON_WHITESPACE = ' \t\r\n\ufeff'
+
+# Description clean-up: block-level tags become line breaks, other tags go
+BLOCK_TAG_PATTERN = re.compile(r'<\s*(?:br|/p|/div|/li|/h[1-6])\s*/?\s*>', re.IGNORECASE)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+SPACE_PATTERN = re.compile(r'[ \t\f\v\xa0]+')
+BLANK_LINES_PATTERN = re.compile(r'\n\s*\n+')
+
+DATE_FIELDS = ('Created At', 'Scraped At')
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Records per task handed to a cleaning worker
+CLEAN_BATCH_SIZE = 2000
+
+def iter_json_records(path, chunk_size=1 << 20):
+    """
+    Yield the objects of a top-level JSON array (or a JSON Lines file) one at
+    a time. The file is read in chunks, so memory is bounded by the chunk size
+    and the largest single record rather than by the size of the file. A
+    malformed record raises JSONDecodeError naming the character offset it
+    starts at; only a record cut off by the end of the chunk reads more.
+    """
+    decoder = json.JSONDecoder()
     
-    try:
-        # Read the original data
-        print("Reading data.json...")
-        with open('data.json', 'r', encoding='utf-8') as file:
-            data = json.load(file)
+    with open(path, 'r', encoding='utf-8') as file:
+        buffer = file.read(chunk_size)
+        eof = not buffer
+        pos = 0
+        offset = 0  # characters of the file before buffer
         
-        print(f"Loaded {len(data)} records")
+        # A JSON array starts with '['; JSON Lines goes straight to the first object
+        while pos < len(buffer) and buffer[pos] in JSON_WHITESPACE:
+            pos += 1
+        if buffer[pos:pos + 1] == '[':
+            pos += 1
         
-        # Clean each record
-        cleaned_data = []
-        for i, record in enumerate(data):
-            if i % 1000 == 0:  # Progress indicator
-                print(f"Processing record {i}...")
+        while True:
+            # Skip separators between records
+            while pos < len(buffer) and (buffer[pos] in JSON_WHITESPACE or buffer[pos] == ','):
+                pos += 1
+            
+            if pos >= len(buffer):
+                if eof:
+                    return
+                offset += len(buffer)
+                buffer = file.read(chunk_size)
+                eof = not buffer
+                pos = 0
+                continue
             
-            # Keep only the specified keys
-            cleaned_record = {key: record.get(key) for key in keys_to_keep if key in record}
-            cleaned_data.append(cleaned_record)
+            if buffer[pos] == ']':
+                return
+            
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # The record continues in the next chunk if decoding ran into
+                # the end of the buffer: inside a string, or within the few
+                # characters a cut-off literal (true, false, null) can leave
+                truncated = e.msg.startswith('Unterminated string') or e.pos >= len(buffer) - 5
+                if eof or not truncated:
+                    raise json.JSONDecodeError(
+                        f'{e.msg} in the record at character {offset + pos}', buffer[pos:], e.pos - pos
+                    ) from None
+                more = file.read(chunk_size)
+                eof = not more
+                offset += pos
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            
+            yield record
+            pos = end
+
+def clean_record(record):
+    """Keep only the specified keys of a raw job record, in their original order"""
+    return {key: value for key, value in record.items() if key in KEYS_TO_KEEP}
+
+def normalize_description(text):
+    """Plain-text description: HTML tags and entities removed, whitespace tidied"""
+    text = BLOCK_TAG_PATTERN.sub('\n', text)
+    text = html.unescape(TAG_PATTERN.sub('', text))
+    text = SPACE_PATTERN.sub(' ', text)
+    text = BLANK_LINES_PATTERN.sub('\n\n', text)
+    return '\n'.join(line.strip() for line in text.split('\n')).strip()
+
+def normalize_date(value):
+    """
+    ISO-8601 / epoch timestamps as 'YYYY-MM-DD HH:MM:SS' in UTC, the form
+    SQLite's date functions and string comparisons expect. Anything that
+    does not parse is kept unchanged.
+    """
+    try:
+        if isinstance(value, (int, float)):
+            # Epoch seconds, or milliseconds as some scrapers emit
+            moment = datetime.fromtimestamp(value / 1000 if value > 1e11 else value, timezone.utc)
+        else:
+            moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return value
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime(DATE_FORMAT)
+
+def normalize_record(record):
+    """Cleaned record with its description and dates normalized"""
+    record = clean_record(record)
+    if isinstance(record.get('Description'), str):
+        record['Description'] = normalize_description(record['Description'])
+    for field in DATE_FIELDS:
+        if record.get(field) is not None:
+            record[field] = normalize_date(record[field])
+    return record
+
+def clean_batch(batch):
+    """
+    Worker task: clean a batch of raw records (dicts, or JSON Lines text)
+    and return them serialized, in order
+    """
+    return [
+        json.dumps(normalize_record(json.loads(item) if isinstance(item, str) else item), ensure_ascii=False)
+        for item in batch
+    ]
+
+def iter_record_batches(path, batch_size=CLEAN_BATCH_SIZE):
+    """
+    Split a raw data file into batches for the cleaning workers. JSON Lines
+    is split on line breaks, so parsing happens in the workers; a JSON array
+    has to be parsed to find record boundaries, so its records are sent as
+    dicts.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        head = file.read(4096).lstrip(JSON_WHITESPACE)
+    
+    if head.startswith('['):
+        records = iter_json_records(path)
+    else:
+        def iter_lines():
+            with open(path, 'r', encoding='utf-8-sig') as file:
+                for line in file:
+                    if line.strip():
+                        yield line
+        records = iter_lines()
+    
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_clean_batches(path, workers):
+    """
+    Cleaned, serialized records of path in input order, as batches. With more
+    than one worker the batches are cleaned in a process pool, keeping only
+    a few batches per worker in flight so memory stays bounded.
+    """
+    if workers <= 1:
+        for batch in iter_record_batches(path):
+            yield clean_batch(batch)
+        return
+    
+    # multiprocessing is only loaded when it is used; the importer and the
+    # stream tools mostly clean records in-process
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for batch in iter_record_batches(path):
+            pending.append(executor.submit(clean_batch, batch))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_cleaned_records(path='data.json', workers=1):
+    """
+    Stream cleaned job records (see normalize_record) straight from a raw
+    data file, in input order. With more than one worker they are cleaned
+    in a process pool, like clean_json_data does.
+    """
+    if workers <= 1:
+        for record in iter_json_records(path):
+            yield normalize_record(record)
+        return
+    for batch in iter_clean_batches(path, workers):
+        for item in batch:
+            yield json.loads(item)
+
+def clean_json_data(source='data.json', target='data_cleaned.json', workers=1):
+    try:
+        # Stream records from the original data into the cleaned file
+        print(f"Reading {source} with {workers} worker{'s' if workers != 1 else ''}...")
+        first_record = None
+        count = 0
+        start = time.perf_counter()
         
-        # Write the cleaned data
-        print("Writing cleaned data to data_cleaned.json...")
-        with open('data_cleaned.json', 'w', encoding='utf-8') as file:
-            json.dump(cleaned_data, file, indent=2, ensure_ascii=False)
+        with open(target, 'w', encoding='utf-8') as file:
+            file.write('[\n')
+            for batch in iter_clean_batches(source, workers):
+                if count:
+                    file.write(',\n')
+                file.write(',\n'.join(batch))
+                
+                if first_record is None and batch:
+                    first_record = json.loads(batch[0])
+                count += len(batch)
+                
+                # Progress indicator
+                elapsed = time.perf_counter() - start
+                print(f"Processed {count} records ({count / max(elapsed, 1e-9):,.0f} records/sec)...")
+            file.write('\n]\n')
         
-        print(f"Successfully cleaned {len(cleaned_data)} records")
-        print("Cleaned data saved to 'data_cleaned.json'")
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(source) / (1024 * 1024)
+        print(f"Successfully cleaned {count} records in {elapsed:.2f}s "
+              f"({count / max(elapsed, 1e-9):,.0f} records/sec, {size_mb / max(elapsed, 1e-9):,.1f} MB/sec)")
+        print(f"Cleaned data saved to '{target}'")
         
         # Show a sample of the first cleaned record
-        if cleaned_data:
+        if first_record:
             print("\nSample of first cleaned record:")
-            print(json.dumps(cleaned_data[0], indent=2))
-            
+            print(json.dumps(first_record, indent=2, ensure_ascii=False))
+    
     except FileNotFoundError:
-        print("Error: data.json file not found!")
+        print(f"Error: {source} file not found!")
     except json.JSONDecodeError as e:
         print(f"Error: Invalid JSON format - {e}")
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    clean_json_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Clean raw job records into data_cleaned.json')
+    parser.add_argument('--source', default='data.json', help='raw JSON array or JSON Lines file')
+    parser.add_argument('--output', default='data_cleaned.json')
+    parser.add_argument('--workers', type=int, default=1,
+                        help=f'cleaning processes (this machine has {os.cpu_count()} CPUs)')
+    args = parser.parse_args()
+    clean_json_data(args.source, args.output, max(1, args.workers))
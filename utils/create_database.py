@@ -1,15 +1,1312 @@
 import sqlite3
+import hashlib
 import json
+import re
+import unicodedata
 from datetime import datetime
+from itertools import islice
 import os
+import sys
+import time
 
-def create_database_and_import():
+try:
+    from utils.clean_json import iter_cleaned_records
+    from utils.dedup import (
+        BANDS, CANDIDATE_THRESHOLD, SIMILARITY_THRESHOLD,
+        band_keys, jaccard, job_text, minhash_signatures, shingles, similarity
+    )
+    from utils.descriptions import (
+        DICTIONARY_SAMPLES, compress_description, load_dictionary,
+        make_snippet, register_functions, remember_dictionary, train_dictionary
+    )
+except ImportError:
+    # Running as a script from inside utils/
+    from clean_json import iter_cleaned_records
+    from dedup import (
+        BANDS, CANDIDATE_THRESHOLD, SIMILARITY_THRESHOLD,
+        band_keys, jaccard, job_text, minhash_signatures, shingles, similarity
+    )
+    from descriptions import (
+        DICTIONARY_SAMPLES, compress_description, load_dictionary,
+        make_snippet, register_functions, remember_dictionary, train_dictionary
+    )
+
+DB_NAME = 'jobs_database.db'
+
+# detail_url uniqueness is enforced by idx_detail_url rather than a column
+# constraint, so bulk loads can fill an index-free table and build it last.
+# Company and location names live once in the dimension tables below; job
+# rows only carry their integer ids. Full descriptions are kept compressed
+# in job_descriptions, the row itself only has the snippet list views show.
+# canonical_id is NULL for a posting's first copy and points to it on the
+# near-duplicates found since (see find_duplicates).
+JOBS_TABLE_QUERY = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT,
+    snippet TEXT,
+    primary_description TEXT,
+    detail_url TEXT,
+    location_id INTEGER REFERENCES locations(id),
+    skill TEXT,
+    insight TEXT,
+    job_state TEXT,
+    poster_id TEXT,
+    company_id INTEGER REFERENCES companies(id),
+    created_at TEXT,
+    scraped_at TEXT,
+    imported_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    canonical_id INTEGER REFERENCES jobs(id)
+)
+'''
+
+# Interned company and location names. name is the first spelling seen;
+# name_key (see normalize_name) makes "ACME  GmbH" and "Acme GmbH" one row.
+DIMENSION_TABLE_QUERIES = [
+    '''
+    CREATE TABLE IF NOT EXISTS companies (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        name_key TEXT NOT NULL UNIQUE,
+        logo TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS locations (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        name_key TEXT NOT NULL UNIQUE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS skills (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        name_key TEXT NOT NULL UNIQUE
+    )
+    '''
+]
+
+# Job descriptions, zlib-compressed against a preset dictionary trained on
+# the data (see utils/descriptions.py). Dictionary ids are content hashes.
+DESCRIPTION_TABLE_QUERIES = [
+    '''
+    CREATE TABLE IF NOT EXISTS description_dictionaries (
+        id INTEGER PRIMARY KEY,
+        dictionary BLOB NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS job_descriptions (
+        job_id INTEGER PRIMARY KEY,
+        dictionary_id INTEGER REFERENCES description_dictionaries(id),
+        body BLOB
+    )
+    '''
+]
+
+# Jobs with their company and location names joined back in, in the column
+# layout of the source records. Read paths that show names use this view;
+# description is only decompressed for the rows and queries that select it.
+JOB_DETAILS_VIEW_QUERY = '''
+CREATE VIEW IF NOT EXISTS job_details AS
+SELECT
+    jobs.id, jobs.title,
+    decompress_description(job_descriptions.dictionary_id, job_descriptions.body) AS description,
+    jobs.snippet, jobs.primary_description, jobs.detail_url,
+    locations.name AS location, jobs.skill, jobs.insight, jobs.job_state, jobs.poster_id,
+    companies.name AS company_name, companies.logo AS company_logo,
+    jobs.created_at, jobs.scraped_at, jobs.imported_at, jobs.company_id, jobs.location_id,
+    jobs.canonical_id
+FROM jobs
+LEFT JOIN companies ON companies.id = jobs.company_id
+LEFT JOIN locations ON locations.id = jobs.location_id
+LEFT JOIN job_descriptions ON job_descriptions.job_id = jobs.id
+'''
+
+# Indexes for better query performance
+INDEX_QUERIES = [
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_detail_url ON jobs(detail_url)',
+    'CREATE INDEX IF NOT EXISTS idx_location ON jobs(location_id)',
+    'CREATE INDEX IF NOT EXISTS idx_job_state ON jobs(job_state)',
+    'CREATE INDEX IF NOT EXISTS idx_created_at ON jobs(created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_company_created_at ON jobs(company_id, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_canonical_id ON jobs(canonical_id) WHERE canonical_id IS NOT NULL',
+    # Covers the job state counts of canonical jobs
+    'CREATE INDEX IF NOT EXISTS idx_canonical_job_state ON jobs(job_state) WHERE canonical_id IS NULL'
+]
+
+INSERT_COLUMNS = '''
+    title, snippet, primary_description, detail_url, location_id,
+    skill, insight, job_state, poster_id, company_id,
+    created_at, scraped_at
+'''
+INSERT_PLACEHOLDERS = ', '.join('?' * 12)
+
+# Columns of job_details that make up a job's content hash (see content_hash)
+HASHED_COLUMNS = '''
+    title, description, primary_description, detail_url, location,
+    skill, insight, job_state, poster_id, company_name,
+    company_logo, created_at
+'''
+
+# Insert new jobs and refresh existing ones (matched on detail_url) when the
+# incoming copy was scraped at the same time or later. Triggers keep the
+# search index and summary tables in step with both paths.
+UPSERT_QUERY = f'''
+INSERT INTO jobs ({INSERT_COLUMNS})
+VALUES ({INSERT_PLACEHOLDERS})
+ON CONFLICT (detail_url) DO UPDATE SET
+    title = excluded.title,
+    snippet = excluded.snippet,
+    primary_description = excluded.primary_description,
+    location_id = excluded.location_id,
+    skill = excluded.skill,
+    insight = excluded.insight,
+    job_state = excluded.job_state,
+    poster_id = excluded.poster_id,
+    company_id = excluded.company_id,
+    created_at = excluded.created_at,
+    scraped_at = excluded.scraped_at,
+    imported_at = CURRENT_TIMESTAMP
+WHERE jobs.scraped_at IS NULL OR excluded.scraped_at >= jobs.scraped_at
+'''
+
+# Descriptions follow their job row, found by detail_url. Matching on the
+# incoming scraped_at as well skips the ones whose job upsert was refused as
+# stale. Parameters: dictionary_id, body, detail_url, scraped_at.
+DESCRIPTION_UPSERT_QUERY = '''
+INSERT INTO job_descriptions (job_id, dictionary_id, body)
+SELECT id, ?, ? FROM jobs WHERE detail_url = ? AND scraped_at IS ?
+ON CONFLICT (job_id) DO UPDATE SET
+    dictionary_id = excluded.dictionary_id,
+    body = excluded.body
+WHERE body IS NOT excluded.body
+'''
+
+# Same for the INSERT OR IGNORE import: the first copy of a job is kept
+DESCRIPTION_INSERT_QUERY = '''
+INSERT OR IGNORE INTO job_descriptions (job_id, dictionary_id, body)
+SELECT id, ?, ? FROM jobs WHERE detail_url = ? AND scraped_at IS ?
+'''
+
+# Settings for loading into a scratch file that is discarded on failure
+BULK_LOAD_PRAGMAS = [
+    'PRAGMA journal_mode = OFF',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA locking_mode = EXCLUSIVE',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -262144'  # 256 MB
+]
+
+# Full-text search over jobs, kept in sync by the triggers below. The
+# job_details view is the external content, so company names come from the
+# companies table. Column order matters: the bm25() weights in FTS_RANK
+# follow it (title > company_name > description).
+FTS_TABLE_QUERY = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+    title,
+    company_name,
+    description,
+    content='job_details',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+)
+'''
+
+# Job rows are indexed with the description they have at the time; a job's
+# description row arriving or changing afterwards re-indexes it through the
+# job_descriptions triggers. Descriptions are decompressed for indexing only.
+FTS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+        INSERT INTO jobs_fts(rowid, title, company_name, description)
+        VALUES (
+            new.id, new.title, (SELECT name FROM companies WHERE id = new.company_id),
+            (SELECT decompress_description(dictionary_id, body) FROM job_descriptions WHERE job_id = new.id)
+        );
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+        INSERT INTO jobs_fts(jobs_fts, rowid, title, company_name, description)
+        VALUES (
+            'delete', old.id, old.title, (SELECT name FROM companies WHERE id = old.company_id),
+            (SELECT decompress_description(dictionary_id, body) FROM job_descriptions WHERE job_id = old.id)
+        );
+        DELETE FROM job_descriptions WHERE job_id = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF title, company_id ON jobs BEGIN
+        INSERT INTO jobs_fts(jobs_fts, rowid, title, company_name, description)
+        VALUES (
+            'delete', old.id, old.title, (SELECT name FROM companies WHERE id = old.company_id),
+            (SELECT decompress_description(dictionary_id, body) FROM job_descriptions WHERE job_id = old.id)
+        );
+        INSERT INTO jobs_fts(rowid, title, company_name, description)
+        VALUES (
+            new.id, new.title, (SELECT name FROM companies WHERE id = new.company_id),
+            (SELECT decompress_description(dictionary_id, body) FROM job_descriptions WHERE job_id = new.id)
+        );
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS job_descriptions_fts_insert AFTER INSERT ON job_descriptions BEGIN
+        INSERT INTO jobs_fts(jobs_fts, rowid, title, company_name, description)
+        SELECT 'delete', id, title, company_name, NULL FROM job_details WHERE id = new.job_id;
+        INSERT INTO jobs_fts(rowid, title, company_name, description)
+        SELECT id, title, company_name, decompress_description(new.dictionary_id, new.body)
+        FROM job_details WHERE id = new.job_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS job_descriptions_fts_update AFTER UPDATE ON job_descriptions BEGIN
+        INSERT INTO jobs_fts(jobs_fts, rowid, title, company_name, description)
+        SELECT 'delete', id, title, company_name, decompress_description(old.dictionary_id, old.body)
+        FROM job_details WHERE id = old.job_id;
+        INSERT INTO jobs_fts(rowid, title, company_name, description)
+        SELECT id, title, company_name, decompress_description(new.dictionary_id, new.body)
+        FROM job_details WHERE id = new.job_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS job_descriptions_fts_delete AFTER DELETE ON job_descriptions BEGIN
+        INSERT INTO jobs_fts(jobs_fts, rowid, title, company_name, description)
+        SELECT 'delete', id, title, company_name, decompress_description(old.dictionary_id, old.body)
+        FROM job_details WHERE id = old.job_id;
+        INSERT INTO jobs_fts(rowid, title, company_name, description)
+        SELECT id, title, company_name, NULL FROM job_details WHERE id = old.job_id;
+    END
+    '''
+]
+
+FTS_RANK = 'bm25(jobs_fts, 10.0, 5.0, 1.0)'
+
+def create_search_index(cursor):
+    """Create the FTS5 index and its sync triggers, backfilling existing rows"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'jobs_fts'")
+    existed = cursor.fetchone() is not None
+    
+    cursor.execute(FTS_TABLE_QUERY)
+    for trigger_query in FTS_TRIGGERS:
+        cursor.execute(trigger_query)
+    
+    # Databases built before the index existed need a one-off backfill
+    if not existed:
+        cursor.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')")
+
+# Precomputed aggregates for the dashboard, companies and locations pages.
+# company_location_stats backs the distinct location/company counts so they
+# can be maintained incrementally instead of re-running COUNT(DISTINCT ...).
+# Only canonical jobs are counted: a near-duplicate leaves the aggregates
+# when its canonical_id is set and goes back in when it is cleared.
+SUMMARY_TABLE_QUERIES = [
+    '''
+    CREATE TABLE IF NOT EXISTS company_stats (
+        company_id INTEGER PRIMARY KEY,
+        job_count INTEGER NOT NULL DEFAULT 0,
+        locations INTEGER NOT NULL DEFAULT 0,
+        latest_job TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS location_stats (
+        location_id INTEGER PRIMARY KEY,
+        job_count INTEGER NOT NULL DEFAULT 0,
+        companies INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS company_location_stats (
+        company_id INTEGER NOT NULL,
+        location_id INTEGER NOT NULL,
+        job_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (company_id, location_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS global_stats (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_company_stats_rank ON company_stats(job_count, company_id)',
+    'CREATE INDEX IF NOT EXISTS idx_location_stats_rank ON location_stats(job_count, location_id)',
+    'CREATE INDEX IF NOT EXISTS idx_company_location_stats_location ON company_location_stats(location_id)',
+    "INSERT OR IGNORE INTO global_stats (name, value) VALUES ('total_jobs', 0), ('total_companies', 0), ('total_locations', 0)",
+    "INSERT OR IGNORE INTO global_stats (name, value) VALUES ('duplicate_jobs', 0)",
+    # Bumped on every import that changes data; readers use it to invalidate caches
+    "INSERT OR IGNORE INTO global_stats (name, value) VALUES ('generation', 0)",
+    # When this database file was created (Unix microseconds); generations of
+    # different databases can be equal, so caches kept on disk key on both
+    "INSERT OR IGNORE INTO global_stats (name, value) "
+    "VALUES ('created', CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER))"
+]
+
+# Statements applying one job row ({row} is "new" or "old") to the summary tables
+SUMMARY_ADD_STATEMENTS = '''
+    UPDATE global_stats SET value = value + 1 WHERE name = 'total_jobs';
+    INSERT INTO company_location_stats (company_id, location_id, job_count)
+    SELECT {row}.company_id, {row}.location_id, 1
+    WHERE {row}.company_id IS NOT NULL AND {row}.location_id IS NOT NULL
+    ON CONFLICT (company_id, location_id) DO UPDATE SET job_count = job_count + 1;
+    INSERT INTO company_stats (company_id, job_count, latest_job)
+    SELECT {row}.company_id, 1, {row}.created_at
+    WHERE {row}.company_id IS NOT NULL
+    ON CONFLICT (company_id) DO UPDATE SET
+        job_count = job_count + 1,
+        latest_job = MAX(COALESCE(latest_job, excluded.latest_job), COALESCE(excluded.latest_job, latest_job));
+    INSERT INTO location_stats (location_id, job_count)
+    SELECT {row}.location_id, 1
+    WHERE {row}.location_id IS NOT NULL
+    ON CONFLICT (location_id) DO UPDATE SET job_count = job_count + 1;
+    UPDATE company_stats SET locations = locations + 1
+    WHERE company_id = {row}.company_id
+    AND (SELECT job_count FROM company_location_stats
+         WHERE company_id = {row}.company_id AND location_id = {row}.location_id) = 1;
+    UPDATE location_stats SET companies = companies + 1
+    WHERE location_id = {row}.location_id
+    AND (SELECT job_count FROM company_location_stats
+         WHERE company_id = {row}.company_id AND location_id = {row}.location_id) = 1;
+'''
+
+SUMMARY_REMOVE_STATEMENTS = '''
+    UPDATE global_stats SET value = value - 1 WHERE name = 'total_jobs';
+    UPDATE company_location_stats SET job_count = job_count - 1
+    WHERE company_id = {row}.company_id AND location_id = {row}.location_id;
+    UPDATE company_stats SET
+        job_count = job_count - 1,
+        locations = locations - COALESCE((SELECT job_count = 0 FROM company_location_stats
+                                          WHERE company_id = {row}.company_id AND location_id = {row}.location_id), 0),
+        latest_job = (SELECT MAX(created_at) FROM jobs WHERE company_id = {row}.company_id AND canonical_id IS NULL)
+    WHERE company_id = {row}.company_id;
+    UPDATE location_stats SET
+        job_count = job_count - 1,
+        companies = companies - COALESCE((SELECT job_count = 0 FROM company_location_stats
+                                          WHERE company_id = {row}.company_id AND location_id = {row}.location_id), 0)
+    WHERE location_id = {row}.location_id;
+    DELETE FROM company_location_stats
+    WHERE company_id = {row}.company_id AND location_id = {row}.location_id AND job_count <= 0;
+    DELETE FROM company_stats WHERE company_id = {row}.company_id AND job_count <= 0;
+    DELETE FROM location_stats WHERE location_id = {row}.location_id AND job_count <= 0;
+'''
+
+# New rows are never duplicates: find_duplicates marks them afterwards
+SUMMARY_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS jobs_stats_insert AFTER INSERT ON jobs BEGIN
+        {SUMMARY_ADD_STATEMENTS.format(row='new')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS jobs_stats_delete AFTER DELETE ON jobs
+    WHEN old.canonical_id IS NULL BEGIN
+        {SUMMARY_REMOVE_STATEMENTS.format(row='old')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS jobs_stats_update AFTER UPDATE OF company_id, location_id, created_at ON jobs
+    WHEN old.canonical_id IS NULL AND new.canonical_id IS NULL BEGIN
+        {SUMMARY_REMOVE_STATEMENTS.format(row='old')}
+        {SUMMARY_ADD_STATEMENTS.format(row='new')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS jobs_stats_collapse AFTER UPDATE OF canonical_id ON jobs
+    WHEN old.canonical_id IS NULL AND new.canonical_id IS NOT NULL BEGIN
+        {SUMMARY_REMOVE_STATEMENTS.format(row='old')}
+        UPDATE global_stats SET value = value + 1 WHERE name = 'duplicate_jobs';
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS jobs_stats_restore AFTER UPDATE OF canonical_id ON jobs
+    WHEN old.canonical_id IS NOT NULL AND new.canonical_id IS NULL BEGIN
+        {SUMMARY_ADD_STATEMENTS.format(row='new')}
+        UPDATE global_stats SET value = value - 1 WHERE name = 'duplicate_jobs';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS jobs_stats_delete_duplicate AFTER DELETE ON jobs
+    WHEN old.canonical_id IS NOT NULL BEGIN
+        UPDATE global_stats SET value = value - 1 WHERE name = 'duplicate_jobs';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS company_stats_insert AFTER INSERT ON company_stats BEGIN
+        UPDATE global_stats SET value = value + 1 WHERE name = 'total_companies';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS company_stats_delete AFTER DELETE ON company_stats BEGIN
+        UPDATE global_stats SET value = value - 1 WHERE name = 'total_companies';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS location_stats_insert AFTER INSERT ON location_stats BEGIN
+        UPDATE global_stats SET value = value + 1 WHERE name = 'total_locations';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS location_stats_delete AFTER DELETE ON location_stats BEGIN
+        UPDATE global_stats SET value = value - 1 WHERE name = 'total_locations';
+    END
+    '''
+]
+
+def create_summary_tables(cursor):
+    """Create the aggregate tables and the triggers that keep them current"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'company_stats'")
+    existed = cursor.fetchone() is not None
+    
+    for query in SUMMARY_TABLE_QUERIES:
+        cursor.execute(query)
+    for trigger_query in SUMMARY_TRIGGERS:
+        cursor.execute(trigger_query)
+    
+    if not existed:
+        rebuild_summary_tables(cursor)
+
+def rebuild_summary_tables(cursor):
+    """Recompute every aggregate table from scratch with one pass per table"""
+    cursor.execute("DELETE FROM company_location_stats")
+    cursor.execute("DELETE FROM company_stats")
+    cursor.execute("DELETE FROM location_stats")
+    
+    cursor.execute('''
+        INSERT INTO company_location_stats (company_id, location_id, job_count)
+        SELECT company_id, location_id, COUNT(*)
+        FROM jobs
+        WHERE company_id IS NOT NULL AND location_id IS NOT NULL AND canonical_id IS NULL
+        GROUP BY company_id, location_id
+    ''')
+    cursor.execute('''
+        INSERT INTO company_stats (company_id, job_count, locations, latest_job)
+        SELECT
+            company_id,
+            COUNT(*),
+            (SELECT COUNT(*) FROM company_location_stats p WHERE p.company_id = jobs.company_id),
+            MAX(created_at)
+        FROM jobs
+        WHERE company_id IS NOT NULL AND canonical_id IS NULL
+        GROUP BY company_id
+    ''')
+    cursor.execute('''
+        INSERT INTO location_stats (location_id, job_count, companies)
+        SELECT
+            location_id,
+            COUNT(*),
+            (SELECT COUNT(*) FROM company_location_stats p WHERE p.location_id = jobs.location_id)
+        FROM jobs
+        WHERE location_id IS NOT NULL AND canonical_id IS NULL
+        GROUP BY location_id
+    ''')
+    
+    cursor.execute('''
+        UPDATE global_stats SET value = CASE name
+            WHEN 'total_jobs' THEN (SELECT COUNT(*) FROM jobs WHERE canonical_id IS NULL)
+            WHEN 'duplicate_jobs' THEN (SELECT COUNT(*) FROM jobs WHERE canonical_id IS NOT NULL)
+            WHEN 'total_companies' THEN (SELECT COUNT(*) FROM company_stats)
+            WHEN 'total_locations' THEN (SELECT COUNT(*) FROM location_stats)
+            ELSE value END
+    ''')
+
+# Skills of every job, parsed from the skill text into the skills vocabulary
+# (see split_skills), and per-skill counts of canonical jobs for the search facets.
+# job_skills is keyed (job_id, skill_id) for a job's skills; the skill_id
+# index also covers filtering jobs by skill.
+SKILL_INDEX_QUERIES = [
+    '''
+    CREATE TABLE IF NOT EXISTS job_skills (
+        job_id INTEGER NOT NULL,
+        skill_id INTEGER NOT NULL,
+        PRIMARY KEY (job_id, skill_id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_job_skills_skill ON job_skills(skill_id)',
+    '''
+    CREATE TABLE IF NOT EXISTS skill_stats (
+        skill_id INTEGER PRIMARY KEY,
+        job_count INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_skill_stats_rank ON skill_stats(job_count, skill_id)'
+]
+
+# Statements adding the skills of job row {row} to the vocabulary and job_skills.
+# ON CONFLICT DO NOTHING rather than INSERT OR IGNORE: inside a trigger fired
+# by an upsert's DO UPDATE, SQLite applies the upsert's own conflict policy
+# to OR clauses.
+SKILL_ADD_STATEMENTS = '''
+    INSERT INTO skills (name, name_key)
+    SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]')
+    FROM json_each(skill_tokens({row}.skill)) WHERE true
+    ON CONFLICT (name_key) DO NOTHING;
+    INSERT INTO job_skills (job_id, skill_id)
+    SELECT {row}.id, skills.id
+    FROM json_each(skill_tokens({row}.skill))
+    JOIN skills ON skills.name_key = json_extract(value, '$[1]') WHERE true
+    ON CONFLICT (job_id, skill_id) DO NOTHING;
+'''
+
+SKILL_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS jobs_skills_insert AFTER INSERT ON jobs BEGIN
+        {SKILL_ADD_STATEMENTS.format(row='new')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS jobs_skills_update AFTER UPDATE OF skill ON jobs
+    WHEN old.skill IS NOT new.skill BEGIN
+        DELETE FROM job_skills WHERE job_id = old.id;
+        {SKILL_ADD_STATEMENTS.format(row='new')}
+    END
+    ''',
+    # BEFORE, so the stats triggers below still see whether the job was a duplicate
+    '''
+    CREATE TRIGGER IF NOT EXISTS jobs_skills_delete BEFORE DELETE ON jobs BEGIN
+        DELETE FROM job_skills WHERE job_id = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS job_skills_stats_insert AFTER INSERT ON job_skills
+    WHEN (SELECT canonical_id FROM jobs WHERE id = new.job_id) IS NULL BEGIN
+        INSERT INTO skill_stats (skill_id, job_count) VALUES (new.skill_id, 1)
+        ON CONFLICT (skill_id) DO UPDATE SET job_count = job_count + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS job_skills_stats_delete AFTER DELETE ON job_skills
+    WHEN (SELECT canonical_id FROM jobs WHERE id = old.job_id) IS NULL BEGIN
+        UPDATE skill_stats SET job_count = job_count - 1 WHERE skill_id = old.skill_id;
+        DELETE FROM skill_stats WHERE skill_id = old.skill_id AND job_count <= 0;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS jobs_skills_collapse AFTER UPDATE OF canonical_id ON jobs
+    WHEN old.canonical_id IS NULL AND new.canonical_id IS NOT NULL BEGIN
+        UPDATE skill_stats SET job_count = job_count - 1
+        WHERE skill_id IN (SELECT skill_id FROM job_skills WHERE job_id = new.id);
+        DELETE FROM skill_stats
+        WHERE skill_id IN (SELECT skill_id FROM job_skills WHERE job_id = new.id) AND job_count <= 0;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS jobs_skills_restore AFTER UPDATE OF canonical_id ON jobs
+    WHEN old.canonical_id IS NOT NULL AND new.canonical_id IS NULL BEGIN
+        INSERT INTO skill_stats (skill_id, job_count)
+        SELECT skill_id, 1 FROM job_skills WHERE job_id = new.id
+        ON CONFLICT (skill_id) DO UPDATE SET job_count = job_count + 1;
+    END
+    '''
+]
+
+def create_skill_index(cursor):
+    """Create the job_skills mapping and its triggers, parsing the skills of existing rows"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'job_skills'")
+    existed = cursor.fetchone() is not None
+    
+    for query in SKILL_INDEX_QUERIES:
+        cursor.execute(query)
+    
+    # Backfill in set-based passes before the row-by-row triggers exist
+    if not existed:
+        cursor.execute('''
+            INSERT OR IGNORE INTO skills (name, name_key)
+            SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]')
+            FROM jobs, json_each(skill_tokens(jobs.skill))
+            ORDER BY jobs.id, json_each.key
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO job_skills (job_id, skill_id)
+            SELECT jobs.id, skills.id
+            FROM jobs, json_each(skill_tokens(jobs.skill))
+            JOIN skills ON skills.name_key = json_extract(value, '$[1]')
+        ''')
+        cursor.execute('DELETE FROM skill_stats')
+        cursor.execute('''
+            INSERT INTO skill_stats (skill_id, job_count)
+            SELECT skill_id, COUNT(*) FROM job_skills
+            WHERE job_id IN (SELECT id FROM jobs WHERE canonical_id IS NULL)
+            GROUP BY skill_id
+        ''')
+    
+    for trigger_query in SKILL_TRIGGERS:
+        cursor.execute(trigger_query)
+
+# LSH buckets of the canonical jobs' MinHash signatures (see utils/dedup.py),
+# BANDS rows per job. Duplicates are not indexed: a job is only ever compared
+# with canonical jobs, so each posting keeps a single canonical copy.
+DUPLICATE_INDEX_QUERIES = [
+    '''
+    CREATE TABLE IF NOT EXISTS job_lsh (
+        band_key INTEGER NOT NULL,
+        job_id INTEGER NOT NULL,
+        PRIMARY KEY (band_key, job_id)
+    ) WITHOUT ROWID
+    '''
+]
+
+# For dropping a job's buckets; built after the backfill, which is faster
+DUPLICATE_JOB_INDEX_QUERY = 'CREATE INDEX IF NOT EXISTS idx_job_lsh_job ON job_lsh(job_id)'
+
+# The duplicates of a deleted job count as canonical until find_duplicates next runs
+DUPLICATE_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS jobs_lsh_delete AFTER DELETE ON jobs BEGIN
+        DELETE FROM job_lsh WHERE job_id = old.id;
+        UPDATE jobs SET canonical_id = NULL WHERE canonical_id = old.id;
+    END
+    '''
+]
+
+DUPLICATE_TEXT_QUERY = 'SELECT id, title, company_name, description FROM job_details WHERE id IN ({})'
+
+# Jobs signed and clustered per step
+DEDUP_BATCH_SIZE = 500
+
+def create_duplicate_index(cursor):
+    """Create the LSH bucket table and its trigger, clustering existing rows"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'job_lsh'")
+    existed = cursor.fetchone() is not None
+    
+    for query in DUPLICATE_INDEX_QUERIES:
+        cursor.execute(query)
+    for trigger_query in DUPLICATE_TRIGGERS:
+        cursor.execute(trigger_query)
+    
+    if not existed:
+        find_duplicates(cursor)
+    cursor.execute(DUPLICATE_JOB_INDEX_QUERY)
+
+def _job_texts(cursor, job_ids):
+    """(id, comparison text) of the given jobs, by id"""
+    cursor.execute(DUPLICATE_TEXT_QUERY.format(', '.join('?' * len(job_ids))), job_ids)
+    return [(row[0], job_text(*row[1:])) for row in sorted(cursor.fetchall())]
+
+def _job_signatures(cursor, job_ids):
+    """(ids, texts, MinHash signatures) of the given jobs that have text to compare"""
+    rows = _job_texts(cursor, job_ids)
+    positions, signatures = minhash_signatures([text for _, text in rows])
+    return [rows[position][0] for position in positions], [rows[position][1] for position in positions], signatures
+
+def _reset_duplicates(cursor, job_ids):
+    """Make the given jobs canonical and unindexed again, plus the duplicates pointing at them"""
+    job_ids = set(job_ids)
+    for batch in iter_batches(sorted(job_ids), DEDUP_BATCH_SIZE):
+        cursor.execute(f"SELECT id FROM jobs WHERE canonical_id IN ({', '.join('?' * len(batch))})", batch)
+        job_ids.update(row[0] for row in cursor.fetchall())
+    
+    job_ids = sorted(job_ids)
+    for batch in iter_batches(job_ids, DEDUP_BATCH_SIZE):
+        placeholders = ', '.join('?' * len(batch))
+        cursor.execute(f'UPDATE jobs SET canonical_id = NULL WHERE id IN ({placeholders}) AND canonical_id IS NOT NULL', batch)
+        cursor.execute(f'DELETE FROM job_lsh WHERE job_id IN ({placeholders})', batch)
+    return job_ids
+
+def find_duplicates(cursor, job_ids=None):
+    """
+    Point near-duplicate jobs at the canonical copy of their posting. Jobs
+    are taken in id order and compared with the canonical jobs sharing an
+    LSH bucket with them (see utils/dedup.py). Those with a close enough
+    signature have their shingle similarity computed exactly, and the most
+    similar one at SIMILARITY_THRESHOLD or above becomes the job's
+    canonical_id; otherwise the job is canonical itself and goes into the
+    buckets. With
+    job_ids, only those jobs and the duplicates of any of them are redone;
+    without, every job is. Returns the number of jobs marked as duplicates.
+    """
+    if job_ids is None:
+        cursor.execute('UPDATE jobs SET canonical_id = NULL WHERE canonical_id IS NOT NULL')
+        cursor.execute('DELETE FROM job_lsh')
+        cursor.execute('SELECT id FROM jobs ORDER BY id')
+        job_ids = [row[0] for row in cursor.fetchall()]
+    else:
+        job_ids = _reset_duplicates(cursor, job_ids)
+    
+    # Signatures of the canonical jobs compared so far, and the shingles of
+    # those that needed an exact check
+    canonical = {}
+    canonical_shingles = {}
+    marked = 0
+    for batch in iter_batches(job_ids, DEDUP_BATCH_SIZE):
+        batch_ids, texts, signatures = _job_signatures(cursor, batch)
+        if not batch_ids:
+            continue
+        keys = band_keys(signatures).tolist()
+        
+        # Canonical jobs indexed before this batch that share a bucket with it
+        buckets = {}
+        for key_batch in iter_batches(sorted({key for job_keys in keys for key in job_keys}), DEDUP_BATCH_SIZE * BANDS):
+            cursor.execute(f"SELECT band_key, job_id FROM job_lsh WHERE band_key IN ({', '.join('?' * len(key_batch))})", key_batch)
+            for key, job_id in cursor.fetchall():
+                buckets.setdefault(key, []).append(job_id)
+        unknown = {job_id for bucket in buckets.values() for job_id in bucket if job_id not in canonical}
+        for unknown_batch in iter_batches(sorted(unknown), DEDUP_BATCH_SIZE):
+            unknown_ids, _, unknown_signatures = _job_signatures(cursor, unknown_batch)
+            canonical.update(zip(unknown_ids, unknown_signatures))
+        
+        duplicates = []
+        bands = []
+        for job_id, text, signature, job_keys in zip(batch_ids, texts, signatures, keys):
+            candidates = sorted({candidate for key in job_keys for candidate in buckets.get(key, ())})
+            candidates = [
+                candidate for candidate in candidates
+                if candidate in canonical and similarity(signature, canonical[candidate]) >= CANDIDATE_THRESHOLD
+            ]
+            best_id, best_score = None, SIMILARITY_THRESHOLD
+            if candidates:
+                job_shingles = shingles(text)
+                missing = [candidate for candidate in candidates if candidate not in canonical_shingles]
+                if missing:
+                    canonical_shingles.update((candidate, shingles(candidate_text))
+                                              for candidate, candidate_text in _job_texts(cursor, missing))
+                for candidate in candidates:
+                    score = jaccard(job_shingles, canonical_shingles.get(candidate, ()))
+                    if score > best_score or (score == best_score and best_id is None):
+                        best_id, best_score = candidate, score
+            if best_id is not None:
+                duplicates.append((best_id, job_id))
+                continue
+            canonical[job_id] = signature
+            if candidates:
+                canonical_shingles[job_id] = job_shingles
+            for key in job_keys:
+                buckets.setdefault(key, []).append(job_id)
+                bands.append((key, job_id))
+        
+        cursor.executemany('UPDATE jobs SET canonical_id = ? WHERE id = ?', duplicates)
+        # In key order, so the rows land on neighbouring pages
+        cursor.executemany('INSERT INTO job_lsh (band_key, job_id) VALUES (?, ?)', sorted(bands))
+        marked += len(duplicates)
+    return marked
+
+# What the last import saw for every detail_url, so the next one only has to
+# write records whose content changed. scraped_at is the per-record high-water
+# mark: an older copy of a record never replaces a newer one.
+IMPORT_STATE_QUERIES = [
+    '''
+    CREATE TABLE IF NOT EXISTS import_state (
+        detail_url TEXT PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        scraped_at TEXT,
+        removed_at TEXT
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS import_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT,
+        started_at TEXT,
+        finished_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        max_scraped_at TEXT,
+        inserted INTEGER NOT NULL DEFAULT 0,
+        updated INTEGER NOT NULL DEFAULT 0,
+        unchanged INTEGER NOT NULL DEFAULT 0,
+        stale INTEGER NOT NULL DEFAULT 0,
+        removed INTEGER NOT NULL DEFAULT 0
+    )
+    '''
+]
+
+# Every writer records what it wrote, under the same rule as the job row:
+# the upsert only moves forward in scraped_at, the INSERT OR IGNORE import
+# keeps the first copy. Parameters: detail_url, content_hash, scraped_at.
+IMPORT_STATE_UPSERT_QUERY = '''
+INSERT INTO import_state (detail_url, content_hash, scraped_at, removed_at)
+VALUES (?, ?, ?, NULL)
+ON CONFLICT (detail_url) DO UPDATE SET
+    content_hash = excluded.content_hash,
+    scraped_at = excluded.scraped_at,
+    removed_at = NULL
+WHERE import_state.scraped_at IS NULL OR excluded.scraped_at >= import_state.scraped_at
+'''
+
+IMPORT_STATE_INSERT_QUERY = '''
+INSERT OR IGNORE INTO import_state (detail_url, content_hash, scraped_at)
+VALUES (?, ?, ?)
+'''
+
+# job_state given to rows whose detail_url disappeared from the source data
+REMOVED_JOB_STATE = 'REMOVED'
+
+def content_hash(*values):
+    """
+    Digest of a job's content: every insert column except scraped_at, so a
+    re-scrape of an unchanged posting hashes the same. Values are compared
+    as text, the way SQLite stores them in the TEXT columns.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        digest.update(b'\x00' if value is None else str(value).encode('utf-8') + b'\x1f')
+    return digest.hexdigest()
+
+def store_import_state(cursor, job_tuples, query=IMPORT_STATE_UPSERT_QUERY):
+    """Record the content hash and scraped_at of a batch of written job tuples"""
+    cursor.executemany(query, [
+        (job[3], content_hash(*job[:-1]), job[-1]) for job in job_tuples if job[3] is not None
+    ])
+
+def create_import_state(cursor):
+    """Create the incremental import bookkeeping, seeding it from existing rows"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'import_state'")
+    existed = cursor.fetchone() is not None
+    
+    for query in IMPORT_STATE_QUERIES:
+        cursor.execute(query)
+    
+    # Databases that predate import_state are seeded from their rows. The
+    # view's interned names can differ from the raw records, so some of
+    # those jobs are rewritten once by the next incremental import.
+    if not existed:
+        cursor.connection.create_function('content_hash', -1, content_hash, deterministic=True)
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO import_state (detail_url, content_hash, scraped_at)
+            SELECT detail_url, content_hash({HASHED_COLUMNS}), scraped_at
+            FROM job_details
+            WHERE detail_url IS NOT NULL
+        ''')
+
+def normalize_name(name):
+    """
+    Matching key for company and location names: case, accents and runs of
+    whitespace are ignored. Blank names have no key (and no dimension row).
+    """
+    if not name:
+        return None
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split()) or None
+
+def tidy_name(name):
+    """Display form of a company or location name: surrounding and repeated whitespace removed"""
+    return ' '.join(str(name).split())
+
+# Separators between the entries of a skill field ("Python, SQL; Docker")
+SKILL_SEPARATORS = re.compile(r'[,;|\n\t\u2022\u00b7]+')
+
+# Entries longer than this are prose rather than a skill name
+MAX_SKILL_LENGTH = 50
+
+# Common alternative spellings, by name_key, and the skill they stand for
+SKILL_ALIASES = {
+    'js': 'JavaScript',
+    'ts': 'TypeScript',
+    'golang': 'Go',
+    'k8s': 'Kubernetes',
+    'postgres': 'PostgreSQL',
+    'ms excel': 'Excel',
+    'microsoft excel': 'Excel',
+    'ml': 'Machine Learning',
+    'amazon web services': 'AWS',
+    'gcp': 'Google Cloud',
+    'google cloud platform': 'Google Cloud',
+    'node': 'Node.js',
+    'nodejs': 'Node.js',
+}
+
+def split_skills(skill):
+    """
+    The skills listed in a job's skill field as (display name, name_key)
+    pairs, in order and without repeats. Aliases map to one vocabulary entry.
+    """
+    if not skill:
+        return []
+    
+    skills = {}
+    for entry in SKILL_SEPARATORS.split(str(skill)):
+        entry = entry.strip(' .*-')
+        if len(entry) > MAX_SKILL_LENGTH:
+            continue
+        key = normalize_name(entry)
+        if key is None:
+            continue
+        if key in SKILL_ALIASES:
+            entry = SKILL_ALIASES[key]
+            key = normalize_name(entry)
+        skills.setdefault(key, tidy_name(entry))
+    return [(name, key) for key, name in skills.items()]
+
+def skill_tokens(skill):
+    """split_skills as a JSON array of [name, name_key] pairs, for SQL triggers"""
+    skills = split_skills(skill)
+    return json.dumps(skills) if skills else None
+
+def register_schema_functions(conn):
+    """
+    Register every SQL function the schema's views and triggers call. Needed
+    on connections that write jobs; readers only need register_functions.
+    """
+    register_functions(conn)
+    conn.create_function('skill_tokens', 1, skill_tokens, deterministic=True)
+
+def create_dimension_tables(cursor):
+    """Create the companies/locations and description side tables and the job_details view"""
+    for query in DIMENSION_TABLE_QUERIES + DESCRIPTION_TABLE_QUERIES:
+        cursor.execute(query)
+    cursor.execute(JOB_DETAILS_VIEW_QUERY)
+
+# Fewest descriptions a dictionary is trained from; smaller batches are
+# compressed without one until enough data has come in
+MIN_DICTIONARY_SAMPLES = 50
+
+def get_description_dictionary(cursor, samples=()):
+    """
+    The database's description dictionary as (id, bytes). A database has a
+    single one, trained from the first descriptions written to it; (None,
+    None) while there are too few samples to train on.
+    """
+    cursor.execute('SELECT id FROM description_dictionaries LIMIT 1')
+    row = cursor.fetchone()
+    if row is not None:
+        return row[0], load_dictionary(cursor.connection, row[0])
+    
+    samples = [text for text in samples if text][:DICTIONARY_SAMPLES]
+    if len(samples) < MIN_DICTIONARY_SAMPLES:
+        return None, None
+    dictionary = train_dictionary(samples)
+    if not dictionary:
+        return None, None
+    dictionary_id = remember_dictionary(dictionary)
+    cursor.execute('INSERT INTO description_dictionaries (id, dictionary) VALUES (?, ?)',
+                   (dictionary_id, dictionary))
+    return dictionary_id, dictionary
+
+def store_descriptions(cursor, job_tuples, query=DESCRIPTION_UPSERT_QUERY):
+    """Compress the descriptions of a batch of job tuples into job_descriptions"""
+    dictionary_id, dictionary = get_description_dictionary(cursor, [job[1] for job in job_tuples])
+    cursor.executemany(query, [
+        (dictionary_id, compress_description(job[1], dictionary), job[3], job[-1])
+        for job in job_tuples if job[3] is not None
+    ])
+
+def load_jobs(cursor, job_tuples, first_id):
+    """
+    Bulk insert of a batch of job tuples with ids assigned from first_id,
+    which lets their descriptions be written without looking the rows up.
+    Their content hashes go to import_state from the raw tuples, as
+    incremental_import computes them (the job_details view has the interned
+    names and company logos instead).
+    """
+    job_ids = range(first_id, first_id + len(job_tuples))
+    cursor.executemany(
+        f'INSERT INTO jobs (id, {INSERT_COLUMNS}) VALUES (?, {INSERT_PLACEHOLDERS})',
+        [(job_id,) + row for job_id, row in zip(job_ids, resolve_dimensions(cursor, job_tuples))]
+    )
+    dictionary_id, dictionary = get_description_dictionary(cursor, [job[1] for job in job_tuples])
+    cursor.executemany(
+        'INSERT INTO job_descriptions (job_id, dictionary_id, body) VALUES (?, ?, ?)',
+        [(job_id, dictionary_id, compress_description(job[1], dictionary))
+         for job_id, job in zip(job_ids, job_tuples)]
+    )
+    store_import_state(cursor, job_tuples, IMPORT_STATE_INSERT_QUERY)
+
+def intern_names(cursor, table, names, logos=None):
+    """
+    Map names to row ids in a dimension table (companies or locations),
+    adding the ones seen for the first time. For companies, logos maps
+    names to their latest logo URL.
+    """
+    keys = {}
+    for name in dict.fromkeys(names):
+        key = normalize_name(name)
+        if key is not None:
+            keys[name] = key
+    if not keys:
+        return {}
+    
+    # The first spelling seen becomes the display name
+    cursor.executemany(
+        f'INSERT OR IGNORE INTO {table} (name, name_key) VALUES (?, ?)',
+        [(tidy_name(name), key) for name, key in keys.items()]
+    )
+    
+    ids = {}
+    unique_keys = list(set(keys.values()))
+    for start in range(0, len(unique_keys), 500):
+        chunk = unique_keys[start:start + 500]
+        cursor.execute(
+            f"SELECT name_key, id FROM {table} WHERE name_key IN ({', '.join('?' * len(chunk))})", chunk
+        )
+        ids.update(cursor.fetchall())
+    
+    if logos:
+        cursor.executemany(
+            f'UPDATE {table} SET logo = ? WHERE id = ? AND logo IS NOT ?',
+            [(logo, ids[keys[name]], logo) for name, logo in logos.items() if name in keys]
+        )
+    return {name: ids[key] for name, key in keys.items()}
+
+def resolve_dimensions(cursor, job_tuples):
+    """
+    Turn job tuples from job_to_tuple (company and location as text) into
+    rows in INSERT_COLUMNS order, with company_id and location_id instead
+    and the description cut down to its snippet (see store_descriptions)
+    """
+    company_ids = intern_names(
+        cursor, 'companies', [job[9] for job in job_tuples],
+        logos={job[9]: job[10] for job in job_tuples if job[10]}
+    )
+    location_ids = intern_names(cursor, 'locations', [job[4] for job in job_tuples])
+    return [
+        (job[0], make_snippet(job[1])) + job[2:4] + (location_ids.get(job[4]),) + job[5:9] + (company_ids.get(job[9]),) + job[11:]
+        for job in job_tuples
+    ]
+
+def migrate_name_columns(cursor):
+    """
+    One-off move of a database that still stores company and location names
+    on every job row to the dimension tables. Everything derived from jobs
+    is dropped here and rebuilt by create_schema.
+    """
+    cursor.execute('PRAGMA table_info(jobs)')
+    if 'company_name' not in {row[1] for row in cursor.fetchall()}:
+        return
+    
+    print("Moving company and location names to dimension tables...")
+    cursor.connection.create_function('normalize_name', 1, normalize_name, deterministic=True)
+    cursor.connection.create_function('tidy_name', 1, tidy_name, deterministic=True)
+    
+    # All or nothing: DDL would otherwise commit step by step
+    cursor.execute('SAVEPOINT migrate_name_columns')
+    try:
+        _migrate_name_columns(cursor)
+    except Exception:
+        cursor.execute('ROLLBACK TO migrate_name_columns')
+        cursor.execute('RELEASE migrate_name_columns')
+        raise
+    cursor.execute('RELEASE migrate_name_columns')
+
+def _migrate_name_columns(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    for (trigger_name,) in cursor.fetchall():
+        cursor.execute(f'DROP TRIGGER {trigger_name}')
+    for table in ('jobs_fts', 'company_stats', 'location_stats', 'company_location_stats'):
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    
+    for query in DIMENSION_TABLE_QUERIES:
+        cursor.execute(query)
+    cursor.execute('''
+        INSERT OR IGNORE INTO companies (name, name_key, logo)
+        SELECT tidy_name(company_name), normalize_name(company_name), company_logo
+        FROM jobs
+        WHERE normalize_name(company_name) IS NOT NULL
+        ORDER BY id
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO locations (name, name_key)
+        SELECT tidy_name(location), normalize_name(location)
+        FROM jobs
+        WHERE normalize_name(location) IS NOT NULL
+        ORDER BY id
+    ''')
+    
+    cursor.execute(JOBS_TABLE_QUERY.replace('EXISTS jobs', 'EXISTS jobs_migrated', 1))
+    cursor.execute(f'''
+        INSERT INTO jobs_migrated (id, {INSERT_COLUMNS}, imported_at)
+        SELECT
+            jobs.id, title, snippet, primary_description, detail_url, locations.id,
+            skill, insight, job_state, poster_id, companies.id,
+            created_at, scraped_at, imported_at
+        FROM jobs
+        LEFT JOIN companies ON companies.name_key = normalize_name(jobs.company_name)
+        LEFT JOIN locations ON locations.name_key = normalize_name(jobs.location)
+    ''')
+    cursor.execute('DROP TABLE jobs')
+    cursor.execute('ALTER TABLE jobs_migrated RENAME TO jobs')
+
+def migrate_description_column(cursor):
+    """
+    One-off move of a database that stores full descriptions on the jobs
+    rows to compressed job_descriptions rows plus a snippet column. The
+    search index is dropped here and rebuilt by create_schema.
+    """
+    cursor.execute('PRAGMA table_info(jobs)')
+    if 'description' not in {row[1] for row in cursor.fetchall()}:
+        return
+    
+    print("Compressing job descriptions...")
+    cursor.connection.create_function('make_snippet', 1, make_snippet, deterministic=True)
+    
+    cursor.execute('SAVEPOINT migrate_description_column')
+    try:
+        _migrate_description_column(cursor)
+    except Exception:
+        cursor.execute('ROLLBACK TO migrate_description_column')
+        cursor.execute('RELEASE migrate_description_column')
+        raise
+    cursor.execute('RELEASE migrate_description_column')
+    
+    # Give the space of the dropped column back to the file system
+    if not cursor.connection.in_transaction:
+        cursor.execute('VACUUM')
+
+def _migrate_description_column(cursor):
+    # The search triggers and job_details read the column being dropped
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    for (trigger_name,) in cursor.fetchall():
+        cursor.execute(f'DROP TRIGGER {trigger_name}')
+    cursor.execute('DROP TABLE IF EXISTS jobs_fts')
+    cursor.execute('DROP VIEW IF EXISTS job_details')
+    
+    for query in DESCRIPTION_TABLE_QUERIES:
+        cursor.execute(query)
+    cursor.execute('SELECT description FROM jobs WHERE description IS NOT NULL LIMIT ?', (DICTIONARY_SAMPLES,))
+    dictionary_id, dictionary = get_description_dictionary(cursor, [row[0] for row in cursor.fetchall()])
+    
+    last_id = 0
+    while True:
+        cursor.execute('SELECT id, description FROM jobs WHERE id > ? ORDER BY id LIMIT 10000', (last_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            'INSERT OR REPLACE INTO job_descriptions (job_id, dictionary_id, body) VALUES (?, ?, ?)',
+            [(job_id, dictionary_id, compress_description(text, dictionary)) for job_id, text in rows]
+        )
+        last_id = rows[-1][0]
+    
+    cursor.execute('ALTER TABLE jobs ADD COLUMN snippet TEXT')
+    cursor.execute('UPDATE jobs SET snippet = make_snippet(description)')
+    cursor.execute('ALTER TABLE jobs DROP COLUMN description')
+
+def migrate_canonical_column(cursor):
+    """
+    One-off addition of canonical_id to an existing jobs table. The view and
+    the triggers that now depend on it are dropped here and recreated by
+    create_schema, which then finds the duplicates among the existing rows.
+    """
+    cursor.execute('PRAGMA table_info(jobs)')
+    if 'canonical_id' in {row[1] for row in cursor.fetchall()}:
+        return
+    
+    print("Adding near-duplicate tracking...")
+    cursor.execute('SAVEPOINT migrate_canonical_column')
+    try:
+        cursor.execute('ALTER TABLE jobs ADD COLUMN canonical_id INTEGER REFERENCES jobs(id)')
+        cursor.execute('DROP VIEW IF EXISTS job_details')
+        for trigger_name in ('jobs_stats_delete', 'jobs_stats_update', 'jobs_skills_delete',
+                             'job_skills_stats_insert', 'job_skills_stats_delete'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger_name}')
+    except Exception:
+        cursor.execute('ROLLBACK TO migrate_canonical_column')
+        cursor.execute('RELEASE migrate_canonical_column')
+        raise
+    cursor.execute('RELEASE migrate_canonical_column')
+
+def create_schema(cursor):
+    """Create the jobs table and everything derived from it, if missing"""
+    register_schema_functions(cursor.connection)
+    cursor.execute(JOBS_TABLE_QUERY)
+    migrate_description_column(cursor)
+    migrate_name_columns(cursor)
+    migrate_canonical_column(cursor)
+    create_dimension_tables(cursor)
+    for index_query in INDEX_QUERIES:
+        cursor.execute(index_query)
+    create_search_index(cursor)
+    create_summary_tables(cursor)
+    create_skill_index(cursor)
+    create_duplicate_index(cursor)
+    create_import_state(cursor)
+
+def get_generation(cursor):
+    """Current data generation, 0 for databases that predate the counter"""
+    try:
+        cursor.execute("SELECT value FROM global_stats WHERE name = 'generation'")
+    except sqlite3.OperationalError:
+        return 0
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def get_database_stamp(cursor):
+    """Creation stamp of the database, 0 for databases that predate it"""
+    try:
+        cursor.execute("SELECT value FROM global_stats WHERE name = 'created'")
+    except sqlite3.OperationalError:
+        return 0
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def bump_generation(cursor):
+    """Mark the data as changed so cached responses get invalidated"""
+    cursor.execute('''
+        INSERT INTO global_stats (name, value) VALUES ('generation', 1)
+        ON CONFLICT (name) DO UPDATE SET value = value + 1
+    ''')
+
+def build_fts_query(text):
+    """
+    Turn free-form search box input into a safe FTS5 MATCH expression.
+    Every word must match; the last one is treated as a prefix so results
+    keep up while the user is still typing (once it has two letters).
+    """
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    
+    # One letter is below the shortest prefix index (2), so as a prefix it
+    # would read the whole term list; it is dropped after other words and
+    # otherwise matched as a whole word
+    if len(terms[-1]) == 1 and len(terms) > 1:
+        terms.pop()
+    phrases = ['"%s"' % term for term in terms]
+    if len(terms[-1]) > 1:
+        phrases[-1] += '*'
+    return ' '.join(phrases)
+
+def job_to_tuple(job):
+    """Prepare the insert tuple for a cleaned job record, handling missing keys gracefully"""
+    return (
+        job.get('Title'),
+        job.get('Description'),
+        job.get('Primary Description'),
+        job.get('Detail URL'),
+        job.get('Location'),
+        job.get('Skill'),
+        job.get('Insight'),
+        job.get('Job State'),
+        job.get('Poster Id'),
+        job.get('Company Name'),
+        job.get('Company Logo'),
+        job.get('Created At'),
+        job.get('Scraped At')
+    )
+
+def upsert_jobs(cursor, job_tuples):
+    """Insert or refresh a batch of job tuples, returning how many rows changed"""
+    cursor.executemany(UPSERT_QUERY, resolve_dimensions(cursor, job_tuples))
+    changed = cursor.rowcount
+    store_descriptions(cursor, job_tuples)
+    store_import_state(cursor, job_tuples)
+    return changed
+
+def iter_batches(iterable, batch_size):
+    """Group an iterable into lists of at most batch_size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def find_source_file():
+    """Pick the raw data file if present, otherwise a previously cleaned one"""
+    for path in ('data.json', 'data_cleaned.json'):
+        if os.path.exists(path):
+            return path
+    return None
+
+def create_database_and_import(source=None, workers=1):
     """
-    Creates a SQLite database with a jobs table and imports data from data_cleaned.json
+    Creates a SQLite database with a jobs table and imports data from data.json
+    (or data_cleaned.json). Records are streamed from the file and filtered on
+    the fly, so the dataset is never held in memory as a whole.
     """
     
     # Database file name
-    db_name = 'jobs_database.db'
+    db_name = DB_NAME
     
     try:
         # Connect to SQLite database (creates it if it doesn't exist)
@@ -17,104 +1314,63 @@ def create_database_and_import():
         conn = sqlite3.connect(db_name)
         cursor = conn.cursor()
         
-        # Create the jobs table
-        print("Creating jobs table...")
-        create_table_query = '''
-        CREATE TABLE IF NOT EXISTS jobs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            description TEXT,
-            primary_description TEXT,
-            detail_url TEXT UNIQUE,
-            location TEXT,
-            skill TEXT,
-            insight TEXT,
-            job_state TEXT,
-            poster_id TEXT,
-            company_name TEXT,
-            company_logo TEXT,
-            created_at TEXT,
-            scraped_at TEXT,
-            imported_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        '''
-        cursor.execute(create_table_query)
-        
-        # Create indexes for better query performance
-        print("Creating indexes...")
-        indexes = [
-            'CREATE INDEX IF NOT EXISTS idx_company_name ON jobs(company_name)',
-            'CREATE INDEX IF NOT EXISTS idx_location ON jobs(location)',
-            'CREATE INDEX IF NOT EXISTS idx_job_state ON jobs(job_state)',
-            'CREATE INDEX IF NOT EXISTS idx_created_at ON jobs(created_at)',
-            'CREATE INDEX IF NOT EXISTS idx_detail_url ON jobs(detail_url)'
-        ]
-        
-        for index_query in indexes:
-            cursor.execute(index_query)
-        
-        # Check if cleaned data file exists
-        if not os.path.exists('data_cleaned.json'):
-            print("Error: data_cleaned.json not found. Please run clean_json.py first.")
-            return
+        # WAL lets the web app keep reading while we write
+        cursor.execute('PRAGMA journal_mode = WAL')
         
-        # Read the cleaned JSON data
-        print("Reading cleaned JSON data...")
-        with open('data_cleaned.json', 'r', encoding='utf-8') as file:
-            jobs_data = json.load(file)
+        # Create the jobs table, indexes, full-text search index and the
+        # aggregate tables used by the web dashboard
+        print("Creating tables and indexes...")
+        create_schema(cursor)
         
-        print(f"Found {len(jobs_data)} jobs to import")
+        # Check if a data file exists
+        source = source or find_source_file()
+        if not source or not os.path.exists(source):
+            print("Error: data.json not found. Please add the raw job data first.")
+            return
         
         # Prepare insert query
-        insert_query = '''
-        INSERT OR IGNORE INTO jobs (
-            title, description, primary_description, detail_url, location,
-            skill, insight, job_state, poster_id, company_name,
-            company_logo, created_at, scraped_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        insert_query = f'''
+        INSERT OR IGNORE INTO jobs ({INSERT_COLUMNS})
+        VALUES ({INSERT_PLACEHOLDERS})
         '''
         
-        # Import data in batches
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM jobs')
+        last_id = cursor.fetchone()[0]
+        
+        # Stream records from the data file and import them in batches
+        print(f"Streaming job records from {source}...")
         batch_size = 1000
         imported_count = 0
         skipped_count = 0
         
-        for i in range(0, len(jobs_data), batch_size):
-            batch = jobs_data[i:i + batch_size]
-            batch_data = []
-            
-            for job in batch:
-                # Prepare data tuple, handling missing keys gracefully
-                job_tuple = (
-                    job.get('Title'),
-                    job.get('Description'),
-                    job.get('Primary Description'),
-                    job.get('Detail URL'),
-                    job.get('Location'),
-                    job.get('Skill'),
-                    job.get('Insight'),
-                    job.get('Job State'),
-                    job.get('Poster Id'),
-                    job.get('Company Name'),
-                    job.get('Company Logo'),
-                    job.get('Created At'),
-                    job.get('Scraped At')
-                )
-                batch_data.append(job_tuple)
+        job_tuples = (job_to_tuple(job) for job in iter_cleaned_records(source, workers))
+        for batch_number, batch_data in enumerate(iter_batches(job_tuples, batch_size), 1):
+            # Swap company/location names for their dimension ids and
+            # descriptions for snippets; the full text is stored below
+            job_rows = resolve_dimensions(cursor, batch_data)
             
             # Execute batch insert
             try:
-                cursor.executemany(insert_query, batch_data)
-                imported_count += len(batch_data)
-                print(f"Imported batch {i//batch_size + 1}: {len(batch_data)} records")
+                cursor.executemany(insert_query, job_rows)
+                imported_count += cursor.rowcount
+                skipped_count += len(batch_data) - cursor.rowcount
+                print(f"Imported batch {batch_number}: {len(batch_data)} records")
             except sqlite3.IntegrityError as e:
                 # Handle duplicate URLs
-                for job_tuple in batch_data:
+                for job_row in job_rows:
                     try:
-                        cursor.execute(insert_query, job_tuple)
+                        cursor.execute(insert_query, job_row)
                         imported_count += 1
                     except sqlite3.IntegrityError:
                         skipped_count += 1
+            store_descriptions(cursor, batch_data, DESCRIPTION_INSERT_QUERY)
+            store_import_state(cursor, batch_data, IMPORT_STATE_INSERT_QUERY)
+        
+        duplicate_count = 0
+        if imported_count:
+            cursor.execute('SELECT id FROM jobs WHERE id > ?', (last_id,))
+            duplicate_count = find_duplicates(cursor, [row[0] for row in cursor.fetchall()])
+            bump_generation(cursor)
         
         # Commit all changes
         conn.commit()
@@ -127,29 +1383,9 @@ def create_database_and_import():
         print(f"Total records in database: {total_records}")
         print(f"New records imported: {imported_count}")
         print(f"Duplicate records skipped: {skipped_count}")
+        print(f"Near-duplicates of earlier postings: {duplicate_count}")
         
-        # Show some sample data
-        print("\nSample of imported data:")
-        cursor.execute("SELECT title, company_name, location FROM jobs LIMIT 5")
-        samples = cursor.fetchall()
-        for sample in samples:
-            print(f"- {sample[0]} at {sample[1]} ({sample[2]})")
-        
-        # Show database statistics
-        print(f"\nDatabase statistics:")
-        cursor.execute("SELECT COUNT(DISTINCT company_name) FROM jobs WHERE company_name IS NOT NULL")
-        unique_companies = cursor.fetchone()[0]
-        print(f"Unique companies: {unique_companies}")
-        
-        cursor.execute("SELECT COUNT(DISTINCT location) FROM jobs WHERE location IS NOT NULL")
-        unique_locations = cursor.fetchone()[0]
-        print(f"Unique locations: {unique_locations}")
-        
-        cursor.execute("SELECT job_state, COUNT(*) FROM jobs GROUP BY job_state")
-        job_states = cursor.fetchall()
-        print("Job states distribution:")
-        for state, count in job_states:
-            print(f"  {state}: {count}")
+        print_database_summary(cursor)
         
     except json.JSONDecodeError as e:
         print(f"Error reading JSON file: {e}")
@@ -162,6 +1398,299 @@ def create_database_and_import():
             conn.close()
             print(f"\nDatabase connection closed. Database saved as '{db_name}'")
 
+def print_database_summary(cursor):
+    """Print sample rows and basic statistics of the jobs table"""
+    # Show some sample data
+    print("\nSample of imported data:")
+    cursor.execute("SELECT title, company_name, location FROM job_details LIMIT 5")
+    samples = cursor.fetchall()
+    for sample in samples:
+        print(f"- {sample[0]} at {sample[1]} ({sample[2]})")
+    
+    # Show database statistics
+    print(f"\nDatabase statistics:")
+    cursor.execute("SELECT COUNT(DISTINCT company_id) FROM jobs")
+    unique_companies = cursor.fetchone()[0]
+    print(f"Unique companies: {unique_companies}")
+    
+    cursor.execute("SELECT COUNT(DISTINCT location_id) FROM jobs")
+    unique_locations = cursor.fetchone()[0]
+    print(f"Unique locations: {unique_locations}")
+    
+    cursor.execute("SELECT job_state, COUNT(*) FROM jobs GROUP BY job_state")
+    job_states = cursor.fetchall()
+    print("Job states distribution:")
+    for state, count in job_states:
+        print(f"  {state}: {count}")
+
+def iter_unique_jobs(source, workers=1):
+    """
+    Stream insert tuples from source, keeping only the first record seen for
+    each detail_url (the same record INSERT OR IGNORE would keep)
+    """
+    seen_urls = set()
+    for job in iter_cleaned_records(source, workers):
+        url = job.get('Detail URL')
+        if url is not None:
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+        yield job_to_tuple(job)
+
+def build_derived_tables(cursor, progress=print):
+    """
+    Indexes, full-text search index, near-duplicate clusters, summary tables,
+    skill index and import state of jobs loaded into a bare jobs table
+    """
+    progress("Creating indexes...")
+    for index_query in INDEX_QUERIES:
+        cursor.execute(index_query)
+    
+    progress("Creating full-text search index...")
+    create_search_index(cursor)
+    
+    # Before the summary tables, so they are built from canonical jobs only
+    progress("Finding near-duplicate postings...")
+    create_duplicate_index(cursor)
+    
+    progress("Creating summary tables...")
+    create_summary_tables(cursor)
+    
+    progress("Indexing skills...")
+    create_skill_index(cursor)
+    
+    progress("Recording import state...")
+    create_import_state(cursor)
+
+def publish_database(conn, db_name):
+    """
+    Copy a finished scratch database over db_name with the backup API rather
+    than renaming the file, so connections readers already hold see the new data
+    """
+    target = sqlite3.connect(db_name)
+    try:
+        conn.backup(target)
+        target.execute('PRAGMA journal_mode = WAL')
+    finally:
+        target.close()
+
+def bulk_load_jobs(cursor, job_tuples, progress=print):
+    """
+    Load job tuples into an empty database opened with isolation_level=None:
+    rows go into an index-free table inside a single transaction with
+    journaling and syncs off, then everything derived from them is built
+    once and ANALYZE refreshes planner statistics. Returns the rows loaded
+    and the seconds spent loading them.
+    """
+    register_schema_functions(cursor.connection)
+    for pragma in BULK_LOAD_PRAGMAS:
+        cursor.execute(pragma)
+    
+    cursor.execute(JOBS_TABLE_QUERY)
+    create_dimension_tables(cursor)
+    # Filled by load_jobs, so create_import_state has nothing to seed later
+    create_import_state(cursor)
+    
+    # Load rows with no indexes or triggers in place. The description
+    # dictionary is trained on the first batch.
+    start = time.perf_counter()
+    cursor.execute('BEGIN')
+    loaded_count = 0
+    for batch_data in iter_batches(job_tuples, 10000):
+        load_jobs(cursor, batch_data, loaded_count + 1)
+        loaded_count += len(batch_data)
+        progress(f"Loaded {loaded_count} records...")
+    load_seconds = time.perf_counter() - start
+    
+    # Build everything that depends on the data once, at the end
+    build_derived_tables(cursor, progress)
+    cursor.execute('COMMIT')
+    
+    progress("Analyzing...")
+    cursor.execute('ANALYZE')
+    return loaded_count, load_seconds
+
+def bulk_load_database(source=None, workers=1):
+    """
+    Rebuild the database from scratch as fast as possible with
+    bulk_load_jobs. The new database is written to a scratch file and only
+    copied over the current one once complete.
+    """
+    db_name = DB_NAME
+    tmp_name = db_name + '.tmp'
+    
+    source = source or find_source_file()
+    if not source or not os.path.exists(source):
+        print("Error: data.json not found. Please add the raw job data first.")
+        return
+    
+    try:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        
+        print(f"Bulk loading {source} into a fresh database...")
+        conn = sqlite3.connect(tmp_name, isolation_level=None)
+        cursor = conn.cursor()
+        
+        start = time.perf_counter()
+        loaded_count, load_seconds = bulk_load_jobs(cursor, iter_unique_jobs(source, workers))
+        total_seconds = time.perf_counter() - start
+        
+        print(f"\nBulk load completed!")
+        print(f"Rows loaded: {loaded_count} in {load_seconds:.2f}s "
+              f"({loaded_count / max(load_seconds, 1e-9):,.0f} rows/sec)")
+        print(f"Total time including indexes: {total_seconds:.2f}s "
+              f"({loaded_count / max(total_seconds, 1e-9):,.0f} rows/sec)")
+        
+        print_database_summary(cursor)
+        
+        print(f"Publishing to '{db_name}'...")
+        target = sqlite3.connect(db_name)
+        cursor.execute(
+            "UPDATE global_stats SET value = ? WHERE name = 'generation'",
+            (get_generation(target.cursor()) + 1,)
+        )
+        target.close()
+        publish_database(conn, db_name)
+        print(f"\nDatabase saved as '{db_name}'")
+        
+    except json.JSONDecodeError as e:
+        print(f"Error reading JSON file: {e}")
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+def incremental_import(source=None, workers=1):
+    """
+    Refresh the database from a new full snapshot of the source data.
+    Every record is checked against the content hash and scraped_at the last
+    import recorded for its detail_url, so only new or changed records are
+    written. Jobs missing from the snapshot are marked REMOVED rather than
+    deleted, and a summary of the changes is printed and kept in import_runs.
+    """
+    db_name = DB_NAME
+    
+    source = source or find_source_file()
+    if not source or not os.path.exists(source):
+        print("Error: data.json not found. Please add the raw job data first.")
+        return
+    
+    try:
+        conn = sqlite3.connect(db_name)
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA journal_mode = WAL')
+        
+        print("Checking database structure...")
+        create_schema(cursor)
+        conn.commit()
+        
+        start = time.perf_counter()
+        cursor.execute("SELECT datetime('now')")
+        started_at = cursor.fetchone()[0]
+        cursor.execute('SELECT max_scraped_at FROM import_runs ORDER BY id DESC LIMIT 1')
+        row = cursor.fetchone()
+        previous_mark = row[0] if row else None
+        
+        cursor.execute('SELECT detail_url, content_hash, scraped_at, removed_at FROM import_state')
+        known = {row[0]: row[1:] for row in cursor}
+        
+        counts = dict.fromkeys(('inserted', 'updated', 'restored', 'unchanged', 'stale', 'removed', 'duplicates'), 0)
+        seen_urls = set()
+        max_scraped_at = None
+        pending = []
+        
+        def flush():
+            # upsert_jobs records the new hashes in import_state too
+            upsert_jobs(cursor, pending)
+            pending.clear()
+        
+        print(f"Comparing {source} with the database...")
+        for job in iter_cleaned_records(source, workers):
+            job_tuple = job_to_tuple(job)
+            url, scraped_at = job_tuple[3], job_tuple[-1]
+            if url is None:
+                continue
+            if url in seen_urls:
+                counts['duplicates'] += 1
+                continue
+            seen_urls.add(url)
+            if scraped_at is not None and (max_scraped_at is None or scraped_at > max_scraped_at):
+                max_scraped_at = scraped_at
+            
+            digest = content_hash(*job_tuple[:-1])
+            state = known.get(url)
+            if state is None:
+                counts['inserted'] += 1
+            else:
+                known_hash, known_scraped_at, removed_at = state
+                if removed_at is None and known_hash == digest:
+                    counts['unchanged'] += 1
+                    continue
+                if scraped_at is not None and known_scraped_at is not None and scraped_at < known_scraped_at:
+                    counts['stale'] += 1
+                    continue
+                counts['restored' if removed_at is not None else 'updated'] += 1
+            
+            pending.append(job_tuple)
+            if len(pending) >= 1000:
+                flush()
+                print(f"Written {counts['inserted'] + counts['updated'] + counts['restored']} changed records...")
+        if pending:
+            flush()
+        
+        # The snapshot is complete, so anything it no longer lists was taken
+        # down. An empty snapshot is more likely a broken scrape: keep everything.
+        removed_urls = [(url,) for url, state in known.items() if state[2] is None and url not in seen_urls]
+        if seen_urls and removed_urls:
+            cursor.executemany('UPDATE jobs SET job_state = ? WHERE detail_url = ?',
+                               [(REMOVED_JOB_STATE, url) for url, in removed_urls])
+            cursor.executemany("UPDATE import_state SET removed_at = datetime('now') WHERE detail_url = ?",
+                               removed_urls)
+            counts['removed'] = len(removed_urls)
+        
+        # New and rewritten jobs are clustered again; the upsert stamps imported_at
+        cursor.execute('SELECT id FROM jobs WHERE imported_at >= ?', (started_at,))
+        counts['near_duplicates'] = find_duplicates(cursor, [row[0] for row in cursor.fetchall()])
+        
+        changed = counts['inserted'] + counts['updated'] + counts['restored'] + counts['removed']
+        if changed:
+            bump_generation(cursor)
+        cursor.execute('''
+            INSERT INTO import_runs (source, started_at, max_scraped_at, inserted, updated, unchanged, stale, removed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (source, started_at, max_scraped_at, counts['inserted'], counts['updated'] + counts['restored'],
+              counts['unchanged'], counts['stale'], counts['removed']))
+        conn.commit()
+        elapsed = time.perf_counter() - start
+        
+        print(f"\nIncremental import completed in {elapsed:.2f}s")
+        print(f"Previous high-water mark (scraped_at): {previous_mark or 'none'}")
+        print(f"Current high-water mark (scraped_at):  {max_scraped_at or 'none'}")
+        print(f"  New records:       {counts['inserted']}")
+        print(f"  Updated records:   {counts['updated']}")
+        print(f"  Restored records:  {counts['restored']}")
+        print(f"  Removed records:   {counts['removed']}")
+        print(f"  Unchanged records: {counts['unchanged']}")
+        print(f"  Stale records:     {counts['stale']}")
+        print(f"  Duplicate URLs:    {counts['duplicates']}")
+        print(f"  Near-duplicates:   {counts['near_duplicates']}")
+        
+    except json.JSONDecodeError as e:
+        print(f"Error reading JSON file: {e}")
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
 def show_table_schema():
     """Show the database schema"""
     try:
@@ -179,6 +1708,94 @@ def show_table_schema():
     except sqlite3.Error as e:
         print(f"Error reading schema: {e}")
 
+def export_snapshot(db_name=DB_NAME):
+    """
+    Bring the columnar snapshot of the database (see utils/snapshot.py) up to
+    date for the query tool and analytics. Needs pyarrow; skipped without it.
+    """
+    if not os.path.exists(db_name):
+        return
+    try:
+        from utils.snapshot import open_snapshot, snapshot_path, write_snapshot
+    except ImportError:
+        from snapshot import open_snapshot, snapshot_path, write_snapshot
+    
+    path = snapshot_path(db_name)
+    conn = sqlite3.connect(db_name)
+    try:
+        if open_snapshot(conn, path) is not None:
+            print(f"\nColumnar snapshot '{path}' is up to date")
+            return
+        start = time.perf_counter()
+        rows = write_snapshot(conn, path)
+        print(f"\nColumnar snapshot: {rows} rows written to '{path}' in {time.perf_counter() - start:.2f}s")
+    except ImportError:
+        print("\nColumnar snapshot skipped: pyarrow is not installed")
+    except (sqlite3.Error, OSError) as e:
+        print(f"\nColumnar snapshot not written: {e}")
+    finally:
+        conn.close()
+
+def export_vectors(db_name=DB_NAME, rebuild=False):
+    """
+    Bring the job vector index (see utils/vectors.py) up to date for the
+    similar-jobs and semantic search endpoints: jobs imported since it was
+    last written are appended. rebuild refits the model on the current jobs
+    and rewrites every vector, which a fresh database needs since its ids
+    start over.
+    """
+    if not os.path.exists(db_name):
+        return
+    try:
+        from utils.vectors import build_vectors, update_vectors, vector_path
+    except ImportError:
+        from vectors import build_vectors, update_vectors, vector_path
+    
+    path = vector_path(db_name)
+    conn = sqlite3.connect(db_name)
+    register_functions(conn)
+    try:
+        start = time.perf_counter()
+        if rebuild:
+            rows = build_vectors(conn, path)
+            print(f"\nVector index: {rows} jobs embedded into '{path}' in {time.perf_counter() - start:.2f}s")
+        else:
+            rows = update_vectors(conn, path)
+            print(f"\nVector index: {rows} jobs embedded or refreshed in '{path}' in {time.perf_counter() - start:.2f}s")
+    except (sqlite3.Error, OSError) as e:
+        print(f"\nVector index not written: {e}")
+    finally:
+        conn.close()
+
+def main(argv=None):
+    """Command-line entry point, also called in-process from main.py"""
+    argv = sys.argv[1:] if argv is None else argv
+    # --bulk rebuilds the database from scratch using the fast load path,
+    # --incremental only applies what changed since the last import.
+    # --rebuild-vectors refits the vector model, as --bulk always does.
+    # --workers N cleans the records in N processes while they are imported.
+    workers = int(argv[argv.index('--workers') + 1]) if '--workers' in argv else 1
+    # --sharded (or JOBS_SHARDED=1) writes monthly shards and their catalog
+    # instead (see utils/shards.py); they are always rebuilt in full and the
+    # snapshot and vector index of the single database are not kept for them.
+    if '--sharded' in argv or os.environ.get('JOBS_SHARDED') == '1':
+        try:
+            from utils.shards import bulk_load_shards
+        except ImportError:
+            from shards import bulk_load_shards
+        if '--incremental' in argv:
+            print("Sharded storage has no incremental import, rebuilding every shard")
+        bulk_load_shards(workers=workers)
+        return
+    if '--bulk' in argv:
+        bulk_load_database(workers=workers)
+    elif '--incremental' in argv:
+        incremental_import(workers=workers)
+    else:
+        create_database_and_import(workers=workers)
+    export_snapshot()
+    export_vectors(rebuild='--bulk' in argv or '--rebuild-vectors' in argv)
+    show_table_schema()
+
 if __name__ == "__main__":
-    create_database_and_import()
-    show_table_schema()
\ No newline at end of file
+    main()
\ No newline at end of file
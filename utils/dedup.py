@@ -0,0 +1,143 @@
+import re
+import zlib
+
+# numpy is imported inside the functions that use it, so importing this
+# module (create_database does) stays cheap.
+
+# MinHash signature length, split into BANDS bands of BAND_ROWS values for
+# LSH. Two jobs become candidates when all values of any one band agree,
+# which happens with probability 1 - (1 - s**6)**10 for Jaccard similarity s:
+# ~95% at 0.8, ~15% at 0.5. Candidates are then compared on the whole signature.
+BANDS = 10
+BAND_ROWS = 6
+NUM_PERM = BANDS * BAND_ROWS
+
+# Consecutive words per shingle
+SHINGLE_WORDS = 3
+
+# Jaccard similarity of the shingle sets from which two jobs count as the
+# same posting. The signature estimate has a standard error of about 0.05,
+# so candidates estimated at CANDIDATE_THRESHOLD or more have their
+# similarity computed exactly before they are accepted.
+SIMILARITY_THRESHOLD = 0.8
+CANDIDATE_THRESHOLD = 0.65
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Fixed seed: signatures and band keys are stored, so they must not change
+# between runs
+SEED = 20240601
+
+# crc32 of every word seen, shared by all runs in the process
+_word_hashes = {}
+MAX_CACHED_WORDS = 1_000_000
+
+_constants = None
+
+def _hash_constants():
+    """(permutation multipliers, offsets, shingle weights, band multipliers, band salts)"""
+    global _constants
+    if _constants is None:
+        import numpy as np
+
+        rng = np.random.default_rng(SEED)
+        draw = lambda size: rng.integers(1, 2**63, size=size, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        _constants = (draw(NUM_PERM), draw(NUM_PERM), draw(SHINGLE_WORDS), draw(BAND_ROWS), draw(BANDS))
+    return _constants
+
+def job_text(title, company, description):
+    """The text a job is compared on: title, company and description"""
+    return ' '.join(part for part in (title, company, description) if part)
+
+def word_hashes(text):
+    """crc32 of each lowercased word of text"""
+    words = WORD_PATTERN.findall(text.lower())
+    try:
+        return [_word_hashes[word] for word in words]
+    except KeyError:
+        if len(_word_hashes) > MAX_CACHED_WORDS:
+            _word_hashes.clear()
+        for word in words:
+            if word not in _word_hashes:
+                _word_hashes[word] = zlib.crc32(word.encode('utf-8'))
+        return [_word_hashes[word] for word in words]
+
+def shingles(text):
+    """Distinct 64-bit hashes of the SHINGLE_WORDS-word runs of text"""
+    import numpy as np
+
+    _, _, weights, _, _ = _hash_constants()
+    words = np.array(word_hashes(text or ''), dtype=np.uint64)
+    total = len(words) - SHINGLE_WORDS + 1
+    if total <= 0:
+        return np.empty(0, dtype=np.uint64)
+    hashes = words[:total] * weights[0]
+    for offset in range(1, SHINGLE_WORDS):
+        hashes += words[offset:offset + total] * weights[offset]
+    return np.unique(hashes)
+
+def jaccard(shingles, other):
+    """Exact Jaccard similarity of two shingle hash sets"""
+    import numpy as np
+
+    union = len(np.union1d(shingles, other))
+    return len(np.intersect1d(shingles, other, assume_unique=True)) / union if union else 0.0
+
+def minhash_signatures(texts):
+    """
+    MinHash signatures of a batch of texts as (positions, signatures): the
+    positions of the texts with at least SHINGLE_WORDS words and a uint32
+    array with one row of NUM_PERM values for each of them. Each value is
+    the minimum of a multiply-shift hash over the text's shingles. Shingles
+    of the whole batch are hashed together, one permutation at a time.
+    """
+    import numpy as np
+
+    multipliers, offsets, weights, _, _ = _hash_constants()
+    positions = []
+    words = []
+    counts = []
+    for position, text in enumerate(texts):
+        hashes = word_hashes(text or '')
+        if len(hashes) >= SHINGLE_WORDS:
+            positions.append(position)
+            words.extend(hashes)
+            counts.append(len(hashes) - SHINGLE_WORDS + 1)
+    if not positions:
+        return positions, np.empty((0, NUM_PERM), dtype=np.uint32)
+
+    # Shingle hashes at every word position of the batch, then only those
+    # whose words all belong to the same text
+    words = np.array(words, dtype=np.uint64)
+    total = len(words) - SHINGLE_WORDS + 1
+    hashes = words[:total] * weights[0]
+    for offset in range(1, SHINGLE_WORDS):
+        hashes += words[offset:offset + total] * weights[offset]
+    counts = np.array(counts)
+    word_starts = np.cumsum(counts + SHINGLE_WORDS - 1) - (counts + SHINGLE_WORDS - 1)
+    starts = np.cumsum(counts) - counts
+    hashes = hashes[np.repeat(word_starts - starts, counts) + np.arange(counts.sum())]
+
+    signatures = np.empty((len(positions), NUM_PERM), dtype=np.uint32)
+    shift = np.uint64(32)
+    for column in range(NUM_PERM):
+        permuted = (hashes * multipliers[column] + offsets[column]) >> shift
+        signatures[:, column] = np.minimum.reduceat(permuted, starts)
+    return positions, signatures
+
+def band_keys(signatures):
+    """
+    LSH bucket key of every band of each signature, as non-negative 63-bit
+    integers (a row of BANDS keys per signature). The band number is mixed
+    in, so equal values in different bands do not share a bucket.
+    """
+    import numpy as np
+
+    _, _, _, multipliers, salts = _hash_constants()
+    bands = signatures.astype(np.uint64).reshape(len(signatures), BANDS, BAND_ROWS)
+    keys = (bands * multipliers).sum(axis=2, dtype=np.uint64) ^ salts
+    return (keys >> np.uint64(1)).astype(np.int64)
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return int((signature == other).sum()) / NUM_PERM
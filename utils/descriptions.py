@@ -0,0 +1,106 @@
+import hashlib
+import re
+import zlib
+from collections import Counter
+
+# Characters of the description kept on the jobs row for list views
+SNIPPET_LENGTH = 200
+
+# zlib uses at most the last 32 KB of a preset dictionary
+DICTIONARY_SIZE = 32 * 1024
+DICTIONARY_SAMPLES = 1000
+COMPRESSION_LEVEL = 6
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?:;])\s+|\n+')
+
+# Dictionaries by id, shared by every connection. Ids are content hashes,
+# so an entry stays valid even when the database file is rebuilt.
+_dictionaries = {}
+
+def make_snippet(description):
+    """Leading part of a description as shown in search and company listings"""
+    if description is None or len(description) <= SNIPPET_LENGTH:
+        return description
+    return description[:SNIPPET_LENGTH] + '...'
+
+def dictionary_id(dictionary):
+    """Stable 56-bit id of a dictionary, derived from its content"""
+    return int.from_bytes(hashlib.blake2b(dictionary, digest_size=7).digest(), 'big')
+
+def train_dictionary(samples, size=DICTIONARY_SIZE):
+    """
+    Build a zlib preset dictionary from sample descriptions: the sentences
+    and word runs that recur across the most descriptions, longest savings
+    first, with the most valuable ones placed last where they are cheapest
+    for zlib to reference.
+    """
+    counts = Counter()
+    for text in samples:
+        phrases = set()
+        for sentence in SENTENCE_PATTERN.split(text):
+            sentence = sentence.strip()
+            if len(sentence) >= 20:
+                phrases.add(sentence)
+            words = sentence.split()
+            phrases.update(' '.join(words[i:i + 4]) for i in range(len(words) - 3))
+        counts.update(phrases)
+
+    picked = []
+    picked_text = ''
+    total = 0
+    for phrase, count in sorted(counts.items(), key=lambda item: item[1] * len(item[0]), reverse=True):
+        if count < 2 or phrase in picked_text:
+            continue
+        total += len(phrase.encode('utf-8')) + 1
+        if total > size:
+            break
+        picked.append(phrase)
+        picked_text += phrase + '\n'
+    return '\n'.join(reversed(picked)).encode('utf-8')
+
+def compress_description(text, dictionary=None):
+    """zlib-compress a description, with the shared dictionary if there is one"""
+    if text is None:
+        return None
+    if dictionary is None:
+        return zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=dictionary)
+    return compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+def load_dictionary(conn, dictionary_id):
+    """Dictionary bytes for an id, read from the database on first use"""
+    dictionary = _dictionaries.get(dictionary_id)
+    if dictionary is None:
+        row = conn.execute(
+            'SELECT dictionary FROM description_dictionaries WHERE id = ?', (dictionary_id,)
+        ).fetchone()
+        dictionary = _dictionaries[dictionary_id] = bytes(row[0])
+    return dictionary
+
+def remember_dictionary(dictionary):
+    """Cache a newly trained dictionary and return its id"""
+    key = dictionary_id(dictionary)
+    _dictionaries[key] = dictionary
+    return key
+
+def decompress_description(conn, dictionary_id, body):
+    """Full description text from a job_descriptions row read through conn"""
+    if body is None:
+        return None
+    if dictionary_id is None:
+        return zlib.decompress(body).decode('utf-8')
+
+    decompressor = zlib.decompressobj(zdict=load_dictionary(conn, dictionary_id))
+    return (decompressor.decompress(body) + decompressor.flush()).decode('utf-8')
+
+def register_functions(conn):
+    """
+    Register the SQL function the schema's view and triggers use to read
+    descriptions. Needed on every connection that writes jobs or reads the
+    description column of job_details.
+    """
+    conn.create_function(
+        'decompress_description', 2,
+        lambda dictionary_id, body: decompress_description(conn, dictionary_id, body),
+        deterministic=True
+    )
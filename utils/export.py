@@ -0,0 +1,167 @@
+import csv
+import io
+import zlib
+
+from utils.create_database import normalize_name
+
+# Columns written by every export, in order
+EXPORT_COLUMNS = [
+    'id', 'title', 'description', 'primary_description', 'detail_url',
+    'location', 'skill', 'insight', 'job_state', 'poster_id',
+    'company_name', 'company_logo', 'created_at', 'scraped_at', 'imported_at'
+]
+
+# Rows pulled from SQLite per fetchmany() call
+CHUNK_SIZE = 2000
+
+def build_export_query(company=None, location=None, date_from=None, date_to=None):
+    """
+    SQL and parameters selecting the jobs to export. Dates are ISO strings
+    compared against created_at; date_to includes the whole day.
+    """
+    conditions = []
+    params = []
+    
+    # Names are matched the way they were interned (case, accents and spacing ignored)
+    if company:
+        conditions.append('company_id = (SELECT id FROM companies WHERE name_key = ?)')
+        params.append(normalize_name(company))
+    if location:
+        conditions.append('location_id = (SELECT id FROM locations WHERE name_key = ?)')
+        params.append(normalize_name(location))
+    if date_from:
+        conditions.append('created_at >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append("created_at < date(?, '+1 day')")
+        params.append(date_to)
+    
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM job_details"
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY id'
+    return query, params
+
+def iter_row_chunks(conn, query, params=(), chunk_size=CHUNK_SIZE):
+    """Run a query and yield its rows in lists of at most chunk_size"""
+    cursor = conn.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+def iter_csv(row_chunks, columns):
+    """Yield CSV text, the header first and then one piece per chunk of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    
+    writer.writerow(columns)
+    for rows in row_chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_gzip(text_chunks):
+    """Gzip-compress a stream of text pieces on the fly"""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for text in text_chunks:
+        data = compressor.compress(text.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+class _ParquetSink:
+    """Write-only file object that hands written bytes out between row groups"""
+    
+    def __init__(self):
+        self._buffer = io.BytesIO()
+        self._position = 0
+        self.closed = False
+    
+    def write(self, data):
+        self._buffer.write(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+def iter_parquet(row_chunks, columns):
+    """
+    Yield a Parquet file in pieces, one row group per chunk of rows.
+    Requires pyarrow; raises ImportError up front when it is missing.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema([(column, pa.int64() if column == 'id' else pa.string()) for column in columns])
+    return _iter_parquet_pieces(pa, pq, row_chunks, schema)
+
+def _iter_parquet_pieces(pa, pq, row_chunks, schema):
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    
+    for rows in row_chunks:
+        arrays = [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        data = sink.drain()
+        if data:
+            yield data
+    
+    writer.close()
+    yield sink.drain()
+
+def _count_rows(row_chunks, counter):
+    for rows in row_chunks:
+        counter['rows'] += len(rows)
+        yield rows
+
+def iter_export(conn, export_format='csv', counter=None, **filters):
+    """
+    Stream an export of the jobs table in the given format
+    ('csv', 'csv.gz' or 'parquet'), restricted by optional filters.
+    Memory use is bounded by CHUNK_SIZE regardless of the table size.
+    If a counter dict is given, counter['rows'] tracks rows written.
+    """
+    query, params = build_export_query(**filters)
+    row_chunks = iter_row_chunks(conn, query, params)
+    if counter is not None:
+        counter.setdefault('rows', 0)
+        row_chunks = _count_rows(row_chunks, counter)
+    
+    if export_format == 'csv':
+        return iter_csv(row_chunks, EXPORT_COLUMNS)
+    if export_format == 'csv.gz':
+        return iter_gzip(iter_csv(row_chunks, EXPORT_COLUMNS))
+    if export_format == 'parquet':
+        return iter_parquet(row_chunks, EXPORT_COLUMNS)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+def write_export(conn, path, export_format='csv', **filters):
+    """Write an export to a file, returning the number of rows written"""
+    counter = {'rows': 0}
+    pieces = iter_export(conn, export_format, counter, **filters)
+    mode = 'w' if export_format == 'csv' else 'wb'
+    encoding = 'utf-8' if export_format == 'csv' else None
+    
+    with open(path, mode, encoding=encoding, newline='' if encoding else None) as file:
+        for piece in pieces:
+            file.write(piece)
+    return counter['rows']
@@ -0,0 +1,142 @@
+from utils.create_database import normalize_name, FTS_RANK
+
+# Values returned per facet, most frequent first
+FACET_LIMIT = 10
+
+# Hides near-duplicates: each posting is represented by its canonical job
+CANONICAL_CONDITION = 'jobs.canonical_id IS NULL'
+
+# Facet name -> (dimension table, summary table keyed by its id)
+DIMENSION_FACETS = {
+    'company': ('companies', 'company_stats', 'company_id'),
+    'location': ('locations', 'location_stats', 'location_id'),
+    'skill': ('skills', 'skill_stats', 'skill_id')
+}
+
+def build_filter_conditions(skills=(), company=None, location=None, job_state=None,
+                            date_from=None, date_to=None, duplicates=False):
+    """
+    SQL conditions and parameters restricting the jobs (aliased "jobs", a
+    table or job_details) to the given facet values. Every listed skill must
+    be present. Names are matched the way they were interned; dates are ISO
+    strings compared against created_at, date_to including the whole day.
+    Near-duplicate jobs are left out unless duplicates is true.
+    """
+    conditions = [] if duplicates else [CANONICAL_CONDITION]
+    params = []
+
+    for skill in skills:
+        conditions.append('''jobs.id IN (
+            SELECT job_id FROM job_skills
+            WHERE skill_id = (SELECT id FROM skills WHERE name_key = ?)
+        )''')
+        params.append(normalize_name(skill))
+    if company:
+        conditions.append('jobs.company_id = (SELECT id FROM companies WHERE name_key = ?)')
+        params.append(normalize_name(company))
+    if location:
+        conditions.append('jobs.location_id = (SELECT id FROM locations WHERE name_key = ?)')
+        params.append(normalize_name(location))
+    if job_state:
+        conditions.append('jobs.job_state = ?')
+        params.append(job_state)
+    if date_from:
+        conditions.append('jobs.created_at >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append("jobs.created_at < date(?, '+1 day')")
+        params.append(date_to)
+    return conditions, params
+
+def build_match_query(columns, match_query=None, conditions=(), params=(), candidates=None):
+    """
+    SQL and parameters selecting columns of the jobs (aliased "jobs") that
+    match an FTS expression, if any, and the filter conditions. With a match
+    expression, a score column holds the BM25 rank; without one it is 0.
+    candidates limits the matches scored to that many of the newest ones,
+    so a common term does not rank (and sort) nearly every job.
+    """
+    if match_query:
+        query = f'''
+            SELECT {columns}, {FTS_RANK} AS score
+            FROM jobs_fts
+            JOIN job_details AS jobs ON jobs.id = jobs_fts.rowid
+            WHERE jobs_fts MATCH ?
+        '''
+        params = [match_query] + list(params)
+        if candidates:
+            # Newest first is the order of the doclist read backwards, no scoring needed
+            query += ''' AND jobs_fts.rowid >= COALESCE((
+                SELECT rowid FROM jobs_fts WHERE jobs_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?
+            ), 0)'''
+            params[1:1] = [match_query, candidates - 1]
+    else:
+        query = f'SELECT {columns}, 0 AS score FROM job_details AS jobs WHERE 1'
+        params = list(params)
+    for condition in conditions:
+        query += f' AND {condition}'
+    return query, params
+
+def _name_counts(conn, table, counts, limit=FACET_LIMIT):
+    """Top limit (id, count) pairs (all of them for None) turned into name/count dicts"""
+    top = sorted(((count, value) for value, count in counts if value is not None), key=lambda item: -item[0])
+    top = top[:limit]
+    names = {}
+    for start in range(0, len(top), 500):
+        ids = [value for _, value in top[start:start + 500]]
+        names.update(conn.execute(
+            f"SELECT id, name FROM {table} WHERE id IN ({', '.join('?' * len(ids))})", ids
+        ).fetchall())
+    return [{'name': names.get(value), 'count': count} for count, value in top]
+
+def facet_counts(conn, match_query=None, conditions=(), params=(), limit=FACET_LIMIT):
+    """
+    Job counts per skill, company, location and job_state among the jobs a
+    search matches, the limit most frequent values of each (every value
+    for None). A search restricted to nothing but canonical jobs reads
+    the precomputed summary tables, which count those; otherwise the
+    matching ids are collected once and every facet is grouped from that set
+    in the same statement.
+    """
+    sql_limit = -1 if limit is None else limit
+    facets = {}
+    if not match_query and list(conditions) == [CANONICAL_CONDITION]:
+        for facet, (table, stats_table, id_column) in DIMENSION_FACETS.items():
+            facets[facet] = [{'name': row[0], 'count': row[1]} for row in conn.execute(f'''
+                SELECT {table}.name, job_count FROM {stats_table}
+                JOIN {table} ON {table}.id = {stats_table}.{id_column}
+                ORDER BY job_count DESC LIMIT ?
+            ''', (sql_limit,))]
+        # idx_canonical_job_state covers this, so only the index is scanned
+        facets['job_state'] = [{'name': row[0], 'count': row[1]} for row in conn.execute(
+            f'SELECT job_state, COUNT(*) AS count FROM jobs WHERE {CANONICAL_CONDITION} '
+            'GROUP BY job_state ORDER BY count DESC LIMIT ?',
+            (sql_limit,)
+        )]
+        return facets
+
+    matches, params = build_match_query(
+        'jobs.id, jobs.company_id, jobs.location_id, jobs.job_state', match_query, conditions, params
+    )
+    groups = {'company': [], 'location': [], 'skill': [], 'job_state': []}
+    for facet, value, count in conn.execute(f'''
+        WITH matches AS MATERIALIZED ({matches})
+        SELECT 'company', company_id, COUNT(*) FROM matches GROUP BY company_id
+        UNION ALL
+        SELECT 'location', location_id, COUNT(*) FROM matches GROUP BY location_id
+        UNION ALL
+        SELECT 'job_state', job_state, COUNT(*) FROM matches GROUP BY job_state
+        UNION ALL
+        SELECT 'skill', job_skills.skill_id, COUNT(*)
+        FROM matches JOIN job_skills ON job_skills.job_id = matches.id
+        GROUP BY job_skills.skill_id
+    ''', params):
+        groups[facet].append((value, count))
+
+    for facet, (table, _, _) in DIMENSION_FACETS.items():
+        facets[facet] = _name_counts(conn, table, groups[facet], limit)
+    facets['job_state'] = [
+        {'name': value, 'count': count}
+        for value, count in sorted(groups['job_state'], key=lambda item: -item[1])[:limit]
+    ]
+    return facets
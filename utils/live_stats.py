@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import deque
+
+from utils.create_database import get_generation
+
+TOP_N = 5
+
+class DashboardFeed:
+    """
+    Shared source of live dashboard updates.
+    At most one database check runs per interval no matter how many
+    dashboards are listening. A check reads the data generation and, only
+    when it moved, computes a delta from the jobs inserted since the last
+    seen id (the watermark) plus the current totals and top lists. Deltas
+    are kept in a short history so every listener replays the same events.
+    """
+
+    def __init__(self, pool, interval=2.0, history=100):
+        self.pool = pool
+        self.interval = interval
+        self._events = deque(maxlen=history)  # (generation, payload)
+        self._generation = None
+        self._watermark = None
+        self._top_companies = None
+        self._top_locations = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _read_state(self, conn):
+        """Totals and top lists from the summary tables (all indexed lookups)"""
+        totals = {row[0]: row[1] for row in conn.execute(
+            "SELECT name, value FROM global_stats WHERE name NOT IN ('generation', 'created')"
+        )}
+        top_companies = [list(row) for row in conn.execute(
+            '''
+            SELECT companies.name, job_count FROM company_stats
+            JOIN companies ON companies.id = company_stats.company_id
+            ORDER BY job_count DESC LIMIT ?
+            ''', (TOP_N,)
+        )]
+        top_locations = [list(row) for row in conn.execute(
+            '''
+            SELECT locations.name, job_count FROM location_stats
+            JOIN locations ON locations.id = location_stats.location_id
+            ORDER BY job_count DESC LIMIT ?
+            ''', (TOP_N,)
+        )]
+        return totals, top_companies, top_locations
+
+    def _check(self):
+        conn = self.pool.acquire()
+        try:
+            generation = get_generation(conn.cursor())
+            if generation == self._generation:
+                return
+
+            max_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM jobs').fetchone()[0]
+            totals, top_companies, top_locations = self._read_state(conn)
+            reset = self._watermark is None or max_id < self._watermark
+
+            payload = {
+                'generation': generation,
+                'watermark': max_id,
+                'totals': totals,
+                'reset': reset,
+                'new_jobs': 0,
+                'new_by_company': []
+            }
+            if not reset:
+                # Only the rows past the watermark are read (a rowid range scan)
+                payload['new_jobs'] = conn.execute(
+                    'SELECT COUNT(*) FROM jobs WHERE id > ?', (self._watermark,)
+                ).fetchone()[0]
+                payload['new_by_company'] = [list(row) for row in conn.execute('''
+                    SELECT companies.name, new_jobs.count
+                    FROM (
+                        SELECT company_id, COUNT(*) AS count
+                        FROM jobs
+                        WHERE id > ? AND company_id IS NOT NULL
+                        GROUP BY company_id
+                        ORDER BY count DESC
+                        LIMIT ?
+                    ) AS new_jobs
+                    JOIN companies ON companies.id = new_jobs.company_id
+                    ORDER BY new_jobs.count DESC
+                ''', (self._watermark, TOP_N))]
+            if reset or top_companies != self._top_companies:
+                payload['top_companies'] = top_companies
+            if reset or top_locations != self._top_locations:
+                payload['top_locations'] = top_locations
+        finally:
+            self.pool.release(conn)
+
+        self._generation = generation
+        self._watermark = max_id
+        self._top_companies = top_companies
+        self._top_locations = top_locations
+        self._events.append((generation, payload))
+
+    def events_since(self, generation):
+        """
+        Events newer than the given generation, checking the database first
+        if the last check is older than the interval. A listener too far
+        behind (or ahead, after a database rebuild) gets a full snapshot.
+        """
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.interval:
+                self._checked_at = time.monotonic()
+                self._check()
+
+            if not self._events:
+                return []
+            oldest, latest = self._events[0][0], self._events[-1][0]
+            if generation is not None and oldest <= generation <= latest:
+                return [payload for event_generation, payload in self._events if event_generation > generation]
+            return [self.snapshot()]
+
+    def snapshot(self):
+        """Absolute state for listeners that cannot be served deltas"""
+        return {
+            'generation': self._generation,
+            'watermark': self._watermark,
+            'totals': self._events[-1][1]['totals'],
+            'reset': True,
+            'new_jobs': 0,
+            'new_by_company': [],
+            'top_companies': self._top_companies,
+            'top_locations': self._top_locations
+        }
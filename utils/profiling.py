@@ -0,0 +1,271 @@
+import bisect
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger('jobs.slow_queries')
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Distinct statements tracked; anything past this is counted under "other"
+MAX_TRACKED_QUERIES = 500
+
+SCAN_PATTERN = re.compile(r'^SCAN (\w+)')
+
+def normalize_sql(sql):
+    """Statement text with whitespace collapsed, used as the per-query key"""
+    return ' '.join(sql.split())
+
+class QueryProfiler:
+    """
+    Per-statement timing for every connection created with
+    ProfilingConnection: executions, time spent (execute plus fetches),
+    rows fetched and the query plan, taken once per distinct statement.
+    Statements slower than slow_ms are logged with their plan.
+    """
+
+    def __init__(self, slow_ms=200):
+        self.slow_seconds = slow_ms / 1000
+        self._stats = {}  # sql -> [count, total_seconds, max_seconds, rows]
+        self._plans = {}  # sql -> (full_scan, plan lines)
+        self._keys = {}   # statement text as executed -> normalized key
+        self._lock = threading.Lock()
+
+    def _explain(self, conn, sql, parameters):
+        """(full_scan, plan lines) of a SELECT, None for other statements"""
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        try:
+            plan = [row[3] for row in sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters)]
+            tables = {row[0] for row in sqlite3.Connection.execute(
+                conn, "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )}
+        except sqlite3.Error:
+            return None
+        # A SCAN of a real table (not a CTE or subquery) that uses no index
+        # reads every row; FTS lookups also show up as SCAN, as VIRTUAL TABLE
+        full_scan = any(
+            match and match.group(1) in tables and 'INDEX' not in line
+            for match, line in ((SCAN_PATTERN.match(line), line) for line in plan)
+        )
+        return full_scan, plan
+
+    def record(self, conn, sql, parameters, seconds, rows):
+        with self._lock:
+            key = self._keys.get(sql)
+            if key is None:
+                if len(self._keys) >= 2 * MAX_TRACKED_QUERIES:
+                    self._keys.clear()
+                key = self._keys[sql] = normalize_sql(sql)
+            if key not in self._stats and len(self._stats) >= MAX_TRACKED_QUERIES:
+                key = 'other'
+            stats = self._stats.setdefault(key, [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] += rows
+            needs_plan = key != 'other' and key not in self._plans
+            if needs_plan:
+                self._plans[key] = None  # claimed; filled in below
+
+        if needs_plan:
+            plan = self._explain(conn, sql, parameters)
+            with self._lock:
+                self._plans[key] = plan
+
+        if seconds >= self.slow_seconds:
+            plan = self._plans.get(key)
+            logger.warning(
+                'Slow query (%.1f ms, %d rows): %s%s', seconds * 1000, rows, key,
+                ' | plan: ' + '; '.join(plan[1]) if plan else ''
+            )
+
+    def queries(self):
+        """Per-statement stats, most total time first"""
+        with self._lock:
+            items = [(key, list(stats), self._plans.get(key)) for key, stats in self._stats.items()]
+        result = []
+        for key, (count, total, worst, rows), plan in sorted(items, key=lambda item: -item[1][1]):
+            result.append({
+                'id': query_id(key),
+                'sql': key,
+                'count': count,
+                'total_ms': round(total * 1000, 3),
+                'mean_ms': round(total * 1000 / count, 3),
+                'max_ms': round(worst * 1000, 3),
+                'rows': rows,
+                'full_scan': bool(plan and plan[0]),
+                'plan': plan[1] if plan and plan[0] else None
+            })
+        return result
+
+def query_id(sql):
+    """Short stable id of a statement, for metric labels"""
+    return hashlib.sha1(sql.encode('utf-8')).hexdigest()[:12]
+
+class ProfilingCursor(sqlite3.Cursor):
+    """
+    Cursor that times each statement from execute() until its rows have
+    been fetched (or the cursor is reused, closed or dropped) and reports
+    it to the connection's profiler
+    """
+
+    _pending = None  # [sql, parameters, seconds, rows]
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._pending = [sql, parameters, time.perf_counter() - start, 0]
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._pending = [sql, (), time.perf_counter() - start, 0]
+        self._finish()
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 0 if row is None else 1, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(start, len(rows), done=len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), done=True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, done=True)
+            raise
+        self._fetched(start, 1, done=False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _fetched(self, start, rows, done):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - start
+            pending[3] += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        profiler = getattr(self.connection, 'profiler', None)
+        if pending is not None and profiler is not None:
+            profiler.record(self.connection, *pending)
+
+class ProfilingConnection(sqlite3.Connection):
+    """
+    sqlite3 connection (pass as factory= to sqlite3.connect) whose
+    statements are timed by the QueryProfiler set as its profiler attribute
+    """
+
+    profiler = None
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class RouteMetrics:
+    """Request latency histograms and status counts per route, for /metrics"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}  # (route, method) -> [bucket counts..., sum, count]
+        self._statuses = {}    # (route, method, status) -> count
+        self._lock = threading.Lock()
+
+    def observe(self, route, method, status, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.setdefault((route, method), [0] * (len(self.buckets) + 2))
+            if index < len(self.buckets):
+                histogram[index] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            self._statuses[(route, method, status)] = self._statuses.get((route, method, status), 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return ({key: list(value) for key, value in self._histograms.items()}, dict(self._statuses))
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_prometheus(route_metrics, profiler=None, cache_stats=None):
+    """Metrics in the Prometheus text exposition format"""
+    lines = []
+    histograms, statuses = route_metrics.snapshot()
+
+    lines.append('# HELP jobs_http_request_duration_seconds Request latency by route')
+    lines.append('# TYPE jobs_http_request_duration_seconds histogram')
+    for (route, method), histogram in sorted(histograms.items()):
+        labels = f'route="{_label(route)}",method="{method}"'
+        cumulative = 0
+        for bound, count in zip(route_metrics.buckets, histogram):
+            cumulative += count
+            lines.append(f'jobs_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'jobs_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+        lines.append(f'jobs_http_request_duration_seconds_sum{{{labels}}} {histogram[-2]:.6f}')
+        lines.append(f'jobs_http_request_duration_seconds_count{{{labels}}} {histogram[-1]}')
+
+    lines.append('# HELP jobs_http_requests_total Requests by route and status')
+    lines.append('# TYPE jobs_http_requests_total counter')
+    for (route, method, status), count in sorted(statuses.items()):
+        lines.append(f'jobs_http_requests_total{{route="{_label(route)}",method="{method}",status="{status}"}} {count}')
+
+    if profiler is not None:
+        queries = profiler.queries()
+        for name, kind, help_text, field, scale in (
+            ('jobs_db_query_executions_total', 'counter', 'Statement executions', 'count', 1),
+            ('jobs_db_query_seconds_total', 'counter', 'Time spent executing and fetching', 'total_ms', 0.001),
+            ('jobs_db_query_rows_total', 'counter', 'Rows fetched', 'rows', 1),
+            ('jobs_db_query_full_scan', 'gauge', '1 if the statement plan scans a whole table', 'full_scan', 1),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for query in queries:
+                # Only the id is a label; the text is in /api/profile/queries
+                labels = f'query="{query["id"]}"'
+                value = query[field] * scale
+                lines.append(f'{name}{{{labels}}} {value:.6f}' if scale != 1 else f'{name}{{{labels}}} {int(value)}')
+
+    if cache_stats is not None:
+        for field in ('hits', 'misses', 'evictions'):
+            if field in cache_stats:
+                lines.append(f'# TYPE jobs_response_cache_{field}_total counter')
+                lines.append(f'jobs_response_cache_{field}_total {cache_stats[field]}')
+
+    return '\n'.join(lines) + '\n'
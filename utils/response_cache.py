@@ -0,0 +1,88 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+class ResponseCache:
+    """
+    In-process LRU cache for rendered responses.
+    Entries expire after ttl seconds, the total size of cached bodies is kept
+    under max_bytes, and everything is dropped as soon as the database
+    generation changes (i.e. after an import).
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, body, mimetype, etag)
+        self._size = 0
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            self._entries.clear()
+            self._size = 0
+            self._generation = generation
+
+    def _remove(self, key):
+        _, body, _, _ = self._entries.pop(key)
+        self._size -= len(body)
+
+    def get(self, key, generation):
+        """Return (body, mimetype, etag) for a fresh entry, or None"""
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, body, mimetype, etag = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body, mimetype, etag
+
+    def put(self, key, generation, body, mimetype):
+        """Store a response body and return its ETag"""
+        etag = hashlib.md5(body).hexdigest()
+        if len(body) > self.max_bytes:
+            return etag
+
+        with self._lock:
+            self._check_generation(generation)
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl, body, mimetype, etag)
+            self._size += len(body)
+
+            # Evict least recently used entries until we fit again
+            while self._size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+        return etag
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'generation': self._generation
+            }
@@ -0,0 +1,477 @@
+import heapq
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+try:
+    from utils.create_database import (
+        BULK_LOAD_PRAGMAS, DIMENSION_TABLE_QUERIES, JOBS_TABLE_QUERY, SUMMARY_TABLE_QUERIES,
+        build_derived_tables, create_dimension_tables, create_import_state, find_source_file,
+        get_generation, iter_unique_jobs, load_jobs, normalize_name, publish_database,
+        register_schema_functions
+    )
+except ImportError:
+    # Imported by create_database.py running as a script from inside utils/
+    from create_database import (
+        BULK_LOAD_PRAGMAS, DIMENSION_TABLE_QUERIES, JOBS_TABLE_QUERY, SUMMARY_TABLE_QUERIES,
+        build_derived_tables, create_dimension_tables, create_import_state, find_source_file,
+        get_generation, iter_unique_jobs, load_jobs, normalize_name, publish_database,
+        register_schema_functions
+    )
+
+# Partitioned storage: one complete jobs database per created_at month
+# (jobs_shards/2024-05.db, ...) plus jobs without a usable date in
+# undated.db, and a catalog listing them next to the totals of all shards
+SHARD_DIR = 'jobs_shards'
+CATALOG_NAME = 'catalog.db'
+UNDATED_SHARD = 'undated'
+
+MONTH_PATTERN = re.compile(r'(\d{4})-(0[1-9]|1[0-2])')
+
+# JOBS_SHARDED=1 makes the web app and query tool read the shards instead of
+# jobs_database.db (and create_database.py write them)
+SHARDED_STORAGE = os.environ.get('JOBS_SHARDED') == '1'
+
+# Threads shared by all fan-out queries; sqlite3 releases the GIL while a
+# statement runs, so shards are read in parallel
+SHARD_WORKERS = int(os.environ.get('JOBS_SHARD_WORKERS', 8))
+
+# Rows buffered per shard before they are written. Ids are handed out per
+# written batch, so each batch becomes one row of shard_ranges.
+SHARD_BATCH_SIZE = 2000
+
+# Every month has a scratch file open while rows are routed, so each keeps
+# a small page cache until its indexes are built
+SHARD_LOAD_CACHE_PRAGMA = 'PRAGMA cache_size = -16384'  # 16 MB
+
+# Shards are finished (indexes, search index, duplicates, summaries) in parallel processes
+SHARD_BUILD_WORKERS = int(os.environ.get('SHARD_BUILD_WORKERS', 0)) or min(os.cpu_count() or 1, 8)
+
+# The catalog has the summary tables of a single database (companies,
+# locations, company_stats, location_stats, company_location_stats,
+# global_stats) with the counts of every shard merged by name, so the
+# pages that only read those work on it unchanged. job_state_stats stands
+# in for grouping the jobs table (a NULL job_state is counted under '');
+# shards and shard_ranges route queries.
+CATALOG_QUERIES = [
+    '''
+    CREATE TABLE IF NOT EXISTS shards (
+        name TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        first_day TEXT,
+        end_day TEXT,
+        job_count INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS shard_ranges (
+        first_id INTEGER PRIMARY KEY,
+        shard TEXT NOT NULL REFERENCES shards(name)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS job_state_stats (
+        job_state TEXT PRIMARY KEY,
+        job_count INTEGER NOT NULL DEFAULT 0
+    )
+    '''
+]
+
+def shard_name(created_at):
+    """The shard a job goes to: its created_at month as YYYY-MM, or undated"""
+    match = MONTH_PATTERN.match(created_at or '')
+    return f'{match[1]}-{match[2]}' if match else UNDATED_SHARD
+
+def shard_bounds(name):
+    """(first day, day after the last) of a monthly shard as ISO dates; (None, None) when undated"""
+    if name == UNDATED_SHARD:
+        return None, None
+    year, month = map(int, name.split('-'))
+    return f'{name}-01', f'{year + month // 12:04d}-{month % 12 + 1:02d}-01'
+
+def shard_path(name, directory=SHARD_DIR):
+    return os.path.join(directory, f'{name}.db')
+
+def catalog_path(directory=SHARD_DIR):
+    return os.path.join(directory, CATALOG_NAME)
+
+def _open_scratch(path):
+    """Index-free scratch database for one shard, inside an open transaction"""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    register_schema_functions(conn)
+    cursor = conn.cursor()
+    for pragma in BULK_LOAD_PRAGMAS + [SHARD_LOAD_CACHE_PRAGMA]:
+        cursor.execute(pragma)
+    cursor.execute(JOBS_TABLE_QUERY)
+    create_dimension_tables(cursor)
+    create_import_state(cursor)
+    cursor.execute('BEGIN')
+    return conn
+
+def _finish_shard(tmp_name, db_name):
+    """
+    Build the derived tables of a loaded scratch shard and publish it over
+    db_name. Runs in a worker process; returns the canonical jobs in it.
+    """
+    conn = sqlite3.connect(tmp_name, isolation_level=None)
+    register_schema_functions(conn)
+    try:
+        cursor = conn.cursor()
+        for pragma in BULK_LOAD_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.execute('BEGIN')
+        build_derived_tables(cursor, progress=lambda message: None)
+        cursor.execute('COMMIT')
+        cursor.execute('ANALYZE')
+        cursor.execute("SELECT value FROM global_stats WHERE name = 'total_jobs'")
+        job_count = cursor.fetchone()[0]
+        publish_database(conn, db_name)
+        return job_count
+    finally:
+        conn.close()
+        os.remove(tmp_name)
+
+# Merge one attached shard's summary tables into the catalog, matching
+# companies and locations by name_key (their ids differ between shards)
+CATALOG_MERGE_STATEMENTS = [
+    '''
+    INSERT OR IGNORE INTO main.companies (name, name_key, logo)
+    SELECT name, name_key, logo FROM shard.companies
+    WHERE id IN (SELECT company_id FROM shard.company_stats)
+    ''',
+    '''
+    INSERT OR IGNORE INTO main.locations (name, name_key)
+    SELECT name, name_key FROM shard.locations
+    WHERE id IN (SELECT location_id FROM shard.location_stats)
+    ''',
+    '''
+    INSERT INTO main.company_stats (company_id, job_count, latest_job)
+    SELECT catalog.id, stats.job_count, stats.latest_job
+    FROM shard.company_stats AS stats
+    JOIN shard.companies AS company ON company.id = stats.company_id
+    JOIN main.companies AS catalog ON catalog.name_key = company.name_key
+    WHERE true
+    ON CONFLICT (company_id) DO UPDATE SET
+        job_count = job_count + excluded.job_count,
+        latest_job = CASE WHEN latest_job IS NULL OR excluded.latest_job > latest_job
+                          THEN excluded.latest_job ELSE latest_job END
+    ''',
+    '''
+    INSERT INTO main.location_stats (location_id, job_count)
+    SELECT catalog.id, stats.job_count
+    FROM shard.location_stats AS stats
+    JOIN shard.locations AS location ON location.id = stats.location_id
+    JOIN main.locations AS catalog ON catalog.name_key = location.name_key
+    WHERE true
+    ON CONFLICT (location_id) DO UPDATE SET job_count = job_count + excluded.job_count
+    ''',
+    '''
+    INSERT INTO main.company_location_stats (company_id, location_id, job_count)
+    SELECT catalog_company.id, catalog_location.id, stats.job_count
+    FROM shard.company_location_stats AS stats
+    JOIN shard.companies AS company ON company.id = stats.company_id
+    JOIN shard.locations AS location ON location.id = stats.location_id
+    JOIN main.companies AS catalog_company ON catalog_company.name_key = company.name_key
+    JOIN main.locations AS catalog_location ON catalog_location.name_key = location.name_key
+    WHERE true
+    ON CONFLICT (company_id, location_id) DO UPDATE SET job_count = job_count + excluded.job_count
+    ''',
+    '''
+    INSERT INTO main.job_state_stats (job_state, job_count)
+    SELECT COALESCE(job_state, ''), COUNT(*) FROM shard.jobs
+    WHERE canonical_id IS NULL GROUP BY job_state
+    ON CONFLICT (job_state) DO UPDATE SET job_count = job_count + excluded.job_count
+    ''',
+    '''
+    INSERT INTO main.global_stats (name, value)
+    SELECT name, value FROM shard.global_stats WHERE name IN ('total_jobs', 'duplicate_jobs')
+    ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+    '''
+]
+
+def write_catalog(conn, shard_rows, ranges, directory=SHARD_DIR):
+    """
+    Fill an empty catalog database from published shards: shard_rows are
+    (name, canonical jobs) and ranges (first id, shard name) of every batch
+    of ids handed out. Shards are attached one at a time, oldest first, so
+    the first spelling seen of a company or location name is kept.
+    """
+    cursor = conn.cursor()
+    for query in DIMENSION_TABLE_QUERIES + SUMMARY_TABLE_QUERIES + CATALOG_QUERIES:
+        cursor.execute(query)
+
+    cursor.execute('BEGIN')
+    for name, job_count in shard_rows:
+        first_day, end_day = shard_bounds(name)
+        cursor.execute(
+            'INSERT INTO shards (name, path, first_day, end_day, job_count) VALUES (?, ?, ?, ?, ?)',
+            (name, os.path.basename(shard_path(name, directory)), first_day, end_day, job_count)
+        )
+    cursor.executemany('INSERT INTO shard_ranges (first_id, shard) VALUES (?, ?)', ranges)
+    cursor.execute('COMMIT')
+
+    # ATTACH is not allowed inside a transaction, so every shard commits its own merge
+    for name, _ in shard_rows:
+        cursor.execute('ATTACH DATABASE ? AS shard', (shard_path(name, directory),))
+        cursor.execute('BEGIN')
+        for statement in CATALOG_MERGE_STATEMENTS:
+            cursor.execute(statement)
+        cursor.execute('COMMIT')
+        cursor.execute('DETACH DATABASE shard')
+
+    cursor.execute('BEGIN')
+    cursor.execute('''
+        UPDATE company_stats SET locations = (
+            SELECT COUNT(*) FROM company_location_stats p WHERE p.company_id = company_stats.company_id
+        )
+    ''')
+    cursor.execute('''
+        UPDATE location_stats SET companies = (
+            SELECT COUNT(*) FROM company_location_stats p WHERE p.location_id = location_stats.location_id
+        )
+    ''')
+    cursor.execute('''
+        UPDATE global_stats SET value = CASE name
+            WHEN 'total_companies' THEN (SELECT COUNT(*) FROM company_stats)
+            WHEN 'total_locations' THEN (SELECT COUNT(*) FROM location_stats)
+            ELSE value END
+    ''')
+    cursor.execute('COMMIT')
+    cursor.execute('ANALYZE')
+
+def bulk_load_shards(source=None, directory=SHARD_DIR, workers=1):
+    """
+    Rebuild the partitioned storage from scratch: records are routed by
+    their created_at month into one scratch database per shard and written
+    in batches with ids unique across shards. Each shard is then finished
+    like a bulk-loaded database, in parallel, and copied over its published
+    file; the catalog is written last and shards no longer listed in it are
+    removed.
+    """
+    source = source or find_source_file()
+    if not source or not os.path.exists(source):
+        print("Error: data.json not found. Please add the raw job data first.")
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    scratch = {}
+    buffers = defaultdict(list)
+    ranges = []
+    next_id = 1
+
+    def flush(name):
+        nonlocal next_id
+        batch = buffers[name]
+        if name not in scratch:
+            scratch[name] = _open_scratch(shard_path(name, directory) + '.tmp')
+        load_jobs(scratch[name].cursor(), batch, next_id)
+        ranges.append((next_id, name))
+        next_id += len(batch)
+        batch.clear()
+
+    try:
+        print(f"Bulk loading {source} into monthly shards in '{directory}'...")
+        start = time.perf_counter()
+        for job_tuple in iter_unique_jobs(source, workers):
+            name = shard_name(job_tuple[11])
+            buffers[name].append(job_tuple)
+            if len(buffers[name]) >= SHARD_BATCH_SIZE:
+                flush(name)
+                if len(ranges) % 10 == 0:
+                    print(f"Loaded {next_id - 1} records into {len(scratch)} shards...")
+        for name, batch in buffers.items():
+            if batch:
+                flush(name)
+        for conn in scratch.values():
+            conn.execute('COMMIT')
+            conn.close()
+        load_seconds = time.perf_counter() - start
+        loaded_count = next_id - 1
+
+        names = sorted(scratch)
+        print(f"Finishing {len(names)} shards with {SHARD_BUILD_WORKERS} workers...")
+        with ProcessPoolExecutor(max_workers=SHARD_BUILD_WORKERS) as executor:
+            job_counts = list(executor.map(
+                _finish_shard,
+                [shard_path(name, directory) + '.tmp' for name in names],
+                [shard_path(name, directory) for name in names]
+            ))
+
+        print("Writing the shard catalog...")
+        target = catalog_path(directory)
+        tmp_name = target + '.tmp'
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        conn = sqlite3.connect(tmp_name, isolation_level=None)
+        try:
+            write_catalog(conn, list(zip(names, job_counts)), ranges, directory)
+            generation = 0
+            if os.path.exists(target):
+                published = sqlite3.connect(target)
+                generation = get_generation(published.cursor())
+                published.close()
+            conn.execute("UPDATE global_stats SET value = ? WHERE name = 'generation'", (generation + 1,))
+            publish_database(conn, target)
+        finally:
+            conn.close()
+            os.remove(tmp_name)
+
+        # Only now that the catalog no longer routes to them
+        for file_name in os.listdir(directory):
+            name, extension = os.path.splitext(file_name)
+            if extension == '.db' and file_name != CATALOG_NAME and name not in scratch:
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(shard_path(name, directory) + suffix):
+                        os.remove(shard_path(name, directory) + suffix)
+
+        total_seconds = time.perf_counter() - start
+        print(f"\nSharded bulk load completed!")
+        print(f"Rows loaded: {loaded_count} in {load_seconds:.2f}s "
+              f"({loaded_count / max(load_seconds, 1e-9):,.0f} rows/sec)")
+        print(f"Total time including indexes: {total_seconds:.2f}s "
+              f"({loaded_count / max(total_seconds, 1e-9):,.0f} rows/sec)")
+        for name, job_count in zip(names, job_counts):
+            print(f"  {name}: {job_count} jobs")
+        print(f"\nCatalog saved as '{target}'")
+
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+    finally:
+        for conn in scratch.values():
+            conn.close()
+        for name in scratch:
+            if os.path.exists(shard_path(name, directory) + '.tmp'):
+                os.remove(shard_path(name, directory) + '.tmp')
+
+class SingleUsePool:
+    """Pool interface for tools without a pool: a new connection per acquire, closed on release"""
+
+    def __init__(self, connect):
+        self._connect = connect
+
+    def acquire(self):
+        return self._connect()
+
+    def release(self, conn):
+        conn.close()
+
+class ShardSet:
+    """
+    Read side of the partitioned storage. open_pool(path) makes the
+    connection pool of the catalog and of each shard (anything with
+    acquire() and release(conn), like the web app's ConnectionPool). The
+    shard list is read from the catalog again whenever its generation
+    moves, so a rebuild is picked up without a restart. Shards are
+    (name, first_day, end_day) tuples, newest first with undated last.
+    """
+
+    def __init__(self, open_pool, directory=SHARD_DIR, workers=SHARD_WORKERS):
+        self.directory = directory
+        self.catalog = open_pool(catalog_path(directory))
+        self._open_pool = open_pool
+        self._pools = {}
+        self._shards = []
+        self._generation = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shard')
+
+    def _refresh(self):
+        """Reload the shard list if the catalog has changed"""
+        conn = self.catalog.acquire()
+        try:
+            generation = get_generation(conn.cursor())
+            if generation == self._generation:
+                return
+            rows = conn.execute('''
+                SELECT name, path, first_day, end_day FROM shards
+                ORDER BY first_day IS NULL, first_day DESC
+            ''').fetchall()
+        finally:
+            self.catalog.release(conn)
+
+        with self._lock:
+            self._pools = {
+                name: self._pools.get(name) or self._open_pool(os.path.join(self.directory, path))
+                for name, path, _, _ in rows
+            }
+            self._shards = [(name, first_day, end_day) for name, _, first_day, end_day in rows]
+            self._generation = generation
+
+    def shards(self, date_from=None, date_to=None):
+        """
+        Shards that can hold jobs created between two ISO dates (date_to
+        inclusive, as in build_filter_conditions). Monthly shards outside
+        the range are pruned; the undated one is always kept since its
+        created_at values are not dates the range can be checked against.
+        """
+        self._refresh()
+        return [
+            shard for shard in self._shards
+            if shard[0] == UNDATED_SHARD or (
+                (not date_from or shard[2] > date_from) and (not date_to or shard[1] <= date_to)
+            )
+        ]
+
+    def shard_for_id(self, job_id):
+        """The shard a job id was given out to, or None"""
+        self._refresh()
+        conn = self.catalog.acquire()
+        try:
+            row = conn.execute(
+                'SELECT shard FROM shard_ranges WHERE first_id <= ? ORDER BY first_id DESC LIMIT 1', (job_id,)
+            ).fetchone()
+        finally:
+            self.catalog.release(conn)
+        if row is None:
+            return None
+        return next((shard for shard in self._shards if shard[0] == row[0]), None)
+
+    def run(self, fn, shard):
+        """fn(conn, shard) on a pooled connection of one shard"""
+        pool = self._pools[shard[0]]
+        conn = pool.acquire()
+        try:
+            return fn(conn, shard)
+        finally:
+            pool.release(conn)
+
+    def map(self, fn, shards):
+        """fn(conn, shard) on every shard in parallel; results in the order of shards"""
+        if len(shards) == 1:
+            return [self.run(fn, shards[0])]
+        return list(self._executor.map(lambda shard: self.run(fn, shard), shards))
+
+def merge_sorted(results, key, limit, reverse=False):
+    """First limit rows of per-shard row lists that are each sorted by key"""
+    return list(islice(heapq.merge(*results, key=key, reverse=reverse), limit))
+
+def merge_facets(facet_lists, limit):
+    """
+    Sum per-shard facet_counts results by value (names matched the way
+    they were interned) into the top limit of each facet. The sums are
+    exact when every shard reported all its values (facet_counts with
+    limit=None).
+    """
+    merged = {}
+    for facets in facet_lists:
+        for facet, values in facets.items():
+            counts = merged.setdefault(facet, {})
+            for value in values:
+                key = value['name'] if facet == 'job_state' else normalize_name(value['name'])
+                if key in counts:
+                    counts[key]['count'] += value['count']
+                else:
+                    counts[key] = dict(value)
+    return {
+        facet: sorted(counts.values(), key=lambda value: -value['count'])[:limit]
+        for facet, counts in merged.items()
+    }
@@ -0,0 +1,154 @@
+import gc
+import os
+
+try:
+    from utils.create_database import DB_NAME, get_database_stamp, get_generation
+except ImportError:
+    # Imported by create_database.py running as a script from inside utils/
+    from create_database import DB_NAME, get_database_stamp, get_generation
+
+# pyarrow (and pandas, for parsing dates) are imported inside the functions
+# that use them: they are only needed when a snapshot is written or read.
+
+# Rows per record batch in the snapshot file
+SNAPSHOT_BATCH_ROWS = 65536
+
+# Near-duplicates are left out, like in the summary tables
+SNAPSHOT_QUERY = '''
+    SELECT id, company_id, location_id, job_state, created_at, scraped_at
+    FROM jobs WHERE canonical_id IS NULL ORDER BY id
+'''
+
+def snapshot_path(db_name=DB_NAME):
+    """The snapshot belonging to a database: jobs_database.db -> jobs_database.arrow"""
+    return os.path.splitext(db_name)[0] + '.arrow'
+
+def _dictionary(conn, query):
+    """(sorted keys, values) of a dimension, for dictionary-encoding its ids"""
+    import pyarrow as pa
+
+    rows = conn.execute(query).fetchall()
+    return pa.array([row[0] for row in rows]), pa.array([row[1] for row in rows], pa.string())
+
+def _encode(values, keys, names, value_type):
+    """Dictionary array of names for a column of keys (null where unknown)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    indices = pc.index_in(pa.array(values, value_type), value_set=keys)
+    return pa.DictionaryArray.from_arrays(indices, names)
+
+def parse_timestamps(values):
+    """
+    ISO-8601 strings as a pandas datetime Series in naive UTC: 'T' or space
+    separated, with or without fractions, Z or an offset. Missing and
+    unparseable values become NaT. The snapshot and load_frame in
+    utils/analytics.py both parse through here so they agree.
+    """
+    import pandas as pd
+
+    # Offsets differ between rows, so everything is converted to UTC
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format='ISO8601', errors='coerce', utc=True)
+    return parsed.dt.tz_localize(None)
+
+def _timestamps(values):
+    import pyarrow as pa
+
+    return pa.Array.from_pandas(parse_timestamps(values).astype('datetime64[s]'))
+
+def _version(conn):
+    """Schema metadata tying a snapshot to one database and generation"""
+    cursor = conn.cursor()
+    return {'created': str(get_database_stamp(cursor)), 'generation': str(get_generation(cursor))}
+
+def write_snapshot(conn, path=None):
+    """
+    Write the non-text columns of canonical jobs to an uncompressed Arrow IPC file
+    that readers memory-map: id, company, location and job_state (dictionary
+    encoded, so each name is stored once) and the created_at / scraped_at
+    timestamps. The database creation stamp and generation are kept in the
+    schema metadata so readers can tell when the snapshot is out of date. Returns the rows written.
+    """
+    import pyarrow as pa
+
+    path = path or snapshot_path()
+    companies = _dictionary(conn, 'SELECT id, name FROM companies ORDER BY id')
+    locations = _dictionary(conn, 'SELECT id, name FROM locations ORDER BY id')
+    states = conn.execute('SELECT DISTINCT job_state FROM jobs WHERE job_state IS NOT NULL ORDER BY job_state').fetchall()
+    states = pa.array([row[0] for row in states], pa.string())
+    states = (states, states)
+
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('company', dictionary),
+        ('location', dictionary),
+        ('job_state', dictionary),
+        ('created_at', pa.timestamp('s')),
+        ('scraped_at', pa.timestamp('s'))
+    ], metadata=_version(conn))
+
+    written = 0
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    # Each batch is tens of thousands of live row tuples; letting the cyclic
+    # collector rescan them as they are fetched doubles the write time
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            cursor = conn.execute(SNAPSHOT_QUERY)
+            while True:
+                rows = cursor.fetchmany(SNAPSHOT_BATCH_ROWS)
+                if not rows:
+                    break
+                ids, company_ids, location_ids, job_states, created, scraped = zip(*rows)
+                writer.write_batch(pa.record_batch([
+                    pa.array(ids, pa.int64()),
+                    _encode(company_ids, *companies, pa.int64()),
+                    _encode(location_ids, *locations, pa.int64()),
+                    _encode(job_states, *states, pa.string()),
+                    _timestamps(created),
+                    _timestamps(scraped)
+                ], schema=schema))
+                written += len(rows)
+        os.replace(tmp_path, path)
+    finally:
+        if collecting:
+            gc.enable()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
+
+def open_snapshot(conn, path=None):
+    """
+    The snapshot as a memory-mapped Arrow table (nothing is copied until a
+    column is used), or None when it is missing, pyarrow is not installed,
+    or the database has changed since it was written
+    """
+    path = path or snapshot_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(path))
+    except (OSError, pa.ArrowInvalid):
+        return None
+    metadata = reader.schema.metadata or {}
+    version = _version(conn)
+    if any(metadata.get(key.encode()) != value.encode() for key, value in version.items()):
+        return None
+    return reader.read_all()
+
+def count_by(table, column, limit=None):
+    """(value, job count) pairs of a column, most jobs first; unknown values left out"""
+    import pyarrow.compute as pc
+
+    counts = table.group_by(column).aggregate([([], 'count_all')])
+    counts = counts.filter(pc.is_valid(counts[column])).sort_by([('count_all', 'descending')])
+    if limit is not None:
+        counts = counts.slice(0, limit)
+    return list(zip(counts[column].to_pylist(), counts['count_all'].to_pylist()))
@@ -0,0 +1,264 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from utils.create_database import get_generation, normalize_name
+
+# Most suggestions a request can ask for
+MAX_SUGGESTIONS = 20
+
+# Prefixes up to this length get their suggestions precomputed; they match
+# too many keys to rank on every keystroke
+SHORT_PREFIX = 2
+
+# Keys examined for a longer prefix before ranking
+SCAN_LIMIT = 2000
+
+# Word positions indexed per entry, so "engineer" finds "Senior Data Engineer"
+MAX_WORD_OFFSETS = 4
+
+# Lowest trigram similarity for a word to count as a correction
+MIN_SIMILARITY = 0.35
+
+# Words sharing the most trigrams with a typo that are checked for edits
+EDIT_CANDIDATES = 200
+
+# Edits (insertions, deletions, substitutions, swaps of neighbouring
+# letters) a correction may make: one for words up to SHORT_WORD letters,
+# two for longer ones
+MAX_EDITS_SHORT = 1
+MAX_EDITS = 2
+SHORT_WORD = 4
+
+def trigrams(word):
+    """Character trigrams of a word, padded so its start weighs more"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distances(a, b, limit):
+    """
+    Damerau-Levenshtein distances (optimal string alignment) from a to every
+    prefix of b, b[:0] to b, or None once all of them exceed limit
+    """
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return None
+    return current
+
+class SuggestIndex:
+    """
+    In-memory autocomplete over job titles, companies and skills, weighted
+    by job counts. Prefix lookups bisect a sorted array of normalized keys
+    (every entry is also keyed from its later words); words that match no
+    vocabulary prefix are corrected through a trigram index before lookup.
+    """
+
+    def __init__(self, entries, generation=None):
+        # entries: (display text, type, weight)
+        self.entries = entries
+        self.generation = generation
+
+        pairs = []
+        words = Counter()
+        for entry_id, (text, _, weight) in enumerate(entries):
+            key_words = normalize_name(text).split()
+            for offset in range(min(len(key_words), MAX_WORD_OFFSETS)):
+                pairs.append((' '.join(key_words[offset:]), entry_id))
+            for word in key_words:
+                words[word] += weight
+        pairs.sort()
+        self._keys = [key for key, _ in pairs]
+        self._key_entries = [entry_id for _, entry_id in pairs]
+
+        self._short = {}
+        for key, entry_id in pairs:
+            for length in range(1, min(len(key), SHORT_PREFIX) + 1):
+                self._short.setdefault(key[:length], set()).add(entry_id)
+        for prefix, entry_ids in self._short.items():
+            self._short[prefix] = self._rank(entry_ids, MAX_SUGGESTIONS)
+
+        self._vocabulary = sorted(words)
+        self._word_weights = words
+        self._trigrams = {}
+        self._gram_counts = {}
+        for word in self._vocabulary:
+            grams = trigrams(word)
+            self._gram_counts[word] = len(grams)
+            for gram in grams:
+                self._trigrams.setdefault(gram, []).append(word)
+
+    @classmethod
+    def build(cls, conn):
+        """Read titles, companies and skills with their job counts from the database"""
+        generation = get_generation(conn.cursor())
+        titles = {}
+        for title, count in conn.execute(
+            'SELECT title, COUNT(*) FROM jobs WHERE title IS NOT NULL GROUP BY title'
+        ):
+            key = normalize_name(title)
+            if key is None:
+                continue
+            # Titles differing only in case or spacing are one suggestion
+            if key in titles:
+                titles[key][2] += count
+            else:
+                titles[key] = [' '.join(title.split()), 'title', count]
+        entries = [tuple(entry) for entry in titles.values()]
+        entries += [(name, 'company', count) for name, count in conn.execute(
+            'SELECT companies.name, job_count FROM company_stats JOIN companies ON companies.id = company_stats.company_id'
+        )]
+        entries += [(name, 'skill', count) for name, count in conn.execute(
+            'SELECT skills.name, job_count FROM skill_stats JOIN skills ON skills.id = skill_stats.skill_id'
+        )]
+        return cls(entries, generation)
+
+    def _rank(self, entry_ids, limit):
+        return heapq.nlargest(limit, entry_ids, key=lambda entry_id: (self.entries[entry_id][2], -entry_id))
+
+    def _prefix_matches(self, prefix, limit):
+        if len(prefix) <= SHORT_PREFIX:
+            return self._short.get(prefix, [])[:limit]
+        start = bisect_left(self._keys, prefix)
+        entry_ids = set()
+        exact = []
+        for position in range(start, min(start + SCAN_LIMIT, len(self._keys))):
+            key = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            entry_ids.add(self._key_entries[position])
+            if key == prefix:
+                exact.append(self._key_entries[position])
+        # Whatever was typed in full comes before longer completions
+        ranked = self._rank(entry_ids.difference(exact), limit)
+        return (self._rank(exact, limit) + ranked)[:limit]
+
+    def _is_word_prefix(self, word):
+        position = bisect_left(self._vocabulary, word)
+        return position < len(self._vocabulary) and self._vocabulary[position].startswith(word)
+
+    def correct_word(self, word, prefix=False):
+        """
+        Closest vocabulary word, or None. Of the words sharing the most
+        trigrams with word, the one fewest edits away wins (any prefix of it
+        counts when prefix is set), then a whole-word match, then the most
+        jobs. Without one close enough in edits, the best trigram similarity
+        is taken.
+        """
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigrams.get(gram, ()))
+        limit = MAX_EDITS_SHORT if len(word) <= SHORT_WORD else MAX_EDITS
+
+        best = None
+        best_score = (-limit - 1, False, 0)
+        for candidate, _ in shared.most_common(EDIT_CANDIDATES):
+            if len(candidate) < len(word) - limit or (not prefix and len(candidate) > len(word) + limit):
+                continue
+            # Past len(word) + limit letters no prefix of the candidate can be close
+            distances = edit_distances(word, candidate[:len(word) + limit], limit)
+            if distances is None:
+                continue
+            whole = distances[-1] if len(candidate) <= len(word) + limit else limit + 1
+            distance = min(distances) if prefix else whole
+            score = (-distance, whole <= distance, self._word_weights[candidate])
+            if distance <= limit and score > best_score:
+                best, best_score = candidate, score
+        if best is not None:
+            return best
+
+        best_score = (MIN_SIMILARITY, 0)
+        for candidate, count in shared.items():
+            similarity = count / (len(grams) + self._gram_counts[candidate] - count)
+            score = (similarity, self._word_weights[candidate])
+            if score > best_score:
+                best, best_score = candidate, score
+        return best
+
+    def suggest(self, query, limit=8):
+        """
+        Suggestions for what has been typed so far, as (suggestions,
+        corrected query or None). The last word is treated as a prefix.
+        """
+        prefix = normalize_name(query)
+        if prefix is None:
+            return [], None
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+
+        entry_ids = self._prefix_matches(prefix, limit)
+        corrected = None
+        if len(entry_ids) < limit:
+            # Every word but the last must be a whole vocabulary word; the
+            # last one is still being typed, so a prefix of one will do
+            words = prefix.split()
+            fixed = []
+            for position, word in enumerate(words):
+                last = position == len(words) - 1
+                known = self._is_word_prefix(word) if last else word in self._word_weights
+                fixed.append(word if len(word) < 3 or known else (self.correct_word(word, prefix=last) or word))
+            if fixed != words:
+                corrected = ' '.join(fixed)
+                extra = [entry_id for entry_id in self._prefix_matches(corrected, limit) if entry_id not in entry_ids]
+                entry_ids = entry_ids + extra[:limit - len(entry_ids)]
+                if not extra:
+                    corrected = None
+
+        suggestions = [
+            {'text': text, 'type': kind, 'count': weight}
+            for text, kind, weight in (self.entries[entry_id] for entry_id in entry_ids)
+        ]
+        return suggestions, corrected
+
+class SuggestService:
+    """
+    Keeps a SuggestIndex in step with the database. The first request builds
+    it; once the generation moves, a background rebuild swaps in a new one
+    while the old index keeps answering.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._index = None
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def _build(self):
+        conn = self.pool.acquire()
+        try:
+            start = time.perf_counter()
+            index = SuggestIndex.build(conn)
+            index.build_seconds = time.perf_counter() - start
+            return index
+        finally:
+            self.pool.release(conn)
+
+    def _rebuild(self):
+        try:
+            self._index = self._build()
+        finally:
+            self._rebuilding = False
+
+    def current(self, conn):
+        """The index to answer from, starting a rebuild if the data changed"""
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build()
+                return self._index
+
+        if get_generation(conn.cursor()) != index.generation:
+            with self._lock:
+                if not self._rebuilding:
+                    self._rebuilding = True
+                    threading.Thread(target=self._rebuild, daemon=True).start()
+        return index
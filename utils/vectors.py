@@ -0,0 +1,544 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from itertools import chain, repeat
+
+try:
+    from utils.create_database import DB_NAME
+except ImportError:
+    # Imported by create_database.py running as a script from inside utils/
+    from create_database import DB_NAME
+
+# numpy is imported inside the functions that use it, so the web app and the
+# importer only load it once vectors are built or searched.
+
+# Dimensions of the job vectors: TF-IDF weights projected onto the top
+# singular vectors of a sample of jobs (latent semantic analysis)
+VECTOR_DIM = 128
+
+# Vocabulary: the MAX_TERMS words found in most sampled jobs, if they are
+# in at least MIN_DOCUMENT_FREQUENCY of them
+MAX_TERMS = 30000
+MIN_DOCUMENT_FREQUENCY = 2
+
+# Jobs the vocabulary and projection are fitted on
+FIT_SAMPLE = 20000
+
+# Title words count this many times against the description
+TITLE_WEIGHT = 3
+
+# Randomized SVD: extra dimensions sampled and power iterations done to
+# sharpen the leading singular vectors
+OVERSAMPLE = 16
+POWER_ITERATIONS = 2
+
+# Jobs read, projected and appended at a time
+EMBED_BATCH = 2000
+
+# Coarse quantizer: about sqrt(jobs) k-means lists, trained on a sample.
+# A search scans the DEFAULT_NPROBE lists closest to the query; indexes of
+# fewer than EXACT_ROWS jobs are always scanned in full.
+MAX_LISTS = 1024
+KMEANS_SAMPLE = 50000
+KMEANS_ITERATIONS = 10
+DEFAULT_NPROBE = 8
+EXACT_ROWS = 20000
+
+# Rows per block of an exhaustive scan
+SCAN_BLOCK_ROWS = 65536
+
+# Fixed seed, so rebuilding from the same data gives the same vectors
+SEED = 20240601
+
+# Words of two or more characters
+WORD_PATTERN = re.compile(r'\w\w+')
+
+VECTOR_TEXT_QUERY = '''
+    SELECT id, title, description, imported_at FROM job_details
+'''
+
+def vector_path(db_name=DB_NAME):
+    """The vector index belonging to a database: jobs_database.db -> jobs_database.vectors/"""
+    return os.path.splitext(db_name)[0] + '.vectors'
+
+def term_counts(title, description):
+    """Counts of the lowercased words of a job, each title word counting TITLE_WEIGHT times"""
+    counts = Counter(WORD_PATTERN.findall((description or '').lower()))
+    for word in WORD_PATTERN.findall((title or '').lower()):
+        counts[word] += TITLE_WEIGHT
+    return counts
+
+def _sparse_rows(jobs_counts, columns, idf):
+    """
+    TF-IDF rows of jobs' term counts as (indptr, columns, values), CSR style:
+    sublinear term frequency times idf, each row scaled to unit length.
+    Words outside the vocabulary are dropped.
+    """
+    import numpy as np
+
+    total = sum(len(counts) for counts in jobs_counts)
+    words = chain.from_iterable(jobs_counts)
+    row_columns = np.fromiter(map(columns.get, words, repeat(-1)), dtype=np.int64, count=total)
+    counts = np.fromiter(chain.from_iterable(counts.values() for counts in jobs_counts), dtype=np.float32, count=total)
+    rows = np.repeat(np.arange(len(jobs_counts)), [len(counts) for counts in jobs_counts])
+    known = row_columns >= 0
+    row_columns = row_columns[known]
+    indptr = np.zeros(len(jobs_counts) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows[known], minlength=len(jobs_counts)), out=indptr[1:])
+    values = (1 + np.log(counts[known])) * idf[row_columns]
+    values /= np.sqrt(np.bincount(rows[known], weights=values ** 2)).astype(np.float32)[rows[known]]
+    return indptr, row_columns, values
+
+# The sparse products go row by row: each row is one small BLAS call, which
+# beats segment sums (np.add.reduceat) over the gathered rows several times
+
+def _sparse_dot(rows, dense):
+    """Sparse rows times a dense (terms x k) matrix"""
+    import numpy as np
+
+    indptr, columns, values = rows
+    result = np.zeros((len(indptr) - 1, dense.shape[1]), dtype=np.float32)
+    for row in range(len(indptr) - 1):
+        start, stop = indptr[row], indptr[row + 1]
+        if start < stop:
+            result[row] = values[start:stop] @ dense[columns[start:stop]]
+    return result
+
+def _sparse_tdot(rows, dense, terms):
+    """Transposed sparse rows times a dense (rows x k) matrix, giving terms x k"""
+    import numpy as np
+
+    indptr, columns, values = rows
+    result = np.zeros((terms, dense.shape[1]), dtype=np.float32)
+    for row in range(len(indptr) - 1):
+        start, stop = indptr[row], indptr[row + 1]
+        # A row has each column at most once
+        result[columns[start:stop]] += values[start:stop, None] * dense[row]
+    return result
+
+def _normalize(vectors):
+    """Rows scaled to unit length (zero rows stay zero)"""
+    import numpy as np
+
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(lengths, 1e-12)).astype(np.float32)
+
+class TextModel:
+    """
+    Maps job text to VECTOR_DIM-dimensional unit vectors: TF-IDF over a fixed
+    vocabulary projected onto singular vectors fitted once, so jobs imported
+    later get vectors comparable to the ones already stored.
+    """
+
+    def __init__(self, terms, idf, components):
+        self.terms = terms
+        self.idf = idf
+        self.components = components
+        self._columns = {term: column for column, term in enumerate(terms)}
+
+    @classmethod
+    def fit(cls, jobs_counts):
+        """Choose the vocabulary and fit the projection on the term counts of a sample of jobs"""
+        import numpy as np
+
+        frequencies = Counter(chain.from_iterable(jobs_counts))
+        terms = sorted(
+            (term for term, count in frequencies.items() if count >= MIN_DOCUMENT_FREQUENCY),
+            key=lambda term: (-frequencies[term], term)
+        )[:MAX_TERMS]
+        terms.sort()
+        counts = np.array([frequencies[term] for term in terms], dtype=np.float32)
+        idf = (np.log((1 + len(jobs_counts)) / (1 + counts)) + 1).astype(np.float32)
+
+        model = cls(terms, idf, None)
+        rows = _sparse_rows(jobs_counts, model._columns, idf)
+        model.components = _randomized_svd(rows, len(terms), min(VECTOR_DIM, len(terms), len(jobs_counts)))
+        return model
+
+    def transform(self, jobs_counts):
+        """Unit vectors (float32, one row per job) of jobs' term counts"""
+        import numpy as np
+
+        vectors = _sparse_dot(_sparse_rows(jobs_counts, self._columns, self.idf), self.components)
+        if vectors.shape[1] < VECTOR_DIM:
+            vectors = np.hstack([vectors, np.zeros((len(vectors), VECTOR_DIM - vectors.shape[1]), np.float32)])
+        return _normalize(vectors)
+
+    def embed(self, text):
+        """Unit vector of free text, such as a search query"""
+        return self.transform([term_counts(text, None)])[0]
+
+def _orthonormalize(matrix):
+    """
+    Orthonormal basis of the columns of a tall matrix, through the
+    eigenvectors of its small Gram matrix; a QR factorization of the whole
+    matrix costs several times more. Directions with no weight are dropped.
+    """
+    import numpy as np
+
+    weights, directions = np.linalg.eigh(matrix.T.astype(np.float64) @ matrix)
+    kept = weights > weights.max() * 1e-10
+    return (matrix @ (directions[:, kept] / np.sqrt(weights[kept]))).astype(np.float32)
+
+def _randomized_svd(rows, terms, dim):
+    """
+    Top right singular vectors (terms x dim) of the sparse TF-IDF rows, by a
+    randomized range finder (Halko, Martinsson & Tropp): sparse products
+    against a random sketch, sharpened by power iterations, then an exact
+    SVD of the small projected matrix.
+    """
+    import numpy as np
+
+    if dim == 0:
+        return np.zeros((terms, 0), dtype=np.float32)
+    rng = np.random.default_rng(SEED)
+    width = min(dim + OVERSAMPLE, terms)
+    sketch = rng.standard_normal((terms, width)).astype(np.float32)
+    basis = _orthonormalize(_sparse_dot(rows, sketch))
+    for _ in range(POWER_ITERATIONS):
+        transposed = _orthonormalize(_sparse_tdot(rows, basis, terms))
+        basis = _orthonormalize(_sparse_dot(rows, transposed))
+    projected = _sparse_tdot(rows, basis, terms).T
+    _, _, right = np.linalg.svd(projected, full_matrices=False)
+    right = right[:dim].T
+    if right.shape[1] < dim:
+        right = np.hstack([right, np.zeros((terms, dim - right.shape[1]))])
+    return np.ascontiguousarray(right, dtype=np.float32)
+
+def _kmeans(vectors, lists):
+    """Spherical k-means centroids (unit length) of a sample of unit vectors"""
+    import numpy as np
+
+    rng = np.random.default_rng(SEED)
+    centroids = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = _nearest(centroids, vectors)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = np.flatnonzero(np.bincount(assignments, minlength=lists) == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+def _nearest(centroids, vectors):
+    """Index of the closest centroid of each vector"""
+    import numpy as np
+
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = vectors[start:start + SCAN_BLOCK_ROWS]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def _top_k(scores, k):
+    """(columns, scores) of the k highest scores in each row, best first"""
+    import numpy as np
+
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((len(scores), 0), dtype=np.int64), np.empty((len(scores), 0), dtype=scores.dtype)
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+def _read_batches(conn, where='', params=()):
+    """(ids, term counts, max imported_at) of jobs, EMBED_BATCH at a time"""
+    cursor = conn.execute(VECTOR_TEXT_QUERY + where + ' ORDER BY id', params)
+    while True:
+        rows = cursor.fetchmany(EMBED_BATCH)
+        if not rows:
+            break
+        yield (
+            [row[0] for row in rows],
+            [term_counts(row[1], row[2]) for row in rows],
+            max((row[3] for row in rows if row[3] is not None), default=None)
+        )
+
+class VectorIndex:
+    """
+    Memory-mapped job vectors in a directory next to the database:
+
+    - meta.json names the current build and how many rows of it are valid,
+      and is replaced atomically after every change
+    - <build>.f32 holds the vectors (float32, VECTOR_DIM per row), <build>.ids
+      their job ids (int64) and <build>.lists their k-means list (int32)
+    - <build>.npz holds the text model and the k-means centroids
+
+    Readers map only the rows meta.json counts, so appends never show a
+    half-written row. A job whose text changed is appended again and its
+    newest row wins.
+    """
+
+    def __init__(self, path, meta, model, centroids, vectors, ids, lists):
+        import numpy as np
+
+        self.path = path
+        self.meta = meta
+        self.model = model
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.lists = lists
+
+        # Newest row of every job
+        reversed_ids = ids[::-1]
+        unique_ids, last = np.unique(reversed_ids, return_index=True)
+        self._job_ids = unique_ids
+        self._job_rows = len(ids) - 1 - last
+        self._superseded = None
+        if len(unique_ids) < len(ids):
+            self._superseded = np.ones(len(ids), dtype=bool)
+            self._superseded[self._job_rows] = False
+
+        # Live rows grouped by list, for scanning only the closest lists
+        live = np.sort(self._job_rows)
+        order = np.argsort(lists[live], kind='stable')
+        self._list_rows = live[order]
+        self._list_starts = np.searchsorted(lists[live][order], np.arange(len(centroids) + 1))
+
+    @classmethod
+    def open(cls, path=None):
+        """The index as last written, memory-mapped, or None when there is none"""
+        import numpy as np
+
+        path = path or vector_path()
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            build = os.path.join(path, meta['build'])
+            rows = meta['rows']
+            with np.load(build + '.npz') as saved:
+                model = TextModel(saved['terms'].tolist(), saved['idf'], saved['components'])
+                centroids = saved['centroids']
+            if rows:
+                vectors = np.memmap(build + '.f32', dtype=np.float32, mode='r', shape=(rows, VECTOR_DIM))
+                ids = np.memmap(build + '.ids', dtype=np.int64, mode='r', shape=(rows,))
+                lists = np.array(np.memmap(build + '.lists', dtype=np.int32, mode='r', shape=(rows,)))
+            else:
+                vectors = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+                ids = np.zeros(0, dtype=np.int64)
+                lists = np.zeros(0, dtype=np.int32)
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(path, meta, model, centroids, vectors, ids, lists)
+
+    def __len__(self):
+        return len(self._job_ids)
+
+    @property
+    def job_ids(self):
+        """Ids of the jobs with a vector, ascending"""
+        return self._job_ids
+
+    def rows(self, job_ids):
+        """Row of the current vector of each job, -1 for jobs without one"""
+        import numpy as np
+
+        job_ids = np.asarray(job_ids, dtype=np.int64)
+        if not len(self._job_ids):
+            return np.full(len(job_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._job_ids, job_ids), len(self._job_ids) - 1)
+        found = self._job_ids[positions] == job_ids
+        return np.where(found, self._job_rows[positions], -1)
+
+    def vector(self, job_id):
+        """The stored vector of a job, or None if it has none"""
+        import numpy as np
+
+        row = self.rows([job_id])[0]
+        return np.array(self.vectors[row]) if row >= 0 else None
+
+    def search(self, queries, k=10, nprobe=None):
+        """
+        (job ids, cosine scores) of the k jobs closest to each query vector,
+        best first, one row per query. nprobe limits each query to that many
+        k-means lists (approximate); by default large indexes scan
+        DEFAULT_NPROBE lists and small ones are scanned exhaustively.
+        nprobe=0 forces an exhaustive scan. A query whose lists hold fewer
+        than k jobs has its row padded with -inf scores.
+        """
+        import numpy as np
+
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if nprobe is None:
+            nprobe = DEFAULT_NPROBE if len(self) >= EXACT_ROWS else 0
+        if nprobe and nprobe < len(self.centroids):
+            rows, scores = self._probe(queries, k, nprobe)
+        else:
+            rows, scores = self._scan(queries, k)
+        return self.ids[rows], scores
+
+    def _scan(self, queries, k):
+        """Batched dot product against every row, block by block"""
+        import numpy as np
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self.vectors), SCAN_BLOCK_ROWS):
+            scores = queries @ self.vectors[start:start + SCAN_BLOCK_ROWS].T
+            if self._superseded is not None:
+                scores[:, self._superseded[start:start + SCAN_BLOCK_ROWS]] = -np.inf
+            rows, scores = _top_k(scores, k)
+            best_rows = np.hstack([best_rows, rows + start])
+            best_scores = np.hstack([best_scores, scores])
+        rows, best_scores = _top_k(best_scores, k)
+        best_rows = np.take_along_axis(best_rows, rows, axis=1)
+        # Superseded rows only fill up results when k exceeds the live jobs
+        keep = np.isfinite(best_scores).all(axis=0)
+        return best_rows[:, keep], best_scores[:, keep]
+
+    def _probe(self, queries, k, nprobe):
+        """Dot product against the rows of the nprobe lists closest to each query"""
+        import numpy as np
+
+        lists, _ = _top_k(queries @ self.centroids.T, nprobe)
+        all_rows = []
+        all_scores = []
+        for query, query_lists in zip(queries, lists):
+            rows = np.concatenate([
+                self._list_rows[self._list_starts[number]:self._list_starts[number + 1]]
+                for number in query_lists
+            ])
+            best, scores = _top_k((self.vectors[rows] @ query)[None], k)
+            all_rows.append(rows[best[0]])
+            all_scores.append(scores[0])
+        # Pad queries whose lists held fewer than k rows
+        width = max(len(rows) for rows in all_rows)
+        padded_rows = np.zeros((len(queries), width), dtype=np.int64)
+        padded_scores = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        for number, (rows, scores) in enumerate(zip(all_rows, all_scores)):
+            padded_rows[number, :len(rows)] = rows
+            padded_scores[number, :len(scores)] = scores
+        return padded_rows, padded_scores
+
+def _write_meta(path, meta):
+    tmp_path = os.path.join(path, f'meta.json.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, 'meta.json'))
+
+def _append(build, vectors, ids, lists, rows):
+    """Write rows after the first `rows` of each file, dropping anything past them"""
+    for suffix, values in (('.f32', vectors), ('.ids', ids), ('.lists', lists)):
+        with open(build + suffix, 'r+b' if rows else 'wb') as f:
+            f.seek(rows * values.itemsize * (VECTOR_DIM if suffix == '.f32' else 1))
+            f.write(values.tobytes())
+            f.truncate()
+
+def build_vectors(conn, path=None):
+    """
+    Fit the text model on a sample of jobs, embed every job and train the
+    k-means lists, writing a new build that replaces the current one.
+    conn needs the decompress_description function (register_functions).
+    Returns the rows written.
+    """
+    import numpy as np
+
+    path = path or vector_path()
+    os.makedirs(path, exist_ok=True)
+    total = conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+    step = max(1, total // FIT_SAMPLE)
+    sample = []
+    for _, jobs_counts, _ in _read_batches(conn, 'WHERE id % ? = 0', (step,)):
+        sample.extend(jobs_counts)
+    model = TextModel.fit(sample)
+    del sample
+
+    name = format(time.time_ns(), 'x')
+    build = os.path.join(path, name)
+    rows = 0
+    imported_at = None
+    for ids, jobs_counts, batch_imported_at in _read_batches(conn):
+        vectors = model.transform(jobs_counts)
+        _append(build, vectors, np.array(ids, dtype=np.int64), np.zeros(len(ids), dtype=np.int32), rows)
+        rows += len(ids)
+        if batch_imported_at is not None:
+            imported_at = max(imported_at or batch_imported_at, batch_imported_at)
+
+    lists = max(1, min(MAX_LISTS, int(math.sqrt(rows))))
+    if rows:
+        vectors = np.memmap(build + '.f32', dtype=np.float32, mode='r', shape=(rows, VECTOR_DIM))
+        rng = np.random.default_rng(SEED)
+        sample = np.sort(rng.choice(rows, min(rows, KMEANS_SAMPLE), replace=False))
+        centroids = _kmeans(np.array(vectors[sample]), min(lists, len(sample)))
+        _nearest(centroids, vectors).tofile(build + '.lists')
+        del vectors
+    else:
+        centroids = np.zeros((1, VECTOR_DIM), dtype=np.float32)
+    np.savez(build + '.npz', terms=np.array(model.terms, dtype=str), idf=model.idf,
+             components=model.components, centroids=centroids)
+
+    previous = VectorIndex.open(path)
+    _write_meta(path, {'build': name, 'rows': rows, 'imported_at': imported_at})
+    # Readers that still map the old files keep them until they reopen
+    if previous is not None:
+        for suffix in ('.f32', '.ids', '.lists', '.npz'):
+            old = os.path.join(path, previous.meta['build'] + suffix)
+            if os.path.exists(old):
+                os.remove(old)
+    return rows
+
+def update_vectors(conn, path=None, build=True):
+    """
+    Append vectors for the jobs imported (inserted or rewritten) since the
+    index was last written, using its model and lists; jobs whose vector
+    came out unchanged are skipped. Without an index, one is built, or
+    nothing is done if build is false. Returns the rows appended or written.
+    """
+    import numpy as np
+
+    path = path or vector_path()
+    index = VectorIndex.open(path)
+    if index is None:
+        return build_vectors(conn, path) if build else 0
+
+    meta = dict(index.meta)
+    written = meta['rows']
+    files = os.path.join(path, meta['build'])
+    # imported_at has whole seconds, so the last second is read again
+    where, params = ('WHERE imported_at >= ?', (meta['imported_at'],)) if meta['imported_at'] else ('', ())
+    for ids, jobs_counts, batch_imported_at in _read_batches(conn, where, params):
+        vectors = index.model.transform(jobs_counts)
+        rows = index.rows(ids)
+        changed = rows < 0
+        changed[~changed] = ~np.isclose(index.vectors[rows[~changed]], vectors[~changed], atol=1e-6).all(axis=1)
+        if changed.any():
+            vectors = vectors[changed]
+            _append(files, vectors, np.array(ids, dtype=np.int64)[changed],
+                    _nearest(index.centroids, vectors), meta['rows'])
+            meta['rows'] += len(vectors)
+        if batch_imported_at is not None:
+            meta['imported_at'] = max(meta['imported_at'] or batch_imported_at, batch_imported_at)
+    if meta != index.meta:
+        _write_meta(path, meta)
+    return meta['rows'] - written
+
+class VectorService:
+    """
+    Keeps the web app's VectorIndex in step with the files: meta.json is
+    checked on every request and the index reopened when it was replaced.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or vector_path()
+        self._index = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """The latest index, or None when none has been built"""
+        try:
+            stamp = os.stat(os.path.join(self.path, 'meta.json')).st_mtime_ns
+        except OSError:
+            return None
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._index = VectorIndex.open(self.path)
+                    self._stamp = stamp
+        return self._index
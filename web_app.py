@@ -1,193 +1,813 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g, make_response
 import sqlite3
 import json
+import os
+import queue
+import base64
+import math
+import sys
+import time
 from datetime import datetime
+from functools import wraps
+from utils.create_database import build_fts_query, get_generation, normalize_name, DB_NAME
+from utils.descriptions import register_functions
+from utils.response_cache import ResponseCache
+from utils.export import iter_export
+from utils.facets import CANONICAL_CONDITION, FACET_LIMIT, build_filter_conditions, build_match_query, facet_counts
+from utils.profiling import ProfilingConnection, QueryProfiler, RouteMetrics, render_prometheus
+from utils.suggest import SuggestService
+from utils.live_stats import DashboardFeed
+from utils.shards import SHARDED_STORAGE, UNDATED_SHARD, ShardSet, merge_facets, merge_sorted, shard_name
+from utils.vectors import VectorService
 
 app = Flask(__name__)
 
+# Tuning applied to every pooled read-only connection
+READ_CONNECTION_PRAGMAS = [
+    'PRAGMA query_only = ON',
+    'PRAGMA mmap_size = 268435456',  # 256 MB
+    'PRAGMA cache_size = -65536'     # 64 MB
+]
+
+# Every pooled connection reports its statements here; slower ones are logged.
+# QUERY_PROFILING=0 opens plain connections instead.
+QUERY_PROFILING = os.environ.get('QUERY_PROFILING', '1') != '0'
+query_profiler = QueryProfiler(slow_ms=float(os.environ.get('SLOW_QUERY_MS', 200)))
+route_metrics = RouteMetrics()
+
+class ConnectionPool:
+    """
+    Pool of read-only SQLite connections shared by request threads.
+    Connections stay open between requests, so each one keeps its page
+    cache, parsed schema and prepared statements (the sqlite3 statement
+    cache reuses them for identical SQL text).
+    """
+    
+    def __init__(self, db_name, max_size=16):
+        self.db_name = db_name
+        self._idle = queue.LifoQueue(maxsize=max_size)
+    
+    def _connect(self):
+        conn = sqlite3.connect(
+            f'file:{self.db_name}?mode=ro',
+            uri=True,
+            check_same_thread=False,
+            cached_statements=256,
+            factory=ProfilingConnection if QUERY_PROFILING else sqlite3.Connection
+        )
+        if QUERY_PROFILING:
+            conn.profiler = query_profiler
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        register_functions(conn)
+        for pragma in READ_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def acquire(self):
+        """Take an idle connection, opening a new one if none is available"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+    
+    def release(self, conn):
+        """Hand a connection back, closing it if the pool is already full"""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+def open_pool(db_name):
+    return ConnectionPool(db_name, max_size=int(os.environ.get('JOBS_DB_POOL_SIZE', 16)))
+
+# With sharded storage (JOBS_SHARDED=1) the request connection is the
+# catalog's: it has the summary tables and generation of a single database,
+# so the dashboard, companies and locations pages read it unchanged, while
+# job queries fan out over the shards (see query_jobs)
+shard_set = ShardSet(open_pool) if SHARDED_STORAGE else None
+db_pool = shard_set.catalog if shard_set is not None else open_pool(DB_NAME)
+
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect('jobs_database.db')
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    return conn
+    """Get the pooled database connection for the current request"""
+    if 'db' not in g:
+        g.db = db_pool.acquire()
+    return g.db
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+# Endpoints that need the jobs table of a single database
+SINGLE_DATABASE_ENDPOINTS = {'api_suggest', 'api_similar_jobs', 'api_export', 'api_dashboard_stream'}
+
+@app.before_request
+def require_single_database():
+    if shard_set is not None and request.endpoint in SINGLE_DATABASE_ENDPOINTS:
+        return jsonify({'error': 'Not available with sharded storage'}), 501
+
+def query_jobs(fn, date_from=None, date_to=None):
+    """
+    Results of fn(conn, shard) over the jobs: a one-item list for the single
+    database (shard is None), or one item per shard that can hold jobs
+    created between the dates, read in parallel
+    """
+    if shard_set is None:
+        return [fn(get_db_connection(), None)]
+    return shard_set.map(fn, shard_set.shards(date_from, date_to))
+
+@app.after_request
+def record_request_latency(response):
+    """Add the request to the per-route latency histograms"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        route_metrics.observe(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Return the request's connection to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    ttl=int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+)
+
+def cache_key():
+    """Cache key for the current request, with the search query normalized"""
+    args = []
+    for name, value in request.args.items(multi=True):
+        if name == 'q':
+            value = ' '.join(value.lower().split())
+        args.append((name, value))
+    return (request.path, tuple(sorted(args)))
+
+def cached_response(view):
+    """
+    Serve repeated requests from the response cache. Entries are tied to the
+    database generation, and responses carry an ETag so browsers can
+    revalidate with If-None-Match and get a 304.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            generation = get_generation(get_db_connection().cursor())
+        except sqlite3.Error:
+            return view(*args, **kwargs)
+        
+        key = cache_key()
+        entry = response_cache.get(key, generation)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            etag = response_cache.put(key, generation, response.get_data(), response.mimetype)
+        else:
+            body, mimetype, etag = entry
+            response = app.response_class(body, mimetype=mimetype)
+        
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return wrapper
+
+# Upper bound on rows per page for every paginated endpoint
+MAX_PAGE_SIZE = 100
+
+def get_page_size(default):
+    """Requested page size from ?limit=, clamped to MAX_PAGE_SIZE"""
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(*values):
+    """Opaque token for the sort key of the last row on a page"""
+    token = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+def decode_cursor(length):
+    """
+    Sort key from the ?cursor= argument, or None on the first page.
+    Raises ValueError for tokens we did not issue.
+    """
+    token = request.args.get('cursor')
+    if not token:
+        return None
+    values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError('Invalid cursor')
+    return values
+
+def split_page(rows, page_size, cursor_key):
+    """Trim the extra look-ahead row and build the cursor for the next page"""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(*cursor_key(rows[-1]))
 
 @app.route('/')
+@cached_response
 def index():
     """Main dashboard page"""
     try:
         conn = get_db_connection()
         
-        # Get basic statistics
-        stats = {}
-        
-        # Total jobs
-        cursor = conn.execute('SELECT COUNT(*) as total FROM jobs')
-        stats['total_jobs'] = cursor.fetchone()['total']
-        
-        # Total companies
-        cursor = conn.execute('SELECT COUNT(DISTINCT company_name) as total FROM jobs WHERE company_name IS NOT NULL')
-        stats['total_companies'] = cursor.fetchone()['total']
-        
-        # Total locations
-        cursor = conn.execute('SELECT COUNT(DISTINCT location) as total FROM jobs WHERE location IS NOT NULL')
-        stats['total_locations'] = cursor.fetchone()['total']
+        # Get basic statistics from the precomputed summary tables
+        cursor = conn.execute('SELECT name, value FROM global_stats')
+        stats = {row['name']: row['value'] for row in cursor.fetchall()}
         
         # Top 5 companies
         cursor = conn.execute('''
-            SELECT company_name, COUNT(*) as count 
-            FROM jobs 
-            WHERE company_name IS NOT NULL AND company_name != ''
-            GROUP BY company_name 
-            ORDER BY count DESC 
+            SELECT companies.name as company_name, job_count as count 
+            FROM company_stats 
+            JOIN companies ON companies.id = company_stats.company_id
+            ORDER BY job_count DESC 
             LIMIT 5
         ''')
         stats['top_companies'] = cursor.fetchall()
         
         # Top 5 locations
         cursor = conn.execute('''
-            SELECT location, COUNT(*) as count 
-            FROM jobs 
-            WHERE location IS NOT NULL AND location != ''
-            GROUP BY location 
-            ORDER BY count DESC 
+            SELECT locations.name as location, job_count as count 
+            FROM location_stats 
+            JOIN locations ON locations.id = location_stats.location_id
+            ORDER BY job_count DESC 
             LIMIT 5
         ''')
         stats['top_locations'] = cursor.fetchall()
         
-        conn.close()
         return render_template('index.html', stats=stats)
         
     except Exception as e:
-        return f"Error: {str(e)}"
+        return f"Error: {str(e)}", 500
 
 @app.route('/search')
 def search():
     """Search page"""
     return render_template('search.html')
 
+def search_filters():
+    """Facet filters of the current request, as build_filter_conditions arguments"""
+    return {
+        'skills': [skill for skill in request.args.getlist('skill') if skill.strip()],
+        'company': request.args.get('company'),
+        'location': request.args.get('location'),
+        'job_state': request.args.get('job_state'),
+        'date_from': request.args.get('from'),
+        'date_to': request.args.get('to')
+    }
+
+# Job vectors for similar jobs and semantic search, reopened after imports
+vector_service = VectorService()
+
+# Closest jobs fetched per requested result, so filters and hidden
+# duplicates still leave enough to fill a page
+SEMANTIC_CANDIDATES = 10
+
+def semantic_results(conn, index, vector, limit, conditions, params, exclude=()):
+    """
+    Jobs closest to a vector that also pass the filter conditions, best
+    first, with their cosine similarity as score (jobs sharing nothing with
+    it are left out). nprobe in the request sets how many k-means lists the
+    index scans (0: all of them).
+    """
+    ids, scores = index.search(vector, limit * SEMANTIC_CANDIDATES + len(exclude),
+                               nprobe=request.args.get('nprobe', type=int))
+    scores = {
+        int(job_id): float(score)
+        for job_id, score in zip(ids[0], scores[0])
+        if math.isfinite(score) and score > 0 and int(job_id) not in exclude
+    }
+    if not scores:
+        return []
+    
+    candidates, candidate_params = build_match_query(
+        'jobs.id, jobs.title, jobs.company_name, jobs.location, jobs.snippet, jobs.detail_url, jobs.canonical_id',
+        None, [f"jobs.id IN ({', '.join('?' * len(scores))})"] + conditions, list(scores) + params
+    )
+    rows = sorted(conn.execute(candidates, candidate_params), key=lambda row: (-scores[row['id']], row['id']))
+    
+    results = []
+    for row in rows[:limit]:
+        results.append({
+            'id': row['id'],
+            'title': row['title'],
+            'company': row['company_name'] or 'Unknown Company',
+            'location': row['location'] or 'Unknown Location',
+            'description': row['snippet'] or 'No description available',
+            'url': row['detail_url'],
+            'canonical_id': row['canonical_id'],
+            'score': round(scores[row['id']], 4)
+        })
+    return results
+
+# A text search without filters ranks only this many of its newest matches
+# (0: all of them); filtered searches rank every match so none are missed
+SEARCH_CANDIDATES = int(os.environ.get('SEARCH_CANDIDATES', 2000))
+
 @app.route('/api/search')
+@cached_response
 def api_search():
-    """API endpoint for searching jobs"""
+    """
+    API endpoint for searching jobs by text and/or facet filters (skill,
+    company, location, job_state, from/to). facets=1 adds facet counts over
+    all matching jobs to the first page. Near-duplicate postings are
+    collapsed into their canonical job unless duplicates=1. mode=semantic
+    ranks jobs by the similarity of their vectors to the query's instead of
+    matching words, in a single page without facets.
+    """
     query = request.args.get('q', '').strip()
-    limit = request.args.get('limit', 20, type=int)
+    limit = get_page_size(20)
+    filters = search_filters()
     
-    if not query:
+    if not query and not any(filters.values()):
         return jsonify({'error': 'No search query provided'}), 400
     
+    if request.args.get('mode') == 'semantic':
+        return semantic_search(query, limit, filters)
+    
     try:
-        conn = get_db_connection()
-        
-        cursor = conn.execute('''
-            SELECT title, company_name, location, description, detail_url
-            FROM jobs 
-            WHERE (title LIKE ? OR description LIKE ? OR company_name LIKE ?)
-            AND title IS NOT NULL
-            ORDER BY 
-                CASE WHEN title LIKE ? THEN 1
-                     WHEN company_name LIKE ? THEN 2
-                     ELSE 3 END
+        after = decode_cursor(2) or [float('-inf'), 0]
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    match_query = build_fts_query(query) if query else None
+    if query and not match_query:
+        return jsonify({'results': [], 'count': 0, 'next_cursor': None})
+    conditions, params = build_filter_conditions(**filters, duplicates=bool(request.args.get('duplicates')))
+    
+    try:
+        # Keyset pagination over (score, id); ids are unique across shards,
+        # so every shard's page can be merged on the same key
+        matches, match_params = build_match_query(
+            'jobs.id, jobs.title, jobs.company_name, jobs.location, jobs.snippet, jobs.detail_url, jobs.canonical_id',
+            match_query, conditions + ['jobs.title IS NOT NULL'], params,
+            candidates=None if any(filters.values()) else SEARCH_CANDIDATES
+        )
+        page_query = f'''
+            SELECT * FROM ({matches})
+            WHERE score > ? OR (score = ? AND id > ?)
+            ORDER BY score, id
             LIMIT ?
-        ''', (f'%{query}%', f'%{query}%', f'%{query}%', f'%{query}%', f'%{query}%', limit))
+        '''
+        page_params = match_params + [after[0], after[0], after[1], limit + 1]
+        sort_key = lambda row: (row['score'], row['id'])
+        pages = query_jobs(lambda conn, shard: conn.execute(page_query, page_params).fetchall(),
+                           filters['date_from'], filters['date_to'])
+        rows, next_cursor = split_page(merge_sorted(pages, sort_key, limit + 1), limit, sort_key)
         
         results = []
-        for row in cursor.fetchall():
+        for row in rows:
             results.append({
+                'id': row['id'],
                 'title': row['title'],
                 'company': row['company_name'] or 'Unknown Company',
                 'location': row['location'] or 'Unknown Location',
-                'description': (row['description'][:200] + '...') if row['description'] and len(row['description']) > 200 else (row['description'] or 'No description available'),
-                'url': row['detail_url']
+                'description': row['snippet'] or 'No description available',
+                'url': row['detail_url'],
+                'canonical_id': row['canonical_id']
             })
         
-        conn.close()
-        return jsonify({'results': results, 'count': len(results)})
+        response = {'results': results, 'count': len(results), 'next_cursor': next_cursor}
+        if request.args.get('facets') and not request.args.get('cursor'):
+            response['facets'] = search_facets(match_query, conditions, params, filters)
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def search_facets(match_query, conditions, params, filters):
+    """
+    facet_counts over the single database, or summed over the shards
+    searched: each shard counts every value, so the merged top is exact
+    """
+    if shard_set is None:
+        return facet_counts(get_db_connection(), match_query, conditions, params)
+    facets = query_jobs(lambda conn, shard: facet_counts(conn, match_query, conditions, params, limit=None),
+                        filters['date_from'], filters['date_to'])
+    return merge_facets(facets, FACET_LIMIT)
+
+def semantic_search(query, limit, filters):
+    """Semantic mode of api_search"""
+    if shard_set is not None:
+        return jsonify({'error': 'Not available with sharded storage'}), 501
+    if not query:
+        return jsonify({'error': 'No search query provided'}), 400
+    index = vector_service.current()
+    if index is None:
+        return jsonify({'error': 'Vector index not built'}), 503
+    
+    vector = index.model.embed(query)
+    conditions, params = build_filter_conditions(**filters, duplicates=bool(request.args.get('duplicates')))
+    try:
+        results = semantic_results(get_db_connection(), index, vector, limit, conditions, params)
+        return jsonify({'results': results, 'count': len(results), 'next_cursor': None})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Autocomplete index, rebuilt in the background after imports
+suggest_service = SuggestService(db_pool)
+
+@app.route('/api/suggest')
+def api_suggest():
+    """Autocomplete suggestions (titles, companies, skills) for the search box, typo-tolerant"""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 8, type=int) or 8
+    
+    try:
+        index = suggest_service.current(get_db_connection())
+        suggestions, corrected = index.suggest(query, limit)
+        return jsonify({'suggestions': suggestions, 'corrected': corrected})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/facets')
+@cached_response
+def api_facets():
+    """Facet counts for a text query and/or facet filters, or for all jobs (duplicates=1 as in search)"""
+    query = request.args.get('q', '').strip()
+    match_query = build_fts_query(query) if query else None
+    filters = search_filters()
+    conditions, params = build_filter_conditions(**filters, duplicates=bool(request.args.get('duplicates')))
+    
+    try:
+        return jsonify({'facets': search_facets(match_query, conditions, params, filters)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/companies')
+@cached_response
 def companies():
     """Companies page"""
+    limit = get_page_size(50)
+    try:
+        after = decode_cursor(2)
+    except ValueError:
+        return "Error: Invalid cursor", 400
+    
     try:
         conn = get_db_connection()
         
-        cursor = conn.execute('''
-            SELECT 
-                company_name,
-                COUNT(*) as job_count,
-                COUNT(DISTINCT location) as locations,
-                MAX(created_at) as latest_job
-            FROM jobs 
-            WHERE company_name IS NOT NULL AND company_name != ''
-            GROUP BY company_name 
-            ORDER BY job_count DESC
-            LIMIT 50
-        ''')
+        if after is None:
+            cursor = conn.execute('''
+                SELECT company_id, companies.name as company_name, job_count, locations, latest_job
+                FROM company_stats 
+                JOIN companies ON companies.id = company_stats.company_id
+                ORDER BY job_count DESC, company_id DESC
+                LIMIT ?
+            ''', (limit + 1,))
+        else:
+            cursor = conn.execute('''
+                SELECT company_id, companies.name as company_name, job_count, locations, latest_job
+                FROM company_stats 
+                JOIN companies ON companies.id = company_stats.company_id
+                WHERE (job_count, company_id) < (?, ?)
+                ORDER BY job_count DESC, company_id DESC
+                LIMIT ?
+            ''', (after[0], after[1], limit + 1))
         
-        companies = cursor.fetchall()
-        conn.close()
+        companies, next_cursor = split_page(
+            cursor.fetchall(), limit, lambda row: (row['job_count'], row['company_id'])
+        )
         
-        return render_template('companies.html', companies=companies)
+        return render_template('companies.html', companies=companies, next_cursor=next_cursor)
         
     except Exception as e:
-        return f"Error: {str(e)}"
+        return f"Error: {str(e)}", 500
 
 @app.route('/locations')
+@cached_response
 def locations():
     """Locations page"""
+    limit = get_page_size(50)
+    try:
+        after = decode_cursor(2)
+    except ValueError:
+        return "Error: Invalid cursor", 400
+    
     try:
         conn = get_db_connection()
         
-        cursor = conn.execute('''
-            SELECT 
-                location,
-                COUNT(*) as job_count,
-                COUNT(DISTINCT company_name) as companies
-            FROM jobs 
-            WHERE location IS NOT NULL AND location != ''
-            GROUP BY location 
-            ORDER BY job_count DESC
-            LIMIT 50
-        ''')
+        if after is None:
+            cursor = conn.execute('''
+                SELECT location_id, locations.name as location, job_count, companies
+                FROM location_stats 
+                JOIN locations ON locations.id = location_stats.location_id
+                ORDER BY job_count DESC, location_id DESC
+                LIMIT ?
+            ''', (limit + 1,))
+        else:
+            cursor = conn.execute('''
+                SELECT location_id, locations.name as location, job_count, companies
+                FROM location_stats 
+                JOIN locations ON locations.id = location_stats.location_id
+                WHERE (job_count, location_id) < (?, ?)
+                ORDER BY job_count DESC, location_id DESC
+                LIMIT ?
+            ''', (after[0], after[1], limit + 1))
         
-        locations = cursor.fetchall()
-        conn.close()
+        locations, next_cursor = split_page(
+            cursor.fetchall(), limit, lambda row: (row['job_count'], row['location_id'])
+        )
         
-        return render_template('locations.html', locations=locations)
+        return render_template('locations.html', locations=locations, next_cursor=next_cursor)
         
     except Exception as e:
-        return f"Error: {str(e)}"
+        return f"Error: {str(e)}", 500
+
+def company_job_rows(conn, company_key, after, limit):
+    """
+    Up to limit + 1 jobs of a company (by name_key) after the (created_at, id)
+    cursor, newest first. Rows without created_at sort last, so they are read
+    in a second pass once the dated rows run out.
+    """
+    company = conn.execute('SELECT id FROM companies WHERE name_key = ?', (company_key,)).fetchone()
+    if company is None:
+        return []
+    company_id = company['id']
+    rows = []
+    
+    if after is None or after[0] is not None:
+        if after is None:
+            cursor = conn.execute('''
+                SELECT jobs.id, title, locations.name as location, snippet, detail_url, created_at
+                FROM jobs 
+                LEFT JOIN locations ON locations.id = jobs.location_id
+                WHERE jobs.company_id = ? AND jobs.created_at IS NOT NULL
+                ORDER BY jobs.created_at DESC, jobs.id DESC
+                LIMIT ?
+            ''', (company_id, limit + 1))
+        else:
+            cursor = conn.execute('''
+                SELECT jobs.id, title, locations.name as location, snippet, detail_url, created_at
+                FROM jobs 
+                LEFT JOIN locations ON locations.id = jobs.location_id
+                WHERE jobs.company_id = ? AND (jobs.created_at, jobs.id) < (?, ?)
+                ORDER BY jobs.created_at DESC, jobs.id DESC
+                LIMIT ?
+            ''', (company_id, after[0], after[1], limit + 1))
+        rows = cursor.fetchall()
+    
+    if len(rows) <= limit:
+        last_id = after[1] if after is not None and after[0] is None else sys.maxsize
+        cursor = conn.execute('''
+            SELECT jobs.id, title, locations.name as location, snippet, detail_url, created_at
+            FROM jobs 
+            LEFT JOIN locations ON locations.id = jobs.location_id
+            WHERE jobs.company_id = ? AND jobs.created_at IS NULL AND jobs.id < ?
+            ORDER BY jobs.id DESC
+            LIMIT ?
+        ''', (company_id, last_id, limit + 1 - len(rows)))
+        rows += cursor.fetchall()
+    return rows
+
+def sharded_company_job_rows(company_key, after, limit):
+    """
+    company_job_rows over the shards. Monthly shards split the created_at
+    order, so their pages are simply concatenated newest first, with the
+    undated shard last. A cursor from a monthly shard prunes the newer ones;
+    one from the undated shard (its created_at is not a month) skips them all.
+    """
+    undated_cursor = after is not None and shard_name(after[0]) == UNDATED_SHARD
+    shards = [
+        shard for shard in shard_set.shards()
+        if shard[0] == UNDATED_SHARD
+        or (not undated_cursor and (after is None or shard[1] <= after[0]))
+    ]
+    
+    def read(conn, shard):
+        shard_after = after if (shard[0] == UNDATED_SHARD) == undated_cursor else None
+        return company_job_rows(conn, company_key, shard_after, limit)
+    
+    return [row for rows in shard_set.map(read, shards) for row in rows][:limit + 1]
 
 @app.route('/api/company/<company_name>')
+@cached_response
 def api_company_jobs(company_name):
-    """Get jobs for a specific company"""
+    """Get jobs for a specific company, newest first"""
+    limit = get_page_size(20)
     try:
-        conn = get_db_connection()
-        
-        cursor = conn.execute('''
-            SELECT title, location, description, detail_url, created_at
-            FROM jobs 
-            WHERE company_name = ?
-            ORDER BY created_at DESC
-            LIMIT 20
-        ''', (company_name,))
+        after = decode_cursor(2)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    try:
+        # Company names are matched ignoring case, accents and spacing.
+        # Keyset pagination over (created_at, id).
+        company_key = normalize_name(company_name)
+        if shard_set is None:
+            rows = company_job_rows(get_db_connection(), company_key, after, limit)
+        else:
+            rows = sharded_company_job_rows(company_key, after, limit)
+        rows, next_cursor = split_page(rows, limit, lambda row: (row['created_at'], row['id']))
         
         jobs = []
-        for row in cursor.fetchall():
+        for row in rows:
             jobs.append({
+                'id': row['id'],
                 'title': row['title'],
                 'location': row['location'] or 'Unknown Location',
-                'description': (row['description'][:150] + '...') if row['description'] and len(row['description']) > 150 else (row['description'] or 'No description'),
+                'description': (row['snippet'][:150] + '...') if row['snippet'] and len(row['snippet']) > 150 else (row['snippet'] or 'No description'),
                 'url': row['detail_url'],
                 'created_at': row['created_at']
             })
         
-        conn.close()
-        return jsonify({'jobs': jobs})
+        return jsonify({'jobs': jobs, 'next_cursor': next_cursor})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/job/<int:job_id>')
+@cached_response
+def api_job(job_id):
+    """Full details of one job; its description is only decompressed here"""
+    def read(conn, shard):
+        return conn.execute('''
+            SELECT id, title, company_name, location, description, primary_description,
+                   detail_url, skill, insight, job_state, created_at, scraped_at
+            FROM job_details
+            WHERE id = ?
+        ''', (job_id,)).fetchone()
+    
+    try:
+        if shard_set is None:
+            row = read(get_db_connection(), None)
+        else:
+            # The catalog knows which shard every id was given out to
+            shard = shard_set.shard_for_id(job_id)
+            row = shard_set.run(read, shard) if shard is not None else None
+        if row is None:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'id': row['id'],
+            'title': row['title'],
+            'company': row['company_name'] or 'Unknown Company',
+            'location': row['location'] or 'Unknown Location',
+            'description': row['description'] or 'No description available',
+            'primary_description': row['primary_description'],
+            'url': row['detail_url'],
+            'skill': row['skill'],
+            'insight': row['insight'],
+            'job_state': row['job_state'],
+            'created_at': row['created_at'],
+            'scraped_at': row['scraped_at']
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/job/<int:job_id>/similar')
+def api_similar_jobs(job_id):
+    """
+    Jobs whose title and description are closest to one job's, best first
+    (limit, nprobe as in semantic search). Reposts of either job are left out.
+    """
+    limit = get_page_size(10)
+    index = vector_service.current()
+    if index is None:
+        return jsonify({'error': 'Vector index not built'}), 503
+    
+    try:
+        conn = get_db_connection()
+        row = conn.execute('SELECT canonical_id FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        vector = index.vector(job_id)
+        if row is None or vector is None:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        exclude = {job_id, row['canonical_id']}
+        results = semantic_results(conn, index, vector, limit, [CANONICAL_CONDITION], [], exclude)
+        return jsonify({'id': job_id, 'similar': results, 'count': len(results)})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'csv.gz': 'application/gzip',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+@app.route('/api/export')
+def api_export():
+    """
+    Stream an export of the jobs table as csv, csv.gz or parquet, optionally
+    filtered by company, location and created_at range (from/to, YYYY-MM-DD)
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({'error': f"Unsupported format '{export_format}'"}), 400
+    
+    filters = {
+        'company': request.args.get('company'),
+        'location': request.args.get('location'),
+        'date_from': request.args.get('from'),
+        'date_to': request.args.get('to')
+    }
+    
+    # The export outlives the request context, so it holds its own connection
+    conn = db_pool.acquire()
+    try:
+        pieces = iter_export(conn, export_format, **filters)
+    except ImportError:
+        db_pool.release(conn)
+        return jsonify({'error': 'Parquet export requires pyarrow'}), 501
+    
+    def release():
+        pieces.close()
+        db_pool.release(conn)
+    
+    # Released when the response is closed, which also happens when the
+    # client goes away before the body was started
+    response = app.response_class(pieces, mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=jobs_export.{export_format}'
+    response.call_on_close(release)
+    return response
+
+# One shared feed: a database check per tick, however many dashboards are open
+dashboard_feed = DashboardFeed(db_pool, interval=float(os.environ.get('DASHBOARD_TICK_SECONDS', 2)))
+
+# Streams are closed periodically and the browser reconnects (resuming from
+# Last-Event-ID), so no client holds a stream forever
+DASHBOARD_STREAM_SECONDS = int(os.environ.get('DASHBOARD_STREAM_SECONDS', 300))
+KEEPALIVE_SECONDS = 15
+
+def stream_start_generation(last_event_id, since):
+    """Generation a dashboard stream resumes from: Last-Event-ID, else ?since="""
+    since = last_event_id or since
+    try:
+        return int(since) if since else None
+    except ValueError:
+        return None
+
+def dashboard_messages(generation):
+    """
+    Server-sent event messages of one feed tick for a client at generation:
+    (messages, the client's generation after them, whether the stream ends)
+    """
+    try:
+        events = dashboard_feed.events_since(generation)
+    except sqlite3.Error as e:
+        return [f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"], generation, True
+    messages = []
+    for payload in events:
+        generation = payload['generation']
+        messages.append(f"id: {generation}\nevent: stats\ndata: {json.dumps(payload)}\n\n")
+    return messages, generation, False
+
+@app.route('/api/dashboard/stream')
+def api_dashboard_stream():
+    """
+    Server-sent events with dashboard deltas (new jobs, totals, changed top
+    lists) after the generation given by Last-Event-ID or ?since=.
+    This blocking version serves the development server; asgi_app.py serves
+    the same stream from the event loop without holding a request thread.
+    """
+    since = stream_start_generation(request.headers.get('Last-Event-ID'), request.args.get('since'))
+    
+    def generate():
+        generation = since
+        deadline = time.monotonic() + DASHBOARD_STREAM_SECONDS
+        last_sent = time.monotonic()
+        yield 'retry: 5000\n\n'
+        
+        while time.monotonic() < deadline:
+            messages, generation, done = dashboard_messages(generation)
+            yield from messages
+            if done:
+                return
+            if messages:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+            time.sleep(dashboard_feed.interval)
+    
+    response = app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    """Response cache hit/miss/eviction counters"""
+    return jsonify(response_cache.stats())
+
+@app.route('/api/profile/queries')
+def api_profile_queries():
+    """Per-statement timing and row counts, with plans of full-scanning statements"""
+    return jsonify({'queries': query_profiler.queries()})
+
+@app.route('/metrics')
+def metrics():
+    """Route latency histograms, statement timings and cache counters for Prometheus"""
+    body = render_prometheus(route_metrics, query_profiler, response_cache.stats())
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     print("Starting Jobs Database Web Interface...")
     print("Open your browser and go to: http://localhost:5000")